@@ -1,14 +1,24 @@
 import os
 import sys
+import time
 import subprocess
 import logging
+import threading
 from dotenv import load_dotenv
 from supabase import create_client
 from util.supabase_utils import upload_text_to_supabase
+from util.streaming import stream_json, StreamStats
+from util.wire_codec import expand, RESUME_SPEC, COMPAT_SPEC
+from util.projection import Projector
+from util.preparse import preparse, merge_contacts, PreparseStats
+from util.packing import PackStats, DEFAULT_MAX_TOKENS, DEFAULT_MAX_ITEMS
+from util.hedging import Hedger
+from util.audit import AuditEngine
 from langgraph.graph import StateGraph, END, START # Keep START for clarity, though its explicit edge is removed
+from langgraph.types import Send
 from langchain_openai import ChatOpenAI
 from langchain_core.runnables import RunnableLambda
-from typing import TypedDict
+from typing import TypedDict, Annotated
 import traceback
 import tiktoken
 from collections import defaultdict
@@ -21,6 +31,14 @@ TOKEN_PRICING = {
     'output': 0.0015   # $1.50 per 1K tokens
 }
 
+# Per-agent prices (each agent runs on one model), per 1K tokens
+AGENT_PRICING = {
+    "job_description_agent": {"input": 0.0005, "output": 0.0015},
+    "resume_parser_agent": {"input": 0.0005, "output": 0.0015},
+    "compatibility_analyzer_agent": {"input": 0.0005, "output": 0.0015},
+    "audit_agent": {"input": 0.0005, "output": 0.0015},
+}
+
 def count_tokens(text, model="gpt-4"):
     try:
         enc = tiktoken.encoding_for_model(model)
@@ -30,12 +48,23 @@ def count_tokens(text, model="gpt-4"):
         return max(1, len(text) // 4)
 
 token_stats = defaultdict(lambda: {'input': 0, 'output': 0, 'calls': 0})
+token_stats_lock = threading.Lock()
+# Duration of the last LLM call on this thread, consumed by the next add_token_stats
+llm_timing = threading.local()
 
-# Helper to update stats
-def add_token_stats(agent, input_tokens, output_tokens):
-    token_stats[agent]['input'] += input_tokens
-    token_stats[agent]['output'] += output_tokens
-    token_stats[agent]['calls'] += 1
+# Helper to update stats (agents may run on worker threads)
+def add_token_stats(agent, input_tokens, output_tokens, state=None):
+    with token_stats_lock:
+        token_stats[agent]['input'] += input_tokens
+        token_stats[agent]['output'] += output_tokens
+        token_stats[agent]['calls'] += 1
+    seconds = getattr(llm_timing, "seconds", None)
+    llm_timing.seconds = None
+    if state is not None:
+        # Per-resume usage, kept in the state for the results warehouse
+        metrics = dict(state.get("stage_metrics") or {})
+        metrics[agent] = {"input": input_tokens, "output": output_tokens, "seconds": seconds or 0.0}
+        state["stage_metrics"] = metrics
 
 # --- Prompt Loading Utilities ---
 def load_prompt(prompt_path):
@@ -62,6 +91,75 @@ class ResumeState(TypedDict, total=False):
     parsed_resume: str
     compatibility_score: str
     audit_result: str
+    precomputed_facts: str
+    duplicate_of: str
+    stage_metrics: dict
+    preparsed_contacts: dict
+
+def merge_dicts(left, right):
+    """Reducer for fan-in keys: parallel branches each contribute {resume_path: value}."""
+    return {**(left or {}), **(right or {})}
+
+class JobBatchState(TypedDict, total=False):
+    job_folder: str
+    job_description: str
+    resume_paths: list
+    job_requirements: str
+    resume_texts: Annotated[dict, merge_dicts]
+    parsed_resumes: Annotated[dict, merge_dicts]
+    parse_metrics: Annotated[dict, merge_dicts]
+    results: Annotated[dict, merge_dicts]
+    duplicates: Annotated[dict, merge_dicts]
+
+# --- Pipeline options (set from command-line flags in main()) ---
+PIPELINE_OPTIONS = {
+    "precompute_facts": False,  # compute skill/experience/location facts in Python, not in the compat LLM call
+    "dedup": True,              # score one representative per group of near-duplicate resumes
+    "prefetch_depth": 4,        # resume texts downloaded ahead of the one being scored
+    "stream": False,            # stream responses and stop at the end of the JSON object
+    "compact": False,           # ask for short output keys and expand them back to the full schema
+    "project_fields": False,    # send compat/audit only the input fields their frameworks use
+    "warehouse": True,          # append typed per-resume results to the local Parquet warehouse
+    "hedge": False,             # duplicate calls that outlive the rolling p95 of their model/stage
+    "hybrid_parse": False,      # extract contacts/sections with rules, the parser LLM gets only the rest
+    "pack": False,              # parse several short resumes per resume_parser_agent call
+    "pack_tokens": DEFAULT_MAX_TOKENS,
+    "pack_size": DEFAULT_MAX_ITEMS,
+}
+
+# --- LLM invocation ---
+stream_stats = StreamStats()
+projector = Projector(count_fn=lambda text: count_tokens(text, model="llama-3.3-70b-versatile"))
+pack_stats = PackStats()
+preparse_stats = PreparseStats(count_fn=lambda text: count_tokens(text, model="llama-3.1-8b-instant"))
+
+hedger = Hedger(budget=float(os.getenv("HEDGE_BUDGET", "0.05")))
+# Per-request timeout for every LLM client (seconds)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+
+def call_llm(llm, prompt, agent, cancel=None):
+    if PIPELINE_OPTIONS["stream"]:
+        return stream_json(llm, prompt, agent=agent, stats=stream_stats, cancel=cancel)
+    return llm.invoke(prompt).content
+
+def invoke_llm(llm, prompt, agent):
+    """
+    Call the LLM and return the response text. In streaming mode the response
+    is cut off as soon as its top-level JSON object closes; in hedging mode a
+    slow call is raced against a duplicate request.
+    """
+    start = time.perf_counter()
+    try:
+        if PIPELINE_OPTIONS["hedge"]:
+            # The losing request is billed too: its tokens go to the agent's totals (not to the resume's row)
+            def on_extra(content):
+                add_token_stats(agent, count_tokens(prompt, model=llm.model_name),
+                                count_tokens(content, model=llm.model_name) if content else 0)
+            return hedger.call((llm.model_name, agent), lambda cancel: call_llm(llm, prompt, agent, cancel),
+                               cancellable=PIPELINE_OPTIONS["stream"], on_extra=on_extra)
+        return call_llm(llm, prompt, agent)
+    finally:
+        llm_timing.seconds = time.perf_counter() - start
 
 # --- Agent 1: Job Description ---
 JD_PROMPT_PATH = "prompts/job_description_prompt.txt"
@@ -70,33 +168,40 @@ jd_llm = ChatOpenAI(
     model="llama-3.1-8b-instant",
     base_url="https://api.groq.com/openai/v1",
     openai_api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.0
+    temperature=0.0,
+    timeout=LLM_TIMEOUT
 )
 
+def build_jd_prompt(state: ResumeState) -> str:
+    validate_state(["job_description"], state)
+    if JD_PROMPT is None:
+        raise RuntimeError(f"Prompt not loaded from {JD_PROMPT_PATH}")
+    return JD_PROMPT.replace("{{job_description}}", state["job_description"])
+
+def apply_jd_response(state: ResumeState, prompt: str, content: str) -> ResumeState:
+    import re, json
+    # --- Token/cost tracking ---
+    input_tokens = count_tokens(prompt, model="llama-3.1-8b-instant")
+    output_tokens = count_tokens(content, model="llama-3.1-8b-instant")
+    add_token_stats("job_description_agent", input_tokens, output_tokens, state)
+    # Extract JSON from LLM output
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        try:
+            parsed_json = json.loads(json_match.group(0))
+            state["job_requirements"] = json.dumps(parsed_json)
+        except Exception as e:
+            state["job_requirements"] = content
+    else:
+        state["job_requirements"] = content
+    log_agent_step("JobDescriptionAgent", state, output_key="job_requirements")
+    return state
+
 def job_description_agent(state: ResumeState) -> ResumeState:
     try:
-        validate_state(["job_description"], state)
-        if JD_PROMPT is None:
-            raise RuntimeError(f"Prompt not loaded from {JD_PROMPT_PATH}")
-        prompt = JD_PROMPT.replace("{{job_description}}", state["job_description"])
-        import re, json
-        response = jd_llm.invoke(prompt)
-        # --- Token/cost tracking ---
-        input_tokens = count_tokens(prompt, model="llama-3.1-8b-instant")
-        output_tokens = count_tokens(response.content, model="llama-3.1-8b-instant")
-        add_token_stats("job_description_agent", input_tokens, output_tokens)
-        # Extract JSON from LLM output
-        json_match = re.search(r'\{[\s\S]*\}', response.content)
-        if json_match:
-            try:
-                parsed_json = json.loads(json_match.group(0))
-                state["job_requirements"] = json.dumps(parsed_json)
-            except Exception as e:
-                state["job_requirements"] = response.content
-        else:
-            state["job_requirements"] = response.content
-        log_agent_step("JobDescriptionAgent", state, output_key="job_requirements")
-        return state
+        prompt = build_jd_prompt(state)
+        content = invoke_llm(jd_llm, prompt, "job_description_agent")
+        return apply_jd_response(state, prompt, content)
     except Exception as e:
         logging.error(f"[JobDescriptionAgent] Exception: {e}\n{traceback.format_exc()}")
         raise
@@ -104,76 +209,223 @@ def job_description_agent(state: ResumeState) -> ResumeState:
 # --- Agent 2: Resume Parser ---
 RESUME_PROMPT_PATH = "prompts/resume_parser_prompt.txt"
 RESUME_PROMPT = load_prompt(RESUME_PROMPT_PATH)
+RESUME_COMPACT_PROMPT_PATH = "prompts/resume_parser_prompt_compact.txt"
+RESUME_COMPACT_PROMPT = load_prompt(RESUME_COMPACT_PROMPT_PATH)
+RESUME_HYBRID_PROMPT_PATH = "prompts/resume_parser_prompt_hybrid.txt"
+RESUME_HYBRID_PROMPT = load_prompt(RESUME_HYBRID_PROMPT_PATH)
+RESUME_PACKED_PROMPT_PATH = "prompts/resume_parser_prompt_packed.txt"
+RESUME_PACKED_PROMPT = load_prompt(RESUME_PACKED_PROMPT_PATH)
 resume_llm = ChatOpenAI(
     model="llama-3.1-8b-instant",
     base_url="https://api.groq.com/openai/v1",
     openai_api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.0
+    temperature=0.0,
+    timeout=LLM_TIMEOUT
 )
 
+def build_resume_prompt(state: ResumeState) -> str:
+    validate_state(["resume_text"], state)
+    resume_text = state["resume_text"]
+    if PIPELINE_OPTIONS["hybrid_parse"]:
+        # Contacts are taken by regex and merged back in apply_resume_response; the LLM gets the sections
+        result = preparse(resume_text)
+        state["preparsed_contacts"] = result["contacts"]
+        preparse_stats.record(resume_text, result)
+        resume_text = result["text"]
+    if PIPELINE_OPTIONS["compact"]:
+        if RESUME_COMPACT_PROMPT is None:
+            raise RuntimeError(f"Prompt not loaded from {RESUME_COMPACT_PROMPT_PATH}")
+        return RESUME_COMPACT_PROMPT.replace("{{resume_text}}", resume_text)
+    if PIPELINE_OPTIONS["hybrid_parse"]:
+        if RESUME_HYBRID_PROMPT is None:
+            raise RuntimeError(f"Prompt not loaded from {RESUME_HYBRID_PROMPT_PATH}")
+        return RESUME_HYBRID_PROMPT.replace("{{resume_text}}", resume_text)
+    if RESUME_PROMPT is None:
+        raise RuntimeError(f"Prompt not loaded from {RESUME_PROMPT_PATH}")
+    return RESUME_PROMPT.replace("{{resume_text}}", resume_text)
+
+def apply_resume_response(state: ResumeState, prompt: str, content: str) -> ResumeState:
+    import re, json
+    # --- Token/cost tracking ---
+    input_tokens = count_tokens(prompt, model="llama-3.1-8b-instant")
+    output_tokens = count_tokens(content, model="llama-3.1-8b-instant")
+    add_token_stats("resume_parser_agent", input_tokens, output_tokens, state)
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        try:
+            parsed_json = json.loads(json_match.group(0))
+            if PIPELINE_OPTIONS["compact"]:
+                parsed_json = expand(parsed_json, RESUME_SPEC)
+            if state.get("preparsed_contacts"):
+                parsed_json = merge_contacts(parsed_json, state["preparsed_contacts"])
+            state["parsed_resume"] = json.dumps(parsed_json)
+        except Exception as e:
+            state["parsed_resume"] = content
+    else:
+        state["parsed_resume"] = content
+    log_agent_step("ResumeParserAgent", state, output_key="parsed_resume")
+    return state
+
 def resume_parser_agent(state: ResumeState) -> ResumeState:
     try:
-        validate_state(["resume_text"], state)
-        if RESUME_PROMPT is None:
-            raise RuntimeError(f"Prompt not loaded from {RESUME_PROMPT_PATH}")
-        prompt = RESUME_PROMPT.replace("{{resume_text}}", state["resume_text"])
-        import re, json
-        response = resume_llm.invoke(prompt)
-        # --- Token/cost tracking ---
-        input_tokens = count_tokens(prompt, model="llama-3.1-8b-instant")
-        output_tokens = count_tokens(response.content, model="llama-3.1-8b-instant")
-        add_token_stats("resume_parser_agent", input_tokens, output_tokens)
-        json_match = re.search(r'\{[\s\S]*\}', response.content)
-        if json_match:
-            try:
-                parsed_json = json.loads(json_match.group(0))
-                state["parsed_resume"] = json.dumps(parsed_json)
-            except Exception as e:
-                state["parsed_resume"] = response.content
-        else:
-            state["parsed_resume"] = response.content
-        log_agent_step("ResumeParserAgent", state, output_key="parsed_resume")
-        return state
+        if state.get("parsed_resume"):
+            # Already parsed (e.g. reused across several job descriptions)
+            return state
+        prompt = build_resume_prompt(state)
+        content = invoke_llm(resume_llm, prompt, "resume_parser_agent")
+        return apply_resume_response(state, prompt, content)
     except Exception as e:
         logging.error(f"[ResumeParserAgent] Exception: {e}\n{traceback.format_exc()}")
         raise
 
+def pack_parse_resumes(states):
+    """
+    Parse {path: state} with packed resume_parser_agent calls (see util/packing.py).
+    States parsed from a pack get their parsed_resume; the rest (single-resume
+    packs, rejected or failed entries) are left for resume_parser_agent.
+    """
+    import json
+    from util.packing import plan_packs, render_packed, split_packed
+    if RESUME_PACKED_PROMPT is None:
+        raise RuntimeError(f"Prompt not loaded from {RESUME_PACKED_PROMPT_PATH}")
+    model = resume_llm.model_name
+    texts = {}
+    for path, state in states.items():
+        if state.get("parsed_resume"):
+            continue
+        text = state["resume_text"]
+        if PIPELINE_OPTIONS["hybrid_parse"]:
+            result = preparse(text)
+            state["preparsed_contacts"] = result["contacts"]
+            preparse_stats.record(text, result)
+            text = result["text"]
+        texts[path] = text
+    sizes = {path: count_tokens(text, model=model) for path, text in texts.items()}
+    for pack in plan_packs(sizes, PIPELINE_OPTIONS["pack_tokens"], PIPELINE_OPTIONS["pack_size"]):
+        if len(pack) == 1:
+            continue
+        ids = {f"R{i}": path for i, path in enumerate(pack, 1)}
+        items = [(resume_id, texts[path]) for resume_id, path in ids.items()]
+        prompt = render_packed(RESUME_PACKED_PROMPT, items)
+        try:
+            content = invoke_llm(resume_llm, prompt, "resume_parser_agent")
+        except Exception as e:
+            logging.error(f"[ResumeParserAgent] Packed call for {len(pack)} resumes failed: {e}")
+            pack_stats.record(len(pack), len(pack))
+            continue
+        seconds = getattr(llm_timing, "seconds", None) or 0.0
+        input_tokens = count_tokens(prompt, model=model)
+        output_tokens = count_tokens(content, model=model)
+        add_token_stats("resume_parser_agent", input_tokens, output_tokens)
+        parsed, rejected = split_packed(content, items)
+        pack_stats.record(len(pack), len(rejected))
+        if rejected:
+            logging.error(f"[ResumeParserAgent] Retrying individually: {[ids[r] for r in rejected]}")
+        total = sum(sizes[path] for path in pack) or 1
+        for resume_id, entry in parsed.items():
+            state = states[ids[resume_id]]
+            if state.get("preparsed_contacts"):
+                entry = merge_contacts(entry, state["preparsed_contacts"])
+            state["parsed_resume"] = json.dumps(entry)
+            # The pack's usage is attributed to its resumes in proportion to their size
+            share = sizes[ids[resume_id]] / total
+            metrics = dict(state.get("stage_metrics") or {})
+            metrics["resume_parser_agent"] = {"input": round(input_tokens * share),
+                                              "output": round(output_tokens * share),
+                                              "seconds": seconds * share}
+            state["stage_metrics"] = metrics
+            log_agent_step("ResumeParserAgent", state, output_key="parsed_resume")
+
 # --- Agent 3: Compatibility Analyzer ---
 COMP_PROMPT_PATH = "prompts/compatibility_prompt.txt"
 COMP_PROMPT = load_prompt(COMP_PROMPT_PATH)
+COMP_FACTS_PROMPT_PATH = "prompts/compatibility_prompt_facts.txt"
+COMP_FACTS_PROMPT = load_prompt(COMP_FACTS_PROMPT_PATH)
+COMP_COMPACT_PROMPT_PATH = "prompts/compatibility_prompt_compact.txt"
+COMP_COMPACT_PROMPT = load_prompt(COMP_COMPACT_PROMPT_PATH)
 compat_llm = ChatOpenAI(
     model="llama-3.1-8b-instant",
     base_url="https://api.groq.com/openai/v1",
     openai_api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.0
+    temperature=0.0,
+    timeout=LLM_TIMEOUT
 )
 
-def compatibility_analyzer_agent(state: ResumeState) -> ResumeState:
-    try:
-        validate_state(["job_requirements", "parsed_resume"], state)
-        if COMP_PROMPT is None:
-            raise RuntimeError(f"Prompt not loaded from {COMP_PROMPT_PATH}")
+def precompute_facts_for(states):
+    """
+    With --precompute-facts, fill precomputed_facts for every parsed state of one
+    job in a single vectorized compute_facts_batch pass (instead of one resume per
+    compatibility call). States that already have facts are left untouched.
+    """
+    import json
+    if not PIPELINE_OPTIONS["precompute_facts"]:
+        return
+    pending = [state for state in states if state.get("parsed_resume") and not state.get("precomputed_facts")]
+    by_job = defaultdict(list)
+    for state in pending:
+        by_job[state["job_requirements"]].append(state)
+    from util.resume_features import compute_facts_batch
+    for job_requirements, job_states in by_job.items():
+        facts = compute_facts_batch(job_requirements, [state["parsed_resume"] for state in job_states])
+        for state, fact in zip(job_states, facts):
+            state["precomputed_facts"] = json.dumps(fact, ensure_ascii=False)
+
+def build_compat_prompt(state: ResumeState) -> str:
+    import json
+    validate_state(["job_requirements", "parsed_resume"], state)
+    if COMP_PROMPT is None:
+        raise RuntimeError(f"Prompt not loaded from {COMP_PROMPT_PATH}")
+    if state.get("precomputed_facts") or PIPELINE_OPTIONS["precompute_facts"]:
+        # Mechanical fields are computed deterministically; the LLM only fills in the judgment fields
+        if COMP_FACTS_PROMPT is None:
+            raise RuntimeError(f"Prompt not loaded from {COMP_FACTS_PROMPT_PATH}")
+        if not state.get("precomputed_facts"):
+            from util.resume_features import compute_facts
+            facts = compute_facts(state["job_requirements"], state["parsed_resume"])
+            state["precomputed_facts"] = json.dumps(facts, ensure_ascii=False)
+        prompt = COMP_FACTS_PROMPT.replace("{{precomputed_facts}}", state["precomputed_facts"])
+    elif PIPELINE_OPTIONS["compact"]:
+        if COMP_COMPACT_PROMPT is None:
+            raise RuntimeError(f"Prompt not loaded from {COMP_COMPACT_PROMPT_PATH}")
+        prompt = COMP_COMPACT_PROMPT
+    else:
         prompt = COMP_PROMPT
-        prompt = prompt.replace("{{job_requirements}}", state["job_requirements"])
-        prompt = prompt.replace("{{parsed_resume}}", state["parsed_resume"])
-        import re, json
-        response = compat_llm.invoke(prompt)
-        # --- Token/cost tracking ---
-        input_tokens = count_tokens(prompt, model="llama-3.3-70b-versatile")
-        output_tokens = count_tokens(response.content, model="llama-3.3-70b-versatile")
-        add_token_stats("compatibility_analyzer_agent", input_tokens, output_tokens)
-        json_match = re.search(r'\{[\s\S]*\}', response.content)
-        if json_match:
-            try:
-                parsed_json = json.loads(json_match.group(0))
-                state["compatibility_score"] = json.dumps(parsed_json)
-            except Exception as e:
-                state["compatibility_score"] = response.content
-        else:
-            state["compatibility_score"] = response.content
+    inputs = {"job_requirements": state["job_requirements"], "parsed_resume": state["parsed_resume"]}
+    if PIPELINE_OPTIONS["project_fields"]:
+        inputs = projector.inputs("compatibility_analyzer_agent", inputs)
+    prompt = prompt.replace("{{job_requirements}}", inputs["job_requirements"])
+    prompt = prompt.replace("{{parsed_resume}}", inputs["parsed_resume"])
+    return prompt
 
-        log_agent_step("CompatibilityAnalyzerAgent", state, output_key="compatibility_score")
-        return state
+def apply_compat_response(state: ResumeState, prompt: str, content: str) -> ResumeState:
+    import re, json
+    # --- Token/cost tracking ---
+    input_tokens = count_tokens(prompt, model="llama-3.3-70b-versatile")
+    output_tokens = count_tokens(content, model="llama-3.3-70b-versatile")
+    add_token_stats("compatibility_analyzer_agent", input_tokens, output_tokens, state)
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        try:
+            parsed_json = json.loads(json_match.group(0))
+            if PIPELINE_OPTIONS["compact"] and not state.get("precomputed_facts"):
+                parsed_json = expand(parsed_json, COMPAT_SPEC)
+            if state.get("precomputed_facts"):
+                from util.resume_features import merge_facts
+                parsed_json = merge_facts(parsed_json, json.loads(state["precomputed_facts"]))
+            state["compatibility_score"] = json.dumps(parsed_json)
+        except Exception as e:
+            state["compatibility_score"] = content
+    else:
+        state["compatibility_score"] = content
+
+    log_agent_step("CompatibilityAnalyzerAgent", state, output_key="compatibility_score")
+    return state
+
+def compatibility_analyzer_agent(state: ResumeState) -> ResumeState:
+    try:
+        prompt = build_compat_prompt(state)
+        content = invoke_llm(compat_llm, prompt, "compatibility_analyzer_agent")
+        return apply_compat_response(state, prompt, content)
     except Exception as e:
         logging.error(f"[CompatibilityAnalyzerAgent] Exception: {e}\n{traceback.format_exc()}")
         raise
@@ -297,6 +549,18 @@ def list_txt_files(job_folder):
         sys.exit(1)
     return jd_txt, resume_txts
 
+def list_jd_txt_files(job_folder):
+    """
+    All job description .txt files directly under a job folder (resume .txt
+    files live in the parsed subfolder).
+    """
+    try:
+        jd_files = supabase.storage.from_(SRC_BUCKET).list(job_folder)
+    except Exception as e:
+        logging.error(f"Failed to list files in bucket: {e}")
+        sys.exit(1)
+    return [f"{job_folder}/{f['name']}" for f in jd_files if f["name"].endswith(".txt")]
+
 def download_txt(bucket, src_path):
     try:
         data = supabase.storage.from_(bucket).download(src_path)
@@ -311,56 +575,51 @@ def download_txt(bucket, src_path):
         print(f"❌ Error downloading file from Supabase: {src_path}\n{e}")
         return None
 
-from langchain_openai import ChatOpenAI
+# --- Agent 4: Audit ---
+AUDIT_PROMPT_PATH = "prompts/audit_agent.txt"
+# Prompt and client are loaded once and shared by every resume and worker thread (see util/audit.py)
+audit_engine = AuditEngine(prompt_path=AUDIT_PROMPT_PATH, timeout=LLM_TIMEOUT)
+
+def build_audit_prompt(state: ResumeState) -> str:
+    inputs = {
+        "job_requirements": state.get("job_requirements", "{}"),
+        "parsed_resume": state.get("parsed_resume", "{}"),
+        "compatibility_score": state.get("compatibility_score", "{}"),
+    }
+    if PIPELINE_OPTIONS["project_fields"]:
+        inputs = projector.inputs("audit_agent", inputs)
+    return audit_engine.build_prompt(inputs["job_requirements"], inputs["parsed_resume"],
+                                     inputs["compatibility_score"])
+
+def apply_audit_response(state: ResumeState, prompt: str, content: str) -> ResumeState:
+    import json
+    # Token/cost tracking
+    input_tokens = count_tokens(prompt, model=audit_engine.model)
+    output_tokens = count_tokens(content, model=audit_engine.model)
+    add_token_stats("audit_agent", input_tokens, output_tokens, state)
+    # Extract (or repair) the JSON object; raw responses only go to the sampled diagnostic log
+    parsed_json = audit_engine.parse_response(content, prompt)
+    state["audit_result"] = json.dumps(parsed_json, ensure_ascii=False) if parsed_json is not None else content
+    return state
 
 def audit_agent(state: ResumeState) -> ResumeState:
-    import os, json
-    # Load prompt from prompts/audit_agent.txt (corrected)
-    prompt_path = "prompts/audit_agent.txt"
+    import json
+    start = time.perf_counter()
     try:
-        with open(prompt_path, "r", encoding="utf-8") as f:
-            audit_prompt = f.read()
+        prompt = build_audit_prompt(state)
     except Exception as e:
-        print(f"[AuditAgent] Failed to load prompt from '{prompt_path}': {e}")
-        state["audit_result"] = json.dumps({"error": f"Prompt load failed: {prompt_path} not found or unreadable."})
+        logging.error(f"[AuditAgent] Failed to load prompt from '{AUDIT_PROMPT_PATH}': {e}")
+        state["audit_result"] = json.dumps({"error": f"Prompt load failed: {AUDIT_PROMPT_PATH} not found or unreadable."})
         return state
-    job_requirements = state.get("job_requirements", "{}")
-    parsed_resume = state.get("parsed_resume", "{}")
-    compatibility_score = state.get("compatibility_score", "{}")
-    prompt = audit_prompt
-    prompt = prompt.replace("{{job_requirements}}", job_requirements)
-    prompt = prompt.replace("{{parsed_resume}}", parsed_resume)
-    prompt = prompt.replace("{{compatibility_result}}", compatibility_score)
-    llm = ChatOpenAI(
-        model="llama-3.3-70b-versatile",
-        base_url="https://api.groq.com/openai/v1",
-        openai_api_key=os.getenv("GROQ_API_KEY"),
-        temperature=0.1
-    )
     try:
-        # Debug: print prompt content
-        print("[DEBUG] AuditAgent prompt preview:\n", prompt[:1000])
-        response = llm.invoke(prompt)
-        # Always print the full raw LLM response for debugging
-        print("[DEBUG] AuditAgent FULL RAW response:", response.content)
-        # Store raw LLM response for printing after [AuditAgent Output]:
-        state["audit_agent_raw_response"] = response.content
-        # Token/cost tracking
-        input_tokens = count_tokens(prompt, model="llama-3.3-70b-versatile")
-        output_tokens = count_tokens(response.content, model="llama-3.3-70b-versatile")
-        add_token_stats("audit_agent", input_tokens, output_tokens)
-        # Try to extract JSON from response
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', response.content)
-        if json_match:
-            try:
-                parsed_json = json.loads(json_match.group(0))
-                state["audit_result"] = json.dumps(parsed_json, ensure_ascii=False)
-            except Exception:
-                state["audit_result"] = response.content
-        else:
-            state["audit_result"] = response.content
+        llm_start = time.perf_counter()
+        content = invoke_llm(audit_engine.llm, prompt, "audit_agent")
+        llm_end = time.perf_counter()
+        apply_audit_response(state, prompt, content)
+        # Time spent around the LLM call: prompt rendering, token counting, parsing, diagnostics
+        audit_engine.record_overhead((llm_start - start) + (time.perf_counter() - llm_end))
     except Exception as e:
+        audit_engine.diagnostics.record("error", failed=True, error=str(e))
         state["audit_result"] = json.dumps({"error": str(e)})
     return state
 
@@ -380,39 +639,175 @@ def create_resume_filtering_graph():
     graph.add_edge("audit_agent", END)
     return graph.compile()
 
-def main():
-    print("\n==== Resume Filtering Agentic Workflow ====")
-    # 1. Run job-document_detail.py and trigger parsing
-    job_folder = run_job_document_detail()
-    print(f"Selected job: {job_folder}")
+def create_resume_graph():
+    """
+    Compiled per-resume graph (parse → compatibility → audit). The job
+    requirements are extracted once per job and passed in the initial state.
+    """
+    graph = StateGraph(ResumeState)
+    graph.add_node("resume_parser_agent", resume_parser_agent)
+    graph.add_node("compatibility_analyzer_agent", compatibility_analyzer_agent)
+    graph.add_node("audit_agent", audit_agent)
+    graph.set_entry_point("resume_parser_agent")
+    graph.add_edge("resume_parser_agent", "compatibility_analyzer_agent")
+    graph.add_edge("compatibility_analyzer_agent", "audit_agent")
+    graph.add_edge("audit_agent", END)
+    return graph.compile()
 
-    # 2. Fetch parsed .txt files from Supabase
-    jd_txt_path, resumes_txt_paths = list_txt_files(job_folder)
-    jd_txt_content = download_txt(SRC_BUCKET, jd_txt_path)
-    parsed_folder = f"{job_folder}/parsed"
+def create_scoring_graph():
+    """
+    Compiled graph for already-parsed resumes: compatibility analysis followed by audit.
+    """
+    graph = StateGraph(ResumeState)
+    graph.add_node("compatibility_analyzer_agent", compatibility_analyzer_agent)
+    graph.add_node("audit_agent", audit_agent)
+    graph.set_entry_point("compatibility_analyzer_agent")
+    graph.add_edge("compatibility_analyzer_agent", "audit_agent")
+    graph.add_edge("audit_agent", END)
+    return graph.compile()
 
-    # 3. Run job_description_agent ONCE and cache job_requirements
-    import copy
-    if jd_txt_content is None:
-        print(f"❌ Could not load job description file: {jd_txt_path}. Please check if the file exists in Supabase and try again.")
-        sys.exit(1)
+def create_fan_out_graph(detector=None):
+    """
+    Compiled DAG for a whole job: the JD agent and one parser branch per resume
+    start together (Send fan-out from START); a join barrier waits for all of
+    them, then compatibility + audit fan out per parsed resume. With a
+    DuplicateDetector, each parser branch checks its downloaded text against the
+    texts seen so far and skips parsing a duplicate (reported in "duplicates"),
+    so de-duplication never delays the JD agent.
+
+        START ─┬─ job_description_node ─────┐      ┌─ upload_requirements_node ─── END
+               └─ parse_resume_node (× N) ──┴─ join ┴─ score_resume_node (× N) ── END
+    """
+    def fan_out_parse(state: JobBatchState):
+        sends = [Send("job_description_node", state)]
+        sends += [Send("parse_resume_node", {"resume_path": path, "job_description": state["job_description"]})
+                  for path in state["resume_paths"]]
+        return sends
+
+    def job_description_node(state: JobBatchState):
+        job_requirements = job_description_agent({"job_description": state["job_description"]})["job_requirements"]
+        return {"job_requirements": job_requirements}
+
+    def upload_requirements_node(state: JobBatchState):
+        upload_job_requirements(state["job_folder"], state["job_requirements"])
+        return {}
+
+    detector_lock = threading.Lock()
+
+    def parse_resume_node(branch):
+        path = branch["resume_path"]
+        try:
+            resume_txt_content = download_txt(SRC_BUCKET, path)
+            if resume_txt_content is None:
+                return {}
+            if detector is not None:
+                # The first copy to arrive becomes the representative; later copies reuse its result
+                with detector_lock:
+                    rep = detector.add(path, resume_txt_content)
+                if rep is not None:
+                    return {"duplicates": {path: rep}}
+            parsed_state = resume_parser_agent({"resume_text": resume_txt_content})
+            store_parsed_resume(path, parsed_state["parsed_resume"])
+            return {"resume_texts": {path: resume_txt_content},
+                    "parsed_resumes": {path: parsed_state["parsed_resume"]},
+                    "parse_metrics": {path: parsed_state.get("stage_metrics", {})}}
+        except Exception as e:
+            logging.error(f"Error parsing resume {path}: {e}")
+            return {}
+
+    def join(state: JobBatchState):
+        return {}
+
+    def fan_out_score(state: JobBatchState):
+        branches = [{
+            "resume_path": path,
+            "job_description": state["job_description"],
+            "resume_text": state["resume_texts"][path],
+            "job_requirements": state["job_requirements"],
+            "parsed_resume": parsed,
+            "stage_metrics": state.get("parse_metrics", {}).get(path, {}),
+        } for path, parsed in state.get("parsed_resumes", {}).items()]
+        # All resumes are parsed at the join, so their facts are computed in one batch
+        precompute_facts_for(branches)
+        # The requirements upload runs in the same step as scoring, so storage latency is not on the critical path
+        return [Send("upload_requirements_node", state)] + [Send("score_resume_node", b) for b in branches]
+
+    def score_resume_node(branch):
+        path = branch.pop("resume_path")
+        try:
+            final_state = audit_agent(compatibility_analyzer_agent(branch))
+            return {"results": {path: final_state}}
+        except Exception as e:
+            logging.error(f"Error scoring resume {path}: {e}")
+            return {}
+
+    graph = StateGraph(JobBatchState)
+    graph.add_node("job_description_node", job_description_node)
+    graph.add_node("parse_resume_node", parse_resume_node)
+    graph.add_node("upload_requirements_node", upload_requirements_node)
+    graph.add_node("join", join)
+    graph.add_node("score_resume_node", score_resume_node)
+    graph.add_conditional_edges(START, fan_out_parse, ["job_description_node", "parse_resume_node"])
+    graph.add_edge(["job_description_node", "parse_resume_node"], "join")
+    graph.add_conditional_edges("join", fan_out_score, ["upload_requirements_node", "score_resume_node"])
+    graph.add_edge("upload_requirements_node", END)
+    graph.add_edge("score_resume_node", END)
+    return graph.compile()
+
+def run_fan_out_mode(job_folder, jd_txt_content, resumes_txt_paths, max_workers=4):
+    """Score a whole job with the fan-out/fan-in graph; at most max_workers branches run at once."""
+    if not resumes_txt_paths:
+        # No parser branch means the join never fires, so the requirements are extracted and uploaded here
+        extract_job_requirements(job_folder, jd_txt_content)
+        print(f"No resumes to score for {job_folder}; job requirements extracted and uploaded")
+        return {}
+    from util.dedup import DuplicateDetector
+    detector = DuplicateDetector() if PIPELINE_OPTIONS["dedup"] else None
+    final = create_fan_out_graph(detector).invoke(
+        {"job_folder": job_folder, "job_description": jd_txt_content, "resume_paths": resumes_txt_paths},
+        config={"max_concurrency": max_workers},
+    )
+    results = dict(final.get("results", {}))
+    duplicate_of = final.get("duplicates") or {}
+    if duplicate_of:
+        print(f"[INFO] {len(duplicate_of)} duplicate resume(s) reused the result of their original:")
+    for path, rep in duplicate_of.items():
+        print(f"  • {path} → {rep}")
+        if rep in results:
+            results[path] = dict(results[rep], duplicate_of=rep)
+    for resume_txt_path in resumes_txt_paths:
+        if resume_txt_path in results:
+            print_resume_result(resume_txt_path, results[resume_txt_path])
+    print(f"Scored {len(results)}/{len(resumes_txt_paths)} resumes")
+    record_results(job_folder, [(path, results[path]) for path in resumes_txt_paths if path in results], mode="fan-out")
+    return results
+
+def extract_job_requirements(job_folder, jd_txt_content, job_json_name=None):
+    """
+    Run job_description_agent once for a job and upload the resulting JSON
+    next to the job description PDF. Returns the job_requirements JSON string.
+    """
     job_desc_state = {"job_description": jd_txt_content}
     job_desc_state = job_description_agent(job_desc_state)
     job_requirements = job_desc_state.get("job_requirements", "{}")
+    upload_job_requirements(job_folder, job_requirements, job_json_name)
+    return job_requirements
 
+def upload_job_requirements(job_folder, job_requirements, job_json_name=None):
     # --- Save job requirements JSON to Supabase ---
     # Use the job description PDF file name (without extension) as the JSON name
-    jd_pdf_name = None
-    jd_files = supabase.storage.from_(SRC_BUCKET).list(job_folder)
-    for f in jd_files:
-        fname = f["name"]
-        if fname.endswith(".pdf"):
-            jd_pdf_name = os.path.splitext(fname)[0]
-            break
-    if jd_pdf_name:
-        job_json_name = f"{jd_pdf_name}.json"
-    else:
-        job_json_name = "job_requirements.json"
+    if job_json_name is None:
+        jd_pdf_name = None
+        jd_files = supabase.storage.from_(SRC_BUCKET).list(job_folder)
+        for f in jd_files:
+            fname = f["name"]
+            if fname.endswith(".pdf"):
+                jd_pdf_name = os.path.splitext(fname)[0]
+                break
+        if jd_pdf_name:
+            job_json_name = f"{jd_pdf_name}.json"
+        else:
+            job_json_name = "job_requirements.json"
     json_path = f"{job_folder}/{job_json_name}"
     try:
         upload_text_to_supabase('job-documents', json_path, job_requirements)
@@ -420,93 +815,649 @@ def main():
     except Exception as e:
         print(f"[ERROR] Failed to upload job requirements JSON to Supabase: {json_path}\n{e}")
 
-    # 4. Create the graph for resumes (starting from resume_parser_agent if job_requirements is present)
-    def create_resume_graph():
-        graph = StateGraph(ResumeState)
-        graph.add_node("resume_parser_agent", resume_parser_agent)
-        graph.add_node("compatibility_analyzer_agent", compatibility_analyzer_agent)
-        graph.add_node("audit_agent", audit_agent)
-        graph.set_entry_point("resume_parser_agent")
-        graph.add_edge("resume_parser_agent", "compatibility_analyzer_agent")
-        graph.add_edge("compatibility_analyzer_agent", "audit_agent")
-        graph.add_edge("audit_agent", END)
-        return graph.compile()
+def store_parsed_resume(resume_txt_path, parsed_resume):
+    """Persist a parsed resume next to its .txt so other jobs can find the candidate (reverse search)."""
+    parsed_json_path = f"{os.path.splitext(resume_txt_path)[0]}.json"
+    try:
+        upload_text_to_supabase(SRC_BUCKET, parsed_json_path, parsed_resume)
+    except Exception as e:
+        logging.error(f"Failed to upload parsed resume JSON {parsed_json_path}: {e}")
 
-    resume_graph = create_resume_graph()
+def record_results(job_folder, results, mode="default"):
+    """Append [(resume_path, final_state)] to the local results warehouse (util/warehouse.py)."""
+    if not PIPELINE_OPTIONS["warehouse"] or not results:
+        return
+    try:
+        from util.warehouse import append_results
+        path = append_results(job_folder, results, AGENT_PRICING, mode=mode)
+        print(f"[INFO] Appended {len(results)} result(s) to the warehouse: {path}")
+    except Exception as e:
+        logging.error(f"Failed to write results to the warehouse: {e}")
 
-    # 5. For each resume, run agentic workflow
-    results = []
-    for resume_txt_path in resumes_txt_paths:
+def get_compatibility_score(final_state):
+    """Numeric compatibilityScore from a final graph state, or None if unavailable."""
+    import json
+    try:
+        score = json.loads(final_state.get("compatibility_score", "{}")).get("compatibilityScore")
+        return float(score) if score is not None else None
+    except Exception:
+        return None
+
+def list_job_folders():
+    response = supabase.storage.from_(SRC_BUCKET).list("")
+    return [item["name"] for item in response if not item["name"].endswith(".pdf")]
+
+def build_candidate_index(index_path=None):
+    """
+    Incrementally sync the local candidate index with the parsed resume JSON
+    stored under every job folder: new files are added, files whose eTag
+    changed (re-parsed or overwritten) are re-indexed, deleted files removed.
+    """
+    from util.candidate_index import CandidateIndex, INDEX_PATH
+    index_path = index_path or INDEX_PATH
+    index = CandidateIndex.load(index_path)
+    seen = set()
+    added = updated = 0
+    for job_folder in list_job_folders():
+        parsed_folder = f"{job_folder}/parsed"
         try:
-            resume_txt_content = download_txt(SRC_BUCKET, resume_txt_path)
+            files = supabase.storage.from_(SRC_BUCKET).list(parsed_folder)
         except Exception as e:
-            logging.error(f"Error downloading resume {resume_txt_path}: {e}")
+            logging.error(f"Failed to list {parsed_folder}: {e}")
             continue
+        for f in files:
+            if not f["name"].endswith(".json"):
+                continue
+            key = f"{parsed_folder}/{f['name']}"
+            seen.add(key)
+            metadata = f.get("metadata") or {}
+            fingerprint = metadata.get("eTag") or f"{metadata.get('size')}:{f.get('updated_at')}"
+            if key in index and index.fingerprint(key) == fingerprint:
+                continue
+            parsed_resume = download_txt(SRC_BUCKET, key)
+            if parsed_resume is None:
+                continue
+            if key in index:
+                updated += 1
+            else:
+                added += 1
+            index.add(key, parsed_resume, fingerprint)
+    stale = [k for k in index.keys if k not in seen]
+    for key in stale:
+        index.remove(key)
+    index.save(index_path)
+    print(f"[INFO] Candidate index: {len(index)} candidates (+{added} / ~{updated} / -{len(stale)}) → {index_path}")
+    return index
 
-        # State for workflow (reuse job_requirements)
+def run_reverse_search(job_requirements_path, top_k=10):
+    """
+    Score the top_k indexed candidates (from any job folder) against a new
+    job_requirements JSON. Only the shortlisted candidates reach the LLM.
+    """
+    import json, time
+    from util.candidate_index import CandidateIndex
+    with open(job_requirements_path, encoding="utf-8") as f:
+        job_requirements = json.dumps(json.load(f))
+    index = CandidateIndex.load()
+    if not len(index):
+        print("❌ Candidate index is empty. Run with --build-index first.")
+        sys.exit(1)
+    start = time.perf_counter()
+    hits = index.query(job_requirements, top_k=top_k)
+    print(f"[INFO] Index lookup over {len(index)} candidates took {(time.perf_counter() - start) * 1000:.1f} ms")
+    scoring_graph = create_scoring_graph()
+    parsed_resumes = {}
+    for key, _ in hits:
+        parsed_resume = download_txt(SRC_BUCKET, key)
+        if parsed_resume is not None:
+            parsed_resumes[key] = parsed_resume
+    facts_by_key = {}
+    if PIPELINE_OPTIONS["precompute_facts"] and parsed_resumes:
+        from util.resume_features import compute_facts_batch
+        facts = compute_facts_batch(job_requirements, list(parsed_resumes.values()))
+        facts_by_key = {key: json.dumps(f, ensure_ascii=False) for key, f in zip(parsed_resumes, facts)}
+    results, final_states = [], []
+    for key, similarity in hits:
+        if key not in parsed_resumes:
+            continue
+        state = {"job_requirements": job_requirements, "parsed_resume": parsed_resumes[key]}
+        if key in facts_by_key:
+            state["precomputed_facts"] = facts_by_key[key]
+        try:
+            final_state = scoring_graph.invoke(state)
+        except Exception as e:
+            logging.error(f"Error scoring candidate {key}: {e}")
+            continue
+        results.append((key, similarity, get_compatibility_score(final_state)))
+        final_states.append((key, final_state))
+    # Candidates come from many job folders, so the rows are filed under the requirements file's name
+    record_results(os.path.splitext(os.path.basename(job_requirements_path))[0], final_states,
+                   mode="reverse-search")
+    print("\n==================== REVERSE SEARCH RESULTS ====================")
+    print(f"{'Candidate':<50}{'Similarity':>12}{'Score':>8}")
+    for key, similarity, score in results:
+        print(f"{key:<50}{similarity:>12.3f}{str(score):>8}")
+    return results
+
+def run_shortlist_mode(job_folder, jd_txt_content, job_requirements, resumes_txt_paths, k, min_score=0):
+    """
+    Score resumes best-lexical-match-first into a live top-K and stop once no
+    remaining resume could enter it. Writes a ranked leaderboard locally and to Supabase.
+    """
+    import json
+    from util.shortlist import lexical_prior, run_shortlist, leaderboard_json
+    resume_texts = download_texts(resumes_txt_paths)
+    resume_texts, duplicate_of = dedupe_texts(resume_texts)
+    priors = {path: lexical_prior(jd_txt_content, text) for path, text in resume_texts.items()}
+    resume_graph = create_resume_graph()
+    final_states = {}
+
+    def score_resume(resume_txt_path):
         state = {
             "job_description": jd_txt_content,
-            "resume_text": resume_txt_content,
+            "resume_text": resume_texts[resume_txt_path],
             "job_requirements": job_requirements
         }
+        final_state = resume_graph.invoke(state)
+        final_states[resume_txt_path] = final_state
+        store_parsed_resume(resume_txt_path, final_state.get("parsed_resume", "{}"))
+        try:
+            audit = json.loads(final_state.get("audit_result", "{}"))
+        except Exception:
+            audit = {}
+        duplicates = [path for path, rep in duplicate_of.items() if rep == resume_txt_path]
+        return get_compatibility_score(final_state), {"auditStatus": audit.get("auditStatus"), "duplicates": duplicates}
 
+    shortlist, stats = run_shortlist(list(priors.items()), score_resume, k=k, min_score=min_score)
+    record_results(job_folder, list(final_states.items()), mode="shortlist")
+    leaderboard = leaderboard_json(job_folder, shortlist, stats, priors)
+    local_path = f"leaderboard_{job_folder}.json"
+    with open(local_path, "w", encoding="utf-8") as f:
+        f.write(leaderboard)
+    try:
+        upload_text_to_supabase(SRC_BUCKET, f"{job_folder}/leaderboard.json", leaderboard)
+    except Exception as e:
+        logging.error(f"Failed to upload leaderboard for {job_folder}: {e}")
+    print("\n==================== SHORTLIST ====================")
+    print(f"Scored {stats['scored']} of {stats['candidates']} resumes ({stats['failed']} failed, "
+          f"{stats['pruned']} pruned by the estimated score bound; the shortlist is approximate)")
+    print(f"{'Rank':<6}{'Resume':<50}{'Score':>8}")
+    for rank, (key, score, _) in enumerate(shortlist.ranked(), 1):
+        print(f"{rank:<6}{key:<50}{score:>8.0f}")
+    print(f"[INFO] Leaderboard written to {local_path}")
+    return shortlist
+
+def run_matrix_mode(job_folder, max_workers=4):
+    """
+    Score every resume of a job against every job description in the folder.
+    Each JD is extracted once and each resume parsed once; the N×M compatibility
+    calls run concurrently and produce a candidate × role score table.
+    """
+    from util.matrix_scoring import score_matrix, matrix_csv
+    jd_paths = list_jd_txt_files(job_folder)
+    _, resumes_txt_paths = list_txt_files(job_folder)
+    jd_texts = download_texts(jd_paths)
+    resume_texts = download_texts(resumes_txt_paths)
+    if not jd_texts or not resume_texts:
+        print("No job description or resumes found!")
+        sys.exit(1)
+    all_resume_paths = list(resume_texts)
+    resume_texts, duplicate_of = dedupe_texts(resume_texts)
+    print(f"[INFO] Scoring {len(resume_texts)} resume(s) × {len(jd_texts)} job description(s)")
+
+    def extract(text):
+        return job_description_agent({"job_description": text})["job_requirements"]
+
+    # Facts for a JD are computed for all resumes parsed so far in one batch (see FactsCache)
+    from util.resume_features import FactsCache
+    facts_cache = FactsCache() if PIPELINE_OPTIONS["precompute_facts"] else None
+
+    # Final states kept for the warehouse: parser metrics per parsed resume, compat state per (JD, resume)
+    parse_metrics, compat_states = {}, {}
+
+    def parse(text):
+        parsed_state = resume_parser_agent({"resume_text": text})
+        parsed_resume = parsed_state["parsed_resume"]
+        parse_metrics[parsed_resume] = parsed_state.get("stage_metrics") or {}
+        if facts_cache is not None:
+            facts_cache.add(parsed_resume)
+        return parsed_resume
+
+    def compat(job_requirements, parsed_resume):
+        import json
+        state = {"job_requirements": job_requirements, "parsed_resume": parsed_resume}
+        if facts_cache is not None:
+            state["precomputed_facts"] = json.dumps(facts_cache.get(job_requirements, parsed_resume),
+                                                    ensure_ascii=False)
+        state = compatibility_analyzer_agent(state)
+        compat_states[(job_requirements, parsed_resume)] = state
+        return get_compatibility_score(state)
+
+    job_requirements, parsed_resumes, scores = score_matrix(
+        jd_texts, resume_texts, extract, parse, compat, max_workers=max_workers)
+
+    for jd_path, requirements in job_requirements.items():
+        stem = os.path.splitext(os.path.basename(jd_path))[0]
+        upload_job_requirements(job_folder, requirements, f"{stem}.json")
+    for resume_txt_path, parsed_resume in parsed_resumes.items():
+        store_parsed_resume(resume_txt_path, parsed_resume)
+
+    # Duplicates get their representative's row
+    for path, rep in duplicate_of.items():
+        for jd_path in jd_texts:
+            scores[(path, jd_path)] = scores.get((rep, jd_path))
+    record_matrix_results(job_folder, job_requirements, parsed_resumes, parse_metrics, compat_states, duplicate_of)
+    jd_names = [os.path.splitext(os.path.basename(p))[0] for p in jd_texts]
+    resume_names = [os.path.splitext(os.path.basename(p))[0] for p in all_resume_paths]
+    named_scores = {
+        (os.path.splitext(os.path.basename(r))[0], os.path.splitext(os.path.basename(j))[0]): v
+        for (r, j), v in scores.items()
+    }
+    table = matrix_csv(named_scores, resume_names, jd_names)
+    local_path = f"score_matrix_{job_folder}.csv"
+    with open(local_path, "w", encoding="utf-8", newline="") as f:
+        f.write(table)
+    try:
+        upload_text_to_supabase(SRC_BUCKET, f"{job_folder}/score_matrix.csv", table)
+    except Exception as e:
+        logging.error(f"Failed to upload score matrix for {job_folder}: {e}")
+
+    print("\n==================== SCORE MATRIX ====================")
+    print(f"{'Resume':<30}" + "".join(f"{name[:18]:>20}" for name in jd_names))
+    for resume_name in resume_names:
+        cells = [named_scores.get((resume_name, jd_name)) for jd_name in jd_names]
+        print(f"{resume_name[:28]:<30}" + "".join(f"{'-' if v is None else f'{v:.0f}':>20}" for v in cells))
+    print(f"[INFO] Score matrix written to {local_path}")
+    return named_scores
+
+def record_matrix_results(job_folder, job_requirements, parsed_resumes, parse_metrics, compat_states, duplicate_of):
+    """
+    Warehouse rows for a score matrix, one run per JD (mode "matrix:<jd>"). Each
+    resume is parsed once for all JDs, so its parser tokens are only counted in
+    the first JD's rows.
+    """
+    for i, (jd_path, requirements) in enumerate(job_requirements.items()):
+        states = {}
+        for path, parsed_resume in parsed_resumes.items():
+            state = compat_states.get((requirements, parsed_resume))
+            if state is None:
+                continue
+            state = dict(state, parsed_resume=parsed_resume)
+            if i == 0:
+                state["stage_metrics"] = {**parse_metrics.get(parsed_resume, {}), **(state.get("stage_metrics") or {})}
+            states[path] = state
+        for path, rep in duplicate_of.items():
+            if rep in states:
+                states[path] = dict(states[rep], duplicate_of=rep)
+        stem = os.path.splitext(os.path.basename(jd_path))[0]
+        record_results(job_folder, list(states.items()), mode=f"matrix:{stem}")
+
+def run_batch_stage(client, stage, states, build_prompt, apply_response, model, temperature=0.0):
+    """
+    Render one stage's prompt for every state, submit them as a single batch and
+    apply the results back into the per-resume states. Items whose prompt could
+    not be rendered or whose request failed are dropped from later stages.
+    """
+    prompts = {}
+    for key, state in states.items():
         try:
-            validate_state(["job_description", "resume_text", "job_requirements"], state)
+            prompts[key] = build_prompt(state)
         except Exception as e:
-            logging.error(f"State validation error: {e}")
+            logging.error(f"[{stage}] Could not render prompt for {key}: {e}")
+    results = client.run(prompts, model=model, temperature=temperature, stage=stage)
+    completed = {}
+    for key, content in results.items():
+        if content is None:
+            logging.error(f"[{stage}] No batch result for {key}")
             continue
+        completed[key] = apply_response(states[key], prompts[key], content)
+    print(f"[INFO] Batch stage {stage}: {len(completed)}/{len(states)} succeeded")
+    return completed
 
-        # Run graph and print agentic output
+def run_batch_mode(job_folder, jd_txt_content, resumes_txt_paths):
+    """
+    Run the whole pipeline through an OpenAI-compatible Batch API, one batch per
+    stage (JD → parse → compatibility → audit). Cheaper and free of rate-limit
+    contention, but not latency-sensitive; meant for offline rescoring.
+    """
+    import json
+    from util.batch_backend import BatchClient
+    client = BatchClient()
+    jd_states = run_batch_stage(client, "job_description_agent", {"jd": {"job_description": jd_txt_content}},
+                                build_jd_prompt, apply_jd_response, jd_llm.model_name, jd_llm.temperature)
+    if "jd" not in jd_states:
+        print("❌ Job description extraction failed in batch mode.")
+        sys.exit(1)
+    job_requirements = jd_states["jd"].get("job_requirements", "{}")
+    upload_job_requirements(job_folder, job_requirements)
+
+    resume_texts, duplicate_of = dedupe_texts(download_texts(resumes_txt_paths))
+    states = {}
+    for resume_txt_path, resume_txt_content in resume_texts.items():
+        states[resume_txt_path] = {
+            "job_description": jd_txt_content,
+            "resume_text": resume_txt_content,
+            "job_requirements": job_requirements
+        }
+    states = run_batch_stage(client, "resume_parser_agent", states,
+                             build_resume_prompt, apply_resume_response, resume_llm.model_name, resume_llm.temperature)
+    for resume_txt_path, state in states.items():
+        store_parsed_resume(resume_txt_path, state.get("parsed_resume", "{}"))
+    precompute_facts_for(states.values())
+    states = run_batch_stage(client, "compatibility_analyzer_agent", states,
+                             build_compat_prompt, apply_compat_response, compat_llm.model_name, compat_llm.temperature)
+    states = run_batch_stage(client, "audit_agent", states,
+                             build_audit_prompt, apply_audit_response, audit_engine.model, audit_engine.temperature)
+    for path, rep in duplicate_of.items():
+        if rep in states:
+            states[path] = dict(states[rep], duplicate_of=rep)
+
+    print("\n==================== BATCH RESULTS ====================")
+    for resume_txt_path, state in states.items():
         try:
-            final_state = resume_graph.invoke(state)
-            import json
-            print("\n============================================================")
-            print(f"RESUME: {resume_txt_path}")
-            print("------------------------------------------------------------")
-            print("[Job Requirements]")
-            try:
-                job_req = json.loads(final_state.get("job_requirements", "{}"))
-                print(json.dumps(job_req, indent=2, ensure_ascii=False))
-            except Exception:
-                print(final_state.get("job_requirements", "{}"))
-            print("------------------------------------------------------------")
-            print("[Parsed Resume]")
-            try:
-                parsed_resume = json.loads(final_state.get("parsed_resume", "{}"))
-                print(json.dumps(parsed_resume, indent=2, ensure_ascii=False))
-            except Exception:
-                print(final_state.get("parsed_resume", "{}"))
-            print("------------------------------------------------------------")
-            print("[Compatibility Result]")
-            try:
-                comp_result = json.loads(final_state.get("compatibility_score", "{}"))
-                print(json.dumps(comp_result, indent=2, ensure_ascii=False))
-            except Exception:
-                comp_result = final_state.get("compatibility_score", "{}")
-                print(comp_result)
-
-            print("------------------------------------------------------------")
-            # --- Print audit agent output ---
-            print("[AuditAgent Output]:")
-            audit_result = state.get("audit_result", "{}")
-            try:
-                parsed_json = json.loads(audit_result)
-                print(json.dumps(parsed_json, indent=2, ensure_ascii=False))
-            except Exception:
-                print(audit_result)
-            results.append((resume_txt_path, final_state.get("compatibility_score", "N/A")))
-        except Exception as e:
-            logging.error(f"Error in agentic workflow for resume {resume_txt_path}: {e}")
-            logging.error(f"Full traceback: {traceback.format_exc()}")
-            continue
+            audit_status = json.loads(state.get("audit_result", "{}")).get("auditStatus")
+        except Exception:
+            audit_status = None
+        flag = f"  (duplicate of {state['duplicate_of']})" if state.get("duplicate_of") else ""
+        print(f"{resume_txt_path:<50}{str(get_compatibility_score(state)):>8}  {audit_status}{flag}")
+    record_results(job_folder, list(states.items()), mode="batch")
+    return states
 
-    # --- Print token/cost summary table ---
-    AGENT_PRICING = {
-        "job_description_agent": {"input": 0.0005, "output": 0.0015},
-        "resume_parser_agent": {"input": 0.0005, "output": 0.0015},
-        "compatibility_analyzer_agent": {"input": 0.0005, "output": 0.0015},
-        "audit_agent": {"input": 0.0005, "output": 0.0015},
+def run_enqueue_mode(job_folder, jd_txt_content, job_requirements, resumes_txt_paths):
+    """Coordinator: register the job and enqueue one scoring task per resume."""
+    from util.work_queue import open_queue
+    queue = open_queue()
+    try:
+        queue.add_job(job_folder, jd_txt_content, job_requirements)
+        added = queue.enqueue(job_folder, resumes_txt_paths)
+        print(f"✅ Enqueued {added} new task(s) for {job_folder} "
+              f"({len(resumes_txt_paths) - added} already queued) in {queue.path}")
+        print(queue.status_report(job_folder))
+    finally:
+        queue.close()
+
+def score_resume_path(resume_graph, jd_txt_content, job_requirements, resume_txt_path, resume_txt_content=None,
+                      store=True):
+    """
+    Download (unless the text is given), score and store one resume.
+    Returns the final graph state; raises if the resume cannot be scored.
+    """
+    if resume_txt_content is None:
+        resume_txt_content = download_txt(SRC_BUCKET, resume_txt_path)
+        if resume_txt_content is None:
+            raise LookupError(f"Could not download {resume_txt_path}")
+    state = {
+        "job_description": jd_txt_content,
+        "resume_text": resume_txt_content,
+        "job_requirements": job_requirements
+    }
+    final_state = resume_graph.invoke(state)
+    if store and not resume_txt_path.startswith("<"):
+        store_parsed_resume(resume_txt_path, final_state.get("parsed_resume", "{}"))
+    return final_state
+
+def resume_result(resume_txt_path, final_state):
+    """JSON-serializable summary of a scored resume (queue results, service responses)."""
+    return {
+        "resume_path": resume_txt_path,
+        "score": get_compatibility_score(final_state),
+        "compatibility_score": final_state.get("compatibility_score"),
+        "audit_result": final_state.get("audit_result"),
+    }
+
+def process_queue_task(resume_graph, job, task, scored=None):
+    """Worker: score one (job, resume) task with the resume graph. Returns the task result."""
+    final_state = score_resume_path(resume_graph, job["job_description"], job["job_requirements"],
+                                    task["resume_path"])
+    print_resume_result(task["resume_path"], final_state)
+    if scored is not None:
+        scored.setdefault(task["job_folder"], []).append((task["resume_path"], final_state))
+    return resume_result(task["resume_path"], final_state)
+
+def run_worker_mode(follow=False):
+    """Worker: lease tasks from the shared queue until it is drained (or forever with follow)."""
+    from util.work_queue import open_queue, run_worker, worker_id
+    queue = open_queue()
+    resume_graph = create_resume_graph()
+    worker = worker_id()
+    scored = {}
+    print(f"👷 Worker {worker} polling {queue.path}")
+    try:
+        done, failed = run_worker(queue, lambda job, task: process_queue_task(resume_graph, job, task, scored),
+                                  worker=worker, follow=follow)
+        print(f"Worker {worker} finished: {done} done, {failed} failed")
+    finally:
+        queue.close()
+        for job_folder, results in scored.items():
+            record_results(job_folder, results, mode="worker")
+
+def run_service(host="127.0.0.1", port=8000, max_concurrency=4):
+    """
+    Resident HTTP scoring service (see util/scoring_service.py). The compiled
+    graph, clients and per-job requirements stay warm across submissions.
+    """
+    import uvicorn
+    from util.scoring_service import ScoringService
+    resume_graph = create_resume_graph()
+    jobs = {}
+    folder_locks = defaultdict(threading.Lock)
+    locks_lock = threading.Lock()
+
+    def prepare_job(job_folder, refresh=False):
+        # Job requirements are extracted once per job folder and reused by later submissions.
+        # The lock is per folder, so a slow extraction only delays submissions for the same job.
+        with locks_lock:
+            folder_lock = folder_locks[job_folder]
+        with folder_lock:
+            if refresh or job_folder not in jobs:
+                jd_txt_path, resumes_txt_paths = list_txt_files(job_folder)
+                jd_txt_content = download_txt(SRC_BUCKET, jd_txt_path)
+                if jd_txt_content is None:
+                    raise LookupError(f"Could not load job description file: {jd_txt_path}")
+                job_requirements = extract_job_requirements(job_folder, jd_txt_content)
+                jobs[job_folder] = ((jd_txt_content, job_requirements), resumes_txt_paths)
+            return jobs[job_folder]
+
+    def score_resume(job_context, resume_txt_path, resume_txt_content=None):
+        jd_txt_content, job_requirements = job_context
+        final_state = score_resume_path(resume_graph, jd_txt_content, job_requirements,
+                                        resume_txt_path, resume_txt_content)
+        print(f"✅ Scored {resume_txt_path}: {get_compatibility_score(final_state)}")
+        return resume_result(resume_txt_path, final_state)
+
+    service = ScoringService(prepare_job, score_resume, max_concurrency=max_concurrency)
+    print(f"🚀 Scoring service listening on http://{host}:{port} (max {max_concurrency} resumes in flight)")
+    uvicorn.run(service.app(), host=host, port=port, log_level="warning")
+
+def run_watch_mode(interval=60, watch_dir=None, backfill=False, once=False):
+    """
+    Poll job folders (Supabase, or a local directory) and score only resumes that
+    appeared or changed since the last poll (see util/watch.py). Job requirements
+    are extracted once per job description and cached in the watch state.
+    """
+    from util.watch import WatchState, LocalSource, SupabaseSource, watch
+    source = LocalSource(watch_dir) if watch_dir else SupabaseSource(supabase, SRC_BUCKET)
+    resume_graph = create_resume_graph()
+
+    def extract(job_folder, jd_txt_content):
+        if watch_dir:
+            # Local jobs have nowhere to upload to; the requirements live in the watch state
+            return job_description_agent({"job_description": jd_txt_content}).get("job_requirements", "{}")
+        return extract_job_requirements(job_folder, jd_txt_content)
+
+    def score(job_folder, jd_txt_content, job_requirements, resume_key, resume_txt_content, store):
+        final_state = score_resume_path(resume_graph, jd_txt_content, job_requirements,
+                                        resume_key, resume_txt_content, store=store)
+        print_resume_result(resume_key, final_state)
+        return final_state
+
+    def job_done(job_folder, results):
+        record_results(job_folder, results, mode="watch")
+
+    try:
+        watch(source, WatchState(), extract, score, interval=interval, backfill=backfill,
+              once=once, on_job_done=job_done)
+    except KeyboardInterrupt:
+        print("\n👋 Watch stopped")
+
+def run_dry_run(job_folders, concurrency=4):
+    """
+    Plan a run without calling the LLM: render every agent prompt for the given
+    jobs, count tokens, predict outputs from historical ratios and estimate cost
+    and wall-clock time per stage (see util/estimator.py).
+    """
+    from util.estimator import load_history, make_stages, plan_job, format_plan
+    from util.dedup import DuplicateDetector
+    models = {
+        "job_description_agent": jd_llm.model_name,
+        "resume_parser_agent": resume_llm.model_name,
+        "compatibility_analyzer_agent": compat_llm.model_name,
+        "audit_agent": audit_engine.model,
+    }
+    stages = make_stages(models, AGENT_PRICING, load_history())
+
+    def tokens(agent, text):
+        return count_tokens(text, model=models[agent])
+
+    # Prompt templates with empty inputs; the inputs' own tokens are added per resume
+    empty = {"resume_text": "", "job_requirements": "{}", "parsed_resume": "{}", "compatibility_score": "{}"}
+    try:
+        compat_template = build_compat_prompt(dict(empty))
+    except Exception:
+        compat_template = COMP_PROMPT or ""
+    templates = {
+        "resume_parser_agent": tokens("resume_parser_agent", build_resume_prompt(dict(empty))),
+        "compatibility_analyzer_agent": tokens("compatibility_analyzer_agent", compat_template),
+        "audit_agent": tokens("audit_agent", build_audit_prompt(dict(empty))),
     }
+    # The parser-side options shape the plan the same way they shape a run. Prompt templates are
+    # rendered by the agents' own builders, so the compact prompts are already counted.
+    optimisations, not_modelled, pack = [], [], None
+    if PIPELINE_OPTIONS["compact"]:
+        optimisations.append("compact prompts")
+        not_modelled.append("--compact output keys (outputs use full-schema ratios)")
+    if PIPELINE_OPTIONS["project_fields"]:
+        not_modelled.append("--project-fields (compat/audit inputs counted unprojected)")
+    if PIPELINE_OPTIONS["hybrid_parse"]:
+        optimisations.append("hybrid pre-parse")
+    if PIPELINE_OPTIONS["pack"] and RESUME_PACKED_PROMPT is not None:
+        from util.packing import render_packed
+        optimisations.append(f"packing (≤{PIPELINE_OPTIONS['pack_size']} resumes, "
+                             f"≤{PIPELINE_OPTIONS['pack_tokens']} tokens per call)")
+        pack = (tokens("resume_parser_agent", render_packed(RESUME_PACKED_PROMPT, [])),
+                PIPELINE_OPTIONS["pack_tokens"], PIPELINE_OPTIONS["pack_size"])
+    total_resumes = total_duplicates = planned_jobs = 0
+    for job_folder in job_folders:
+        try:
+            jd_txt_path, resumes_txt_paths = list_txt_files(job_folder)
+        except SystemExit:
+            print(f"⚠️ Skipping {job_folder}: no parsed job description or resumes")
+            continue
+        jd_txt_content = download_txt_cached(jd_txt_path)
+        if jd_txt_content is None:
+            print(f"⚠️ Skipping {job_folder}: could not load {jd_txt_path}")
+            continue
+        texts = download_texts(resumes_txt_paths, fetch=download_txt_cached)
+        detector = DuplicateDetector() if PIPELINE_OPTIONS["dedup"] else None
+        resume_tokens = []
+        for path, text in texts.items():
+            if detector is not None and detector.add(path, text) is not None:
+                total_duplicates += 1
+                continue
+            if PIPELINE_OPTIONS["hybrid_parse"]:
+                text = preparse(text)["text"]
+            resume_tokens.append(tokens("resume_parser_agent", text))
+        plan_job(stages, tokens("job_description_agent", build_jd_prompt({"job_description": jd_txt_content})),
+                 resume_tokens, templates, pack=pack)
+        total_resumes += len(texts)
+        planned_jobs += 1
+        print(f"📋 {job_folder}: {len(texts)} resume(s), {len(resume_tokens)} to score")
+    rpm = float(os.getenv("LLM_RPM", "0")) or None
+    tpm = float(os.getenv("LLM_TPM", "0")) or None
+    print(format_plan(stages, planned_jobs, total_resumes, total_duplicates, concurrency, rpm, tpm, optimisations,
+                      not_modelled))
+
+def print_resume_result(resume_txt_path, final_state, similarity=None):
+    import json
+    print("\n============================================================")
+    print(f"RESUME: {resume_txt_path}")
+    if final_state.get("duplicate_of"):
+        print(f"⚠️ Duplicate of {final_state['duplicate_of']} (similarity {similarity or 1.0:.2f}) — result reused")
+    print("------------------------------------------------------------")
+    print("[Job Requirements]")
+    try:
+        job_req = json.loads(final_state.get("job_requirements", "{}"))
+        print(json.dumps(job_req, indent=2, ensure_ascii=False))
+    except Exception:
+        print(final_state.get("job_requirements", "{}"))
+    print("------------------------------------------------------------")
+    print("[Parsed Resume]")
+    try:
+        parsed_resume = json.loads(final_state.get("parsed_resume", "{}"))
+        print(json.dumps(parsed_resume, indent=2, ensure_ascii=False))
+    except Exception:
+        print(final_state.get("parsed_resume", "{}"))
+    print("------------------------------------------------------------")
+    print("[Compatibility Result]")
+    try:
+        comp_result = json.loads(final_state.get("compatibility_score", "{}"))
+        print(json.dumps(comp_result, indent=2, ensure_ascii=False))
+    except Exception:
+        print(final_state.get("compatibility_score", "{}"))
+
+    print("------------------------------------------------------------")
+    # --- Print audit agent output ---
+    print("[AuditAgent Output]:")
+    audit_result = final_state.get("audit_result", "{}")
+    try:
+        parsed_json = json.loads(audit_result)
+        print(json.dumps(parsed_json, indent=2, ensure_ascii=False))
+    except Exception:
+        print(audit_result)
+
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", ".text_cache")
+
+def download_txt_cached(src_path):
+    """download_txt with a local on-disk copy, so repeated dry runs do not hit storage again."""
+    local_path = os.path.join(TEXT_CACHE_DIR, src_path)
+    if os.path.exists(local_path):
+        with open(local_path, encoding="utf-8") as f:
+            return f.read()
+    text = download_txt(SRC_BUCKET, src_path)
+    if text is not None:
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
+
+def download_texts(paths, fetch=None):
+    """Download {path: text} concurrently (bounded by the prefetch depth), skipping failures."""
+    from util.prefetch import prefetch
+    texts = {}
+    fetch = fetch or (lambda p: download_txt(SRC_BUCKET, p))
+    for path, text, error in prefetch(paths, fetch,
+                                      depth=PIPELINE_OPTIONS["prefetch_depth"]):
+        if error is None:
+            texts[path] = text
+    return texts
+
+def dedupe_texts(texts):
+    """
+    Drop near-duplicate resumes from {path: text} before the LLM stages.
+    Returns (unique_texts, duplicate_of) where duplicate_of maps each dropped
+    path to the representative whose result it should reuse.
+    """
+    if not PIPELINE_OPTIONS["dedup"]:
+        return texts, {}
+    from util.dedup import find_duplicates
+    representatives, duplicate_of = find_duplicates(texts)
+    if duplicate_of:
+        print(f"[INFO] {len(duplicate_of)} duplicate resume(s) will reuse the result of their original:")
+        for path, rep in duplicate_of.items():
+            print(f"  • {path} → {rep}")
+    return {path: texts[path] for path in representatives}, duplicate_of
+
+def print_token_summary():
     print("==================== TOKEN & COST SUMMARY ====================")
     print(f"{'Agent':<28}{'Calls':>7}{'Input':>12}{'Output':>12}{'Cost($)':>12}")
     print("-"*71)
@@ -523,6 +1474,310 @@ def main():
     print(f"{'TOTAL':<28}{sum(token_stats[a]['calls'] for a in AGENT_PRICING):>7}{sum(token_stats[a]['input'] for a in AGENT_PRICING):>12}{sum(token_stats[a]['output'] for a in AGENT_PRICING):>12}{total_cost:>12.4f}")
     print("============================================================")
 
+def print_run_summary():
+    """Token/cost table plus the optional per-feature summaries enabled for this run."""
+    print_token_summary()
+    if PIPELINE_OPTIONS["stream"]:
+        print(stream_stats.summary())
+    if PIPELINE_OPTIONS["project_fields"]:
+        print(projector.summary())
+    if PIPELINE_OPTIONS["hybrid_parse"] and preparse_stats.resumes:
+        print(preparse_stats.summary())
+    if PIPELINE_OPTIONS["pack"] and pack_stats.packs:
+        print(pack_stats.summary())
+    if audit_engine.audits:
+        print(audit_engine.summary())
+    if PIPELINE_OPTIONS["hedge"]:
+        print(hedger.summary(cancellable=PIPELINE_OPTIONS["stream"]))
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Resume Filtering Agentic Workflow")
+    parser.add_argument("--build-index", action="store_true",
+                        help="Sync the local candidate index with parsed resumes of every job folder")
+    parser.add_argument("--reverse-search", metavar="JOB_REQUIREMENTS_JSON",
+                        help="Score the best indexed candidates from all jobs against a job_requirements JSON file")
+    parser.add_argument("--top-k", type=int, default=10,
+                        help="Number of candidates returned by --reverse-search (default: 10)")
+    parser.add_argument("--shortlist", type=int, metavar="K",
+                        help="Approximately find the best K resumes: scoring stops once an estimated (not guaranteed) "
+                             "score bound says no remaining resume would enter the top-K")
+    parser.add_argument("--min-score", type=float, default=0,
+                        help="Minimum compatibilityScore to enter the shortlist (default: 0)")
+    parser.add_argument("--matrix", action="store_true",
+                        help="Score every resume against every job description in the selected job folder")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Concurrent LLM calls for --matrix/--fan-out, resumes in flight for --serve (default: 4)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit each stage as one OpenAI-compatible Batch API job (BATCH_BASE_URL) "
+                             "instead of synchronous calls")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Score every resume even if it is a (near-)duplicate of another one")
+    parser.add_argument("--prefetch", type=int, default=4, metavar="N",
+                        help="Number of resume texts downloaded ahead of scoring (default: 4)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream LLM responses and stop as soon as the JSON object is complete")
+    parser.add_argument("--compact", action="store_true",
+                        help="Ask the parser and compatibility agents for compact output keys "
+                             "(expanded back to the full schema)")
+    parser.add_argument("--precompute-facts", action="store_true",
+                        help="Compute skill overlap, years of experience and location fit in Python and "
+                             "pass them to the compatibility prompt as given facts")
+    parser.add_argument("--hybrid-parse", action="store_true",
+                        help="Extract contact fields and section boundaries with rules (util/preparse.py); "
+                             "the parser LLM only interprets the remaining sections")
+    parser.add_argument("--pack", action="store_true",
+                        help="Parse several short resumes per resume_parser_agent call; entries that come back "
+                             "incomplete or misaligned are parsed again individually")
+    parser.add_argument("--pack-tokens", type=int, default=DEFAULT_MAX_TOKENS,
+                        help=f"Resume tokens per packed parser call (default: {DEFAULT_MAX_TOKENS})")
+    parser.add_argument("--pack-size", type=int, default=DEFAULT_MAX_ITEMS,
+                        help=f"Resumes per packed parser call (default: {DEFAULT_MAX_ITEMS})")
+    parser.add_argument("--project-fields", action="store_true",
+                        help="Send the compatibility and audit agents only the job/resume fields they use "
+                             "(see util/projection.py, override with PROJECTIONS_PATH)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Issue a duplicate request when an LLM call outlives the rolling p95 for its "
+                             "model and stage; the first valid JSON response wins")
+    parser.add_argument("--hedge-budget", type=float, default=hedger.budget,
+                        help="Maximum fraction of calls that may be hedged (default: HEDGE_BUDGET or 0.05)")
+    parser.add_argument("--no-warehouse", action="store_true",
+                        help="Do not append this run's results to the local Parquet warehouse (WAREHOUSE_PATH)")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Coordinator: enqueue one task per resume of the selected job in the work queue "
+                             "(WORK_QUEUE_PATH) instead of scoring them here")
+    parser.add_argument("--worker", action="store_true",
+                        help="Worker: lease and score tasks from the work queue until it is empty")
+    parser.add_argument("--follow", action="store_true",
+                        help="With --worker, keep polling for new tasks instead of exiting when the queue is empty")
+    parser.add_argument("--queue-status", action="store_true",
+                        help="Print task counts, active leases and dead letters of the work queue")
+    parser.add_argument("--requeue-dead", action="store_true",
+                        help="Give dead-lettered tasks a fresh set of attempts")
+    parser.add_argument("--serve-queue", action="store_true",
+                        help="Serve the work queue file over HTTP (--host/--port) for workers on other hosts; "
+                             "they connect with WORK_QUEUE_URL")
+    parser.add_argument("--fan-out", action="store_true",
+                        help="Run JD extraction and resume parsing concurrently in one fan-out/fan-in graph "
+                             "(--workers branches at once)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Estimate tokens, cost and wall-clock time for the selected job(s) without calling the LLM")
+    parser.add_argument("--job", action="append", metavar="JOB_FOLDER",
+                        help="Job folder for --dry-run (repeatable, or 'all'); default: interactive selection")
+    parser.add_argument("--watch", action="store_true",
+                        help="Poll job-documents/*/resumes/ and score only newly uploaded resumes "
+                             "(cursor kept in WATCH_STATE_PATH)")
+    parser.add_argument("--watch-dir", metavar="DIR",
+                        help="With --watch, poll DIR/<job>/resumes/ on the local disk instead of Supabase")
+    parser.add_argument("--interval", type=int, default=60,
+                        help="Seconds between --watch polls (default: 60)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="With --watch, also score resumes already present on the first poll of a source")
+    parser.add_argument("--once", action="store_true",
+                        help="With --watch, run a single poll cycle and exit (e.g. from cron)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the resident HTTP scoring service instead of an interactive run")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Host for --serve (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="Port for --serve (default: 8000)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    PIPELINE_OPTIONS["precompute_facts"] = args.precompute_facts
+    PIPELINE_OPTIONS["dedup"] = not args.no_dedup
+    PIPELINE_OPTIONS["prefetch_depth"] = max(1, args.prefetch)
+    PIPELINE_OPTIONS["stream"] = args.stream
+    PIPELINE_OPTIONS["compact"] = args.compact
+    PIPELINE_OPTIONS["project_fields"] = args.project_fields
+    PIPELINE_OPTIONS["hybrid_parse"] = args.hybrid_parse
+    PIPELINE_OPTIONS["pack"] = args.pack
+    PIPELINE_OPTIONS["pack_tokens"] = max(1, args.pack_tokens)
+    PIPELINE_OPTIONS["pack_size"] = max(1, args.pack_size)
+    PIPELINE_OPTIONS["warehouse"] = not args.no_warehouse
+    PIPELINE_OPTIONS["hedge"] = args.hedge
+    hedger.budget = max(0.0, args.hedge_budget)
+    if args.hedge:
+        hedger.configure(max(1, args.workers))
+    if args.build_index or args.reverse_search:
+        if args.build_index:
+            build_candidate_index()
+        if args.reverse_search:
+            run_reverse_search(args.reverse_search, top_k=args.top_k)
+            print_run_summary()
+        return
+    if args.dry_run:
+        if args.job:
+            job_folders = list_job_folders() if "all" in args.job else args.job
+        else:
+            job_folders = [run_job_document_detail()]
+        run_dry_run(job_folders, concurrency=max(1, args.workers))
+        return
+    if args.watch:
+        run_watch_mode(max(1, args.interval), args.watch_dir, backfill=args.backfill, once=args.once)
+        print_run_summary()
+        return
+    if args.serve:
+        run_service(args.host, args.port, max_concurrency=max(1, args.workers))
+        return
+    if args.serve_queue:
+        from util.work_queue import serve_queue
+        serve_queue(args.host, args.port)
+        return
+    if args.worker or args.queue_status or args.requeue_dead:
+        from util.work_queue import open_queue
+        if args.requeue_dead:
+            queue = open_queue()
+            print(f"Requeued {queue.requeue_dead()} dead-lettered task(s)")
+            queue.close()
+        if args.worker:
+            run_worker_mode(follow=args.follow)
+            print_run_summary()
+        if args.queue_status:
+            queue = open_queue()
+            print(queue.status_report())
+            queue.close()
+        return
+
+    print("\n==== Resume Filtering Agentic Workflow ====")
+    # 1. Run job-document_detail.py and trigger parsing
+    job_folder = run_job_document_detail()
+    print(f"Selected job: {job_folder}")
+
+    if args.matrix:
+        run_matrix_mode(job_folder, max_workers=args.workers)
+        print_run_summary()
+        return
+
+    # 2. Fetch parsed .txt files from Supabase
+    jd_txt_path, resumes_txt_paths = list_txt_files(job_folder)
+    jd_txt_content = download_txt(SRC_BUCKET, jd_txt_path)
+    parsed_folder = f"{job_folder}/parsed"
+
+    # 3. Run job_description_agent ONCE and cache job_requirements
+    if jd_txt_content is None:
+        print(f"❌ Could not load job description file: {jd_txt_path}. Please check if the file exists in Supabase and try again.")
+        sys.exit(1)
+    if args.batch:
+        run_batch_mode(job_folder, jd_txt_content, resumes_txt_paths)
+        print_run_summary()
+        return
+
+    if args.fan_out:
+        run_fan_out_mode(job_folder, jd_txt_content, resumes_txt_paths, max_workers=args.workers)
+        print_run_summary()
+        return
+
+    job_requirements = extract_job_requirements(job_folder, jd_txt_content)
+
+    if args.enqueue:
+        run_enqueue_mode(job_folder, jd_txt_content, job_requirements, resumes_txt_paths)
+        return
+
+    if args.shortlist:
+        run_shortlist_mode(job_folder, jd_txt_content, job_requirements, resumes_txt_paths,
+                           k=args.shortlist, min_score=args.min_score)
+        print_run_summary()
+        return
+
+    # 4. Create the graph for resumes (job_requirements is already cached in the state)
+    resume_graph = create_resume_graph()
+
+    # 5. For each resume, run agentic workflow
+    from util.dedup import DuplicateDetector
+    detector = DuplicateDetector() if PIPELINE_OPTIONS["dedup"] else None
+    final_states = {}
+    results = []
+    scored = []
+    # Resume texts are downloaded ahead of the graph so storage latency overlaps with LLM calls
+    from util.prefetch import prefetch, PrefetchStats
+    prefetch_stats = PrefetchStats()
+    downloads = prefetch(resumes_txt_paths, lambda path: download_txt(SRC_BUCKET, path),
+                         depth=PIPELINE_OPTIONS["prefetch_depth"], stats=prefetch_stats)
+    # With --pack or --precompute-facts, resumes are buffered so several share one parser call / facts batch
+    pending = []
+    buffered = PIPELINE_OPTIONS["pack"] or PIPELINE_OPTIONS["precompute_facts"]
+    window = PIPELINE_OPTIONS["pack_size"] * 2
+
+    def run_resume(resume_txt_path, state):
+        # Run graph and print agentic output
+        try:
+            final_state = resume_graph.invoke(state)
+            final_states[resume_txt_path] = final_state
+            store_parsed_resume(resume_txt_path, final_state.get("parsed_resume", "{}"))
+            print_resume_result(resume_txt_path, final_state)
+            results.append((resume_txt_path, final_state.get("compatibility_score", "N/A")))
+            scored.append((resume_txt_path, final_state))
+        except Exception as e:
+            logging.error(f"Error in agentic workflow for resume {resume_txt_path}: {e}")
+            logging.error(f"Full traceback: {traceback.format_exc()}")
+
+    def run_duplicate(resume_txt_path, rep):
+        if rep not in final_states:
+            logging.error(f"Skipping {resume_txt_path}: duplicate of {rep}, which failed to score")
+            return
+        final_state = dict(final_states[rep], duplicate_of=rep)
+        print_resume_result(resume_txt_path, final_state, similarity=detector.similarity[resume_txt_path])
+        results.append((resume_txt_path, final_state.get("compatibility_score", "N/A")))
+        scored.append((resume_txt_path, final_state))
+
+    def flush():
+        if PIPELINE_OPTIONS["pack"]:
+            pack_parse_resumes({path: state for path, state, rep in pending if rep is None})
+        if PIPELINE_OPTIONS["precompute_facts"]:
+            # Parse the window up front (the graph then skips the parser) so its facts come from one batch
+            for resume_txt_path, state, rep in pending:
+                if rep is None and not state.get("parsed_resume"):
+                    try:
+                        resume_parser_agent(state)
+                    except Exception as e:
+                        logging.error(f"Error parsing resume {resume_txt_path}: {e}")
+            precompute_facts_for(state for _, state, rep in pending if rep is None)
+        for resume_txt_path, state, rep in pending:
+            if rep is None:
+                run_resume(resume_txt_path, state)
+            else:
+                run_duplicate(resume_txt_path, rep)
+        pending.clear()
+
+    for resume_txt_path, resume_txt_content, error in downloads:
+        if error is not None:
+            logging.error(f"Error downloading resume {resume_txt_path}: {error}")
+            continue
+
+        # Near-duplicates reuse the result of the first copy instead of rerunning the LLM chain
+        rep = detector.add(resume_txt_path, resume_txt_content) if detector is not None else None
+        if rep is not None:
+            pending.append((resume_txt_path, None, rep))
+            if not buffered:
+                flush()
+            continue
+
+        # State for workflow (reuse job_requirements)
+        state = {
+            "job_description": jd_txt_content,
+            "resume_text": resume_txt_content,
+            "job_requirements": job_requirements
+        }
+
+        try:
+            validate_state(["job_description", "resume_text", "job_requirements"], state)
+        except Exception as e:
+            logging.error(f"State validation error: {e}")
+            continue
+
+        pending.append((resume_txt_path, state, None))
+        if not buffered or sum(rep is None for _, _, rep in pending) >= window:
+            flush()
+    flush()
+
+    print(prefetch_stats.summary())
+    record_results(job_folder, scored)
+
+    # --- Print token/cost summary table ---
+    print_run_summary()
+
     if not results:
         print("No compatibility scores generated!")
 
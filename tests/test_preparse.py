@@ -0,0 +1,32 @@
+from util.preparse import preparse, split_sections
+
+RESUME = """Jane Doe
+jane.doe@example.com | +91 98765 43210 | linkedin.com/in/janedoe
+SKILLS
+Python, SQL
+technologies
+Leadership
+Docker
+Work Experience:
+Data Engineer, Acme (2020 - 2022)
+Declaration
+I hereby declare that the above is true.
+"""
+
+
+def test_alias_words_used_as_content_are_kept():
+    result = preparse(RESUME)
+    # A lowercase alias on its own line is content, not a heading
+    assert "technologies" in result["text"]
+    # A capitalised one is taken as a heading but its text is kept
+    assert "Leadership" in result["text"]
+    assert "Docker" in result["text"]
+    assert result["contacts"]["contactEmail"] == "jane.doe@example.com"
+    assert "jane.doe@example.com" not in result["text"]
+    assert "I hereby declare" not in result["text"]
+
+
+def test_headings_need_heading_case_or_colon():
+    header, sections = split_sections("Jane Doe\nskills\nPython\nEXPERIENCE\nAcme\nprojects:\nParser")
+    assert header == "Jane Doe\nskills\nPython"
+    assert sections == [("EXPERIENCE", "Acme"), ("PROJECTS", "Parser")]
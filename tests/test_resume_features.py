@@ -0,0 +1,32 @@
+import json
+
+from util.resume_features import canonical_skill, compute_facts, compute_facts_batch
+
+JOB = json.dumps({"Skills required for the job": [
+    "Experience with distributed systems", "REST API design", "Python", "Go", "Machine learning"]})
+
+
+def test_phrase_style_job_skills_match_resume_terms():
+    resume = json.dumps({"skills": ["Distributed Systems", "REST APIs", "Python 3", "Design", "Django"]})
+    facts = compute_facts(JOB, resume)
+    assert facts["matchedSkills"] == ["Experience with distributed systems", "REST API design", "Python"]
+    # A single generic word is not enough for a longer phrase, and "go" is not matched inside "django"
+    assert facts["missingSkills"] == ["Go", "Machine learning"]
+    assert facts["skillMatchPercentage"] == 60.0
+
+
+def test_canonical_skill_drops_phrasing_and_plurals():
+    assert canonical_skill("Strong knowledge of REST APIs") == canonical_skill("rest api")
+    assert canonical_skill("Communication skills") == "communication"
+    assert canonical_skill("Data analysis") == "data analysis"
+
+
+def test_batch_matches_single_resume_facts():
+    resumes = [json.dumps({"skills": ["machine-learning"]}),
+               json.dumps({"projects": [{"technologiesUsed": "Go, gRPC"}]}),
+               json.dumps({})]
+    batch = compute_facts_batch(JOB, resumes)
+    assert batch == [compute_facts(JOB, r) for r in resumes]
+    assert batch[0]["matchedSkills"] == ["Machine learning"]
+    assert batch[1]["matchedSkills"] == ["Go"]
+    assert batch[2]["matchedSkills"] == []
@@ -0,0 +1,59 @@
+import os
+
+from util.watch import WatchState, LocalSource, poll_once
+
+
+class TextSource(LocalSource):
+    """LocalSource whose "PDFs" are plain text files, so no PDF parsing is needed."""
+
+    def read_text(self, job_folder, name, resume=True):
+        folder = os.path.join(self.root, job_folder, "resumes" if resume else "")
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            return f.read()
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _poll(source, state, scored, backfill=False):
+    def score(job_folder, jd_text, job_requirements, key, text, store):
+        scored.append((job_folder, os.path.basename(key)))
+        return {}
+    return poll_once(source, state, lambda job_folder, jd_text: "{}", score, backfill=backfill)
+
+
+def test_existing_resumes_are_baselined_but_new_jobs_are_scored(tmp_path):
+    root = tmp_path / "jobs"
+    _write(str(root / "job_a" / "jd.pdf"), "Python developer")
+    _write(str(root / "job_a" / "resumes" / "old.pdf"), "Old resume")
+    source = TextSource(str(root))
+    state = WatchState(str(tmp_path / "state.json"))
+    scored = []
+
+    assert _poll(source, state, scored) == 0
+
+    # A job created while the watcher runs is new work, including the resumes it starts with
+    _write(str(root / "job_b" / "jd.pdf"), "Data engineer")
+    _write(str(root / "job_b" / "resumes" / "first.pdf"), "First resume")
+    _write(str(root / "job_a" / "resumes" / "new.pdf"), "New resume")
+    assert _poll(source, state, scored) == 2
+    assert sorted(scored) == [("job_a", "new.pdf"), ("job_b", "first.pdf")]
+
+    # The cursor survives a restart and nothing is rescored
+    assert _poll(source, WatchState(state.path), scored) == 0
+
+
+def test_backfill_scores_existing_resumes_on_first_poll_only(tmp_path):
+    root = tmp_path / "jobs"
+    _write(str(root / "job_a" / "jd.pdf"), "Python developer")
+    _write(str(root / "job_a" / "resumes" / "old.pdf"), "Old resume")
+    source = TextSource(str(root))
+    state = WatchState(str(tmp_path / "state.json"))
+    scored = []
+
+    assert _poll(source, state, scored, backfill=True) == 1
+    assert _poll(source, state, scored, backfill=True) == 0
+    assert scored == [("job_a", "old.pdf")]
@@ -0,0 +1,40 @@
+import time
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from util.work_queue import WorkQueue, RemoteWorkQueue, queue_app, run_worker
+
+
+def test_many_expired_leases_are_dead_lettered_without_recursion(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=1)
+    queue.add_job("job", "JD", "{}")
+    queue.enqueue("job", [f"job/parsed/r{i}.txt" for i in range(3000)] + ["job/parsed/last.txt"])
+    # Every task but the last one used its only attempt and its lease has expired
+    queue.conn.execute("UPDATE tasks SET status = 'leased', attempts = 1, worker = 'gone', lease_until = ? "
+                       "WHERE resume_path != 'job/parsed/last.txt'", (time.time() - 1,))
+
+    task = queue.lease("w1")
+    assert task["resume_path"] == "job/parsed/last.txt"
+    assert queue.counts()["job"] == {"dead": 3000, "leased": 1}
+    queue.close()
+
+
+def test_remote_workers_lease_and_ack_through_the_queue_server(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    client = TestClient(queue_app(queue, token="secret"))
+    remote = RemoteWorkQueue("http://testserver", token="secret", client=client)
+    remote.add_job("job", "JD", '{"Job Title": "Engineer"}')
+    assert remote.enqueue("job", ["job/parsed/a.txt", "job/parsed/b.txt"]) == 2
+
+    done, failed = run_worker(remote, lambda job, task: {"title": job["job_requirements"], "id": task["id"]},
+                              worker="host-b:1")
+    assert (done, failed) == (2, 0)
+    assert [row["resume_path"] for row in queue.results("job")] == ["job/parsed/a.txt", "job/parsed/b.txt"]
+    assert "job" in remote.status_report()
+
+    unauthorized = RemoteWorkQueue("http://testserver", client=TestClient(queue_app(queue, token="secret")))
+    with pytest.raises(httpx.HTTPStatusError):
+        unauthorized.counts()
+    queue.close()
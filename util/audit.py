@@ -1,14 +1,34 @@
 import os
+import re
 import json
+import time
+import random
 import logging
+import threading
 import traceback
-from typing import Dict, List, Any, Tuple
-from datetime import datetime
-import re
+from typing import Dict, Any, Optional
+from logging.handlers import RotatingFileHandler
 from langchain_openai import ChatOpenAI
-from collections import defaultdict
 
-# Token tracking (reuse from main.py)
+# Audit engine shared by main.py's audit_agent and audit_resume_analysis().
+# The prompt template and the LLM client are loaded once per process and the
+# engine holds no per-resume state, so one instance can be used by concurrent
+# workers. Raw responses and parse failures are not printed: they go to a
+# size-bounded diagnostic log (AUDIT_DEBUG_LOG), where every failure and a
+# sample of the successes (AUDIT_DEBUG_SAMPLE) are recorded. The time spent
+# outside the LLM call (prompt rendering, parsing, logging) is measured per audit.
+
+AUDIT_PROMPT_PATH = "prompts/audit_agent.txt"
+AUDIT_MODEL = "llama-3.3-70b-versatile"
+DEBUG_LOG_PATH = os.getenv("AUDIT_DEBUG_LOG", "audit_agent_debug.jsonl")
+DEBUG_SAMPLE_RATE = float(os.getenv("AUDIT_DEBUG_SAMPLE", "0.01"))
+DEBUG_MAX_BYTES = int(os.getenv("AUDIT_DEBUG_MAX_BYTES", str(1024 * 1024)))
+PROMPT_PREVIEW_CHARS = 1000
+
+_BLOCK_RE = re.compile(r'\{[\s\S]*\}')
+_TRAILING_COMMA_RE = re.compile(r',([\s\n]*[}\]])')
+
+
 def count_tokens(text, model="gpt-4"):
     try:
         import tiktoken
@@ -17,130 +37,148 @@ def count_tokens(text, model="gpt-4"):
     except Exception:
         return max(1, len(text) // 4)
 
-def add_token_stats(agent, input_tokens, output_tokens):
-    """Add token statistics - assumes token_stats is imported from main"""
-    pass  # Implementation depends on your token tracking system
 
-class AuditResumeAgent:
+class DiagnosticLog:
+    """JSON-lines log capped at max_bytes (one rotated backup); successes are sampled, failures always kept."""
+
+    def __init__(self, path=None, sample_rate=None, max_bytes=None):
+        self.path = path or DEBUG_LOG_PATH
+        self.sample_rate = DEBUG_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_bytes = max_bytes or DEBUG_MAX_BYTES
+        self._logger = None
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def _get_logger(self):
+        # The file is only opened once something is actually logged
+        with self._lock:
+            if self._logger is None:
+                logger = logging.getLogger(f"audit.diagnostics.{id(self)}")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=1,
+                                              encoding="utf-8", delay=True)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                self._logger = logger
+            return self._logger
+
+    def record(self, event, failed=False, **fields):
+        if not failed and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return
+        entry = {"ts": time.time(), "event": event, **fields}
+        self._get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+        with self._lock:
+            self.written += 1
+
+
+class AuditEngine:
     """
-    LLM-powered agent that audits compatibility analysis for accuracy,
-    completeness, and potential bias.
+    LLM-powered audit of a compatibility analysis for accuracy, completeness
+    and potential bias. Create once and share; every method is thread-safe.
     """
-    
-    def __init__(self, model="llama-3.1-8b-instant"):
+
+    def __init__(self, model=AUDIT_MODEL, temperature=0.1, prompt_path=AUDIT_PROMPT_PATH,
+                 timeout=None, diagnostics=None, usage_fn=None):
+        self.model = model
+        self.temperature = temperature
+        self.prompt_path = prompt_path
         self.llm = ChatOpenAI(
             model=model,
             base_url="https://api.groq.com/openai/v1",
             openai_api_key=os.getenv("GROQ_API_KEY"),
-            temperature=0.1  # Slightly higher for more nuanced analysis
+            temperature=temperature,
+            timeout=timeout
         )
-        
-        with open("prompts/audit_agent.txt", "r", encoding="utf-8") as f:
-            self.audit_prompt = f.read()
-    
-    def audit_analysis(self, job_requirements: str, parsed_resume: str, 
-                      compatibility_result: str, guard_results: Dict) -> Dict[str, Any]:
+        try:
+            with open(prompt_path, "r", encoding="utf-8") as f:
+                self.prompt = f.read()
+        except Exception as e:
+            logging.error(f"Failed to load audit prompt '{prompt_path}': {e}")
+            self.prompt = None
+        self.diagnostics = diagnostics or DiagnosticLog()
+        # usage_fn(agent, input_tokens, output_tokens) for the caller's token tracking
+        self.usage_fn = usage_fn
+        self._lock = threading.Lock()
+        self.audits = 0
+        self.overhead = 0.0
+        self.max_overhead = 0.0
+
+    def build_prompt(self, job_requirements: str, parsed_resume: str, compatibility_result: str) -> str:
+        if self.prompt is None:
+            raise RuntimeError(f"Prompt not loaded from {self.prompt_path}")
+        prompt = self.prompt.replace("{{job_requirements}}", job_requirements)
+        prompt = prompt.replace("{{parsed_resume}}", parsed_resume)
+        return prompt.replace("{{compatibility_result}}", compatibility_result)
+
+    def parse_response(self, content: str, prompt: str = "") -> Optional[Dict[str, Any]]:
+        """The audit JSON object in an LLM response (repaired if needed), or None."""
+        match = _BLOCK_RE.search(content or "")
+        candidates = [match.group(0), self._repair_json(match.group(0))] if match else []
+        for attempt, block in enumerate(candidates):
+            try:
+                result = json.loads(block)
+            except Exception:
+                continue
+            if isinstance(result, dict):
+                self.diagnostics.record("parsed", repaired=attempt > 0, prompt=prompt[:PROMPT_PREVIEW_CHARS],
+                                        response=content)
+                return result
+        self.diagnostics.record("unparseable", failed=True, prompt=prompt[:PROMPT_PREVIEW_CHARS], response=content)
+        return None
+
+    def record_overhead(self, seconds):
+        with self._lock:
+            self.audits += 1
+            self.overhead += seconds
+            self.max_overhead = max(self.max_overhead, seconds)
+
+    def summary(self):
+        mean = self.overhead / self.audits if self.audits else 0.0
+        lines = ["==================== AUDIT ENGINE ====================",
+                 f"{self.audits} audit(s); overhead outside the LLM call {mean * 1000:.2f} ms avg, "
+                 f"{self.max_overhead * 1000:.2f} ms max; {self.diagnostics.written} diagnostic entr"
+                 f"{'y' if self.diagnostics.written == 1 else 'ies'} in {self.diagnostics.path}"]
+        return "\n".join(lines)
+
+    def audit_analysis(self, job_requirements: str, parsed_resume: str,
+                       compatibility_result: str, guard_results: Dict = None) -> Dict[str, Any]:
         """
         Audit the compatibility analysis using LLM.
         """
         try:
-            # Prepare the prompt
-            prompt = self.audit_prompt
-            prompt = prompt.replace("{{job_requirements}}", job_requirements)
-            prompt = prompt.replace("{{parsed_resume}}", parsed_resume)
-            prompt = prompt.replace("{{compatibility_result}}", compatibility_result)
-            
-            # Get LLM response
+            start = time.perf_counter()
+            prompt = self.build_prompt(job_requirements, parsed_resume, compatibility_result)
+            llm_start = time.perf_counter()
             response = self.llm.invoke(prompt)
-            
-            # Token tracking
-            input_tokens = count_tokens(prompt, model="llama-3.3-70b-versatile")
-            output_tokens = count_tokens(response.content, model="llama-3.3-70b-versatile")
-            add_token_stats("audit_resume_agent", input_tokens, output_tokens)
-
-            # DEBUG: Print the raw LLM response
-            print("=== RAW AUDIT LLM RESPONSE ===")
-            print(response.content)
-            print("=============================")
-
-            # DIAGNOSTIC: Extract all JSON-like blocks and log parsing attempts
-            json_blocks = re.findall(r'\{[\s\S]*?\}', response.content)
-            print(f"[DIAGNOSTIC] Found {len(json_blocks)} JSON-like block(s) in LLM response.")
-            for i, block in enumerate(json_blocks):
-                print(f"[DIAGNOSTIC] Block {i+1}:\n{block}\n---")
-                # Try normal parse first
-                try:
-                    audit_result = json.loads(block)
-                    audit_result = self._validate_audit_result(audit_result)
-                    print(f"[DIAGNOSTIC] Successfully parsed block {i+1} as JSON.")
-                    return {
-                        "status": "SUCCESS",
-                        "audit_result": audit_result,
-                        "raw_response": response.content
-                    }
-                except json.JSONDecodeError as e:
-                    print(f"[DIAGNOSTIC] JSONDecodeError on block {i+1}: {e}")
-                    print(f"[DIAGNOSTIC] Malformed block {i+1} content:\n{block}\n---")
-                    # Try to repair JSON and parse again
-                    repaired = self._repair_json(block)
-                    if repaired:
-                        try:
-                            audit_result = json.loads(repaired)
-                            audit_result = self._validate_audit_result(audit_result)
-                            print(f"[DIAGNOSTIC] Successfully repaired and parsed block {i+1} as JSON.")
-                            return {
-                                "status": "SUCCESS",
-                                "audit_result": audit_result,
-                                "raw_response": response.content
-                            }
-                        except Exception as e2:
-                            print(f"[DIAGNOSTIC] Repair attempt failed for block {i+1}: {e2}")
-                    # Write the malformed block to a debug file for inspection
-                    try:
-                        with open("audit_agent_debug.json", "a", encoding="utf-8") as debug_f:
-                            debug_f.write(f"\n=== Block {i+1} ===\n")
-                            debug_f.write(block)
-                            debug_f.write("\n---\n")
-                    except Exception as file_err:
-                        print(f"[DIAGNOSTIC] Failed to write debug file: {file_err}")
-                except Exception as e:
-                    print(f"[DIAGNOSTIC] Unexpected error on block {i+1}: {e}")
-                except json.JSONDecodeError as e:
-                    print(f"[DIAGNOSTIC] JSONDecodeError on block {i+1}: {e}")
-                    print(f"[DIAGNOSTIC] Malformed block {i+1} content:\n{block}\n---")
-                    # Write the malformed block to a debug file for inspection
-                    try:
-                        with open("audit_agent_debug.json", "a", encoding="utf-8") as debug_f:
-                            debug_f.write(f"\n=== Block {i+1} ===\n")
-                            debug_f.write(block)
-                            debug_f.write("\n---\n")
-                    except Exception as file_err:
-                        print(f"[DIAGNOSTIC] Failed to write debug file: {file_err}")
-
-                except Exception as e:
-                    print(f"[DIAGNOSTIC] Unexpected error on block {i+1}: {e}")
-            # If none succeeded
-            print("[DIAGNOSTIC] No valid JSON block could be parsed from LLM response.")
-            return {
-                "status": "ERROR",
-                "error": "No JSON found in LLM response",
-                "raw_response": response.content
-            }
-                
+            llm_end = time.perf_counter()
+            content = response.content
+
+            if self.usage_fn is not None:
+                self.usage_fn("audit_resume_agent", count_tokens(prompt, model=self.model),
+                              count_tokens(content, model=self.model))
+            audit_result = self.parse_response(content, prompt)
+            if audit_result is None:
+                result = {"status": "ERROR", "error": "No JSON found in LLM response", "raw_response": content}
+            else:
+                result = {"status": "SUCCESS", "audit_result": self._validate_audit_result(audit_result),
+                          "raw_response": content}
+            self.record_overhead((llm_start - start) + (time.perf_counter() - llm_end))
+            return result
+
         except Exception as e:
             logging.error(f"Audit agent error: {e}")
-            logging.error(f"Full traceback: {traceback.format_exc()}")
+            self.diagnostics.record("error", failed=True, error=str(e), traceback=traceback.format_exc())
             return {
                 "status": "ERROR",
                 "error": str(e),
                 "raw_response": ""
             }
-    
+
     def _repair_json(self, s: str) -> str:
         """Attempt to auto-close braces and fix common LLM JSON issues."""
         # Remove trailing commas
-        import re
-        s = re.sub(r',([\s\n]*[}\]])', r'\1', s)
+        s = _TRAILING_COMMA_RE.sub(r'\1', s)
         # Try to auto-close braces/brackets
         open_braces = s.count('{')
         close_braces = s.count('}')
@@ -159,12 +197,12 @@ class AuditResumeAgent:
         try:
             # Ensure required fields exist
             required_fields = [
-                "auditScore", "originalScore", "recommendedScore", 
+                "auditScore", "originalScore", "recommendedScore",
                 "accuracyAssessment", "completenessReview", "biasAnalysis",
                 "scoringRationale", "concerns", "strengths", "recommendations",
                 "finalDecision", "confidence", "auditNotes"
             ]
-            
+
             for field in required_fields:
                 if field not in audit_result:
                     if field in ["concerns", "strengths", "recommendations"]:
@@ -175,18 +213,18 @@ class AuditResumeAgent:
                         audit_result[field] = 0
                     else:
                         audit_result[field] = "Not assessed"
-            
+
             # Validate score ranges
             for score_field in ["auditScore", "originalScore", "recommendedScore"]:
                 if not isinstance(audit_result[score_field], (int, float)):
                     audit_result[score_field] = 0
                 audit_result[score_field] = max(0, min(100, audit_result[score_field]))
-            
+
             # Validate confidence
             if not isinstance(audit_result["confidence"], (int, float)):
                 audit_result["confidence"] = 0.5
             audit_result["confidence"] = max(0.0, min(1.0, audit_result["confidence"]))
-            
+
             # Validate final decision
             valid_decisions = ["ACCEPT", "REVIEW", "REJECT"]
             if audit_result["finalDecision"] not in valid_decisions:
@@ -198,9 +236,9 @@ class AuditResumeAgent:
                     audit_result["finalDecision"] = "REVIEW"
                 else:
                     audit_result["finalDecision"] = "REJECT"
-            
+
             return audit_result
-            
+
         except Exception as e:
             logging.error(f"Audit result validation error: {e}")
             return {
@@ -219,10 +257,30 @@ class AuditResumeAgent:
                 "auditNotes": f"Validation error: {str(e)}"
             }
 
+
+class AuditResumeAgent(AuditEngine):
+    """Standalone auditor with its original default model."""
+
+    def __init__(self, model="llama-3.1-8b-instant", **kwargs):
+        super().__init__(model=model, **kwargs)
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_audit_engine() -> AuditEngine:
+    """Process-wide engine used by audit_resume_analysis()."""
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = AuditResumeAgent()
+        return _default_engine
+
+
 def audit_resume_analysis(job_requirements: str, parsed_resume: str, compatibility_result: str) -> dict:
     """
     Run the LLM-powered audit agent on the compatibility result.
     Returns the audit result as a dictionary.
     """
-    auditor = AuditResumeAgent()
-    return auditor.audit_analysis(job_requirements, parsed_resume, compatibility_result, guard_results=None)
\ No newline at end of file
+    return get_audit_engine().audit_analysis(job_requirements, parsed_resume, compatibility_result,
+                                             guard_results=None)
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import logging
+import requests
+
+# Offline execution backend for an OpenAI-compatible Batch API (/files + /batches).
+# All prompts of one pipeline stage are rendered into a single JSONL file,
+# submitted as one batch, polled until it finishes, and the results are mapped
+# back to their items by custom_id.
+
+BATCH_BASE_URL = os.getenv("BATCH_BASE_URL", "https://api.groq.com/openai/v1")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(24 * 3600)))
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_jsonl(prompts, model, temperature=0.0):
+    """Render {custom_id: prompt} into Batch API JSONL request lines."""
+    lines = []
+    for custom_id, prompt in prompts.items():
+        lines.append(json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": temperature,
+            },
+        }, ensure_ascii=False))
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(jsonl_text):
+    """Map a batch output file to {custom_id: content}; failed requests map to None."""
+    results = {}
+    for line in jsonl_text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except Exception as e:
+            logging.error(f"[Batch] Unreadable output line: {e}")
+            continue
+        custom_id = record.get("custom_id")
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code", 200) != 200:
+            logging.error(f"[Batch] Request {custom_id} failed: {record.get('error') or response.get('body')}")
+            results[custom_id] = None
+            continue
+        try:
+            results[custom_id] = response["body"]["choices"][0]["message"]["content"]
+        except Exception:
+            logging.error(f"[Batch] Request {custom_id} returned no message content")
+            results[custom_id] = None
+    return results
+
+
+class BatchClient:
+    """Minimal client for the /files and /batches endpoints."""
+
+    def __init__(self, base_url=None, api_key=None, poll_interval=None, timeout=None):
+        self.base_url = (base_url or BATCH_BASE_URL).rstrip("/")
+        self.api_key = api_key or os.getenv("GROQ_API_KEY", "")
+        self.poll_interval = BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.timeout = BATCH_TIMEOUT if timeout is None else timeout
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {self.api_key}"
+
+    def _url(self, path):
+        return f"{self.base_url}{path}"
+
+    def upload(self, jsonl_text, filename="batch.jsonl"):
+        resp = self.session.post(self._url("/files"), data={"purpose": "batch"},
+                                 files={"file": (filename, jsonl_text.encode("utf-8"), "application/jsonl")})
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    def create(self, input_file_id, metadata=None):
+        resp = self.session.post(self._url("/batches"), json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+            "metadata": metadata or {},
+        })
+        resp.raise_for_status()
+        return resp.json()
+
+    def retrieve(self, batch_id):
+        resp = self.session.get(self._url(f"/batches/{batch_id}"))
+        resp.raise_for_status()
+        return resp.json()
+
+    def content(self, file_id):
+        resp = self.session.get(self._url(f"/files/{file_id}/content"))
+        resp.raise_for_status()
+        return resp.text
+
+    def wait(self, batch_id):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            batch = self.retrieve(batch_id)
+            if batch.get("status") in TERMINAL_STATUSES:
+                return batch
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Batch {batch_id} did not finish within {self.timeout:.0f}s")
+            counts = batch.get("request_counts") or {}
+            logging.info(f"[Batch] {batch_id} {batch.get('status')}: "
+                         f"{counts.get('completed', 0)}/{counts.get('total', '?')} done")
+            time.sleep(self.poll_interval)
+
+    def run(self, prompts, model, temperature=0.0, stage="batch"):
+        """
+        Submit {custom_id: prompt} as one batch and block until it finishes.
+        Returns {custom_id: content}; items that failed or are missing map to None.
+        """
+        if not prompts:
+            return {}
+        file_id = self.upload(build_batch_jsonl(prompts, model, temperature), filename=f"{stage}.jsonl")
+        batch = self.create(file_id, metadata={"stage": stage})
+        logging.info(f"[Batch] Submitted {len(prompts)} {stage} request(s) as {batch['id']}")
+        batch = self.wait(batch["id"])
+        results = {}
+        if batch.get("output_file_id"):
+            results.update(parse_batch_output(self.content(batch["output_file_id"])))
+        if batch.get("error_file_id"):
+            for custom_id in parse_batch_output(self.content(batch["error_file_id"])):
+                results.setdefault(custom_id, None)
+        if batch.get("status") != "completed":
+            logging.error(f"[Batch] {batch['id']} ended with status {batch.get('status')}")
+        return {custom_id: results.get(custom_id) for custom_id in prompts}
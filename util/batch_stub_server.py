@@ -0,0 +1,150 @@
+import re
+import sys
+import json
+import uuid
+import threading
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for an OpenAI-compatible Batch API, for testing the batch
+# backend offline. Batches complete on the first status poll; every request is
+# answered by `responder(body) -> str` (default: an empty JSON object).
+#
+# Usage: python util/batch_stub_server.py --port 8765
+#        BATCH_BASE_URL=http://127.0.0.1:8765/v1 python main.py --batch
+
+
+def default_responder(body):
+    return "{}"
+
+
+class BatchStubServer:
+    def __init__(self, host="127.0.0.1", port=0, responder=default_responder, prefix="/v1"):
+        self.responder = responder
+        self.prefix = prefix
+        self.files = {}
+        self.batches = {}
+        self.lock = threading.RLock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.prefix}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _store_file(self, content, purpose):
+        file_id = f"file_{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "purpose": purpose, "bytes": len(content)}
+
+    def _run_batch(self, batch):
+        lines = self.files.get(batch["input_file_id"], "").splitlines()
+        out = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            content = self.responder(request.get("body", {}))
+            out.append(json.dumps({
+                "id": f"req_{uuid.uuid4().hex[:8]}",
+                "custom_id": request.get("custom_id"),
+                "response": {"status_code": 200, "body": {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                }},
+                "error": None,
+            }))
+        output = self._store_file("\n".join(out) + "\n", "batch_output")
+        batch.update({
+            "status": "completed",
+            "output_file_id": output["id"],
+            "request_counts": {"total": len(out), "completed": len(out), "failed": 0},
+        })
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, content_type="application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _path(self):
+                return self.path[len(server.prefix):] if self.path.startswith(server.prefix) else self.path
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                path = self._path()
+                if path == "/files":
+                    boundary = self.headers.get("Content-Type", "").split("boundary=")[-1].encode()
+                    content = b""
+                    for part in raw.split(b"--" + boundary):
+                        if b'name="file"' in part:
+                            content = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+                    return self._send(200, server._store_file(content.decode("utf-8"), "batch"))
+                if path == "/batches":
+                    params = json.loads(raw or b"{}")
+                    batch = {
+                        "id": f"batch_{uuid.uuid4().hex[:12]}",
+                        "object": "batch",
+                        "status": "validating",
+                        "input_file_id": params.get("input_file_id"),
+                        "endpoint": params.get("endpoint"),
+                        "metadata": params.get("metadata"),
+                    }
+                    with server.lock:
+                        server.batches[batch["id"]] = batch
+                    return self._send(200, batch)
+                return self._send(404, {"error": {"message": f"Unknown path {path}"}})
+
+            def do_GET(self):
+                path = self._path()
+                match = re.fullmatch(r"/batches/([\w-]+)", path)
+                if match and match.group(1) in server.batches:
+                    with server.lock:
+                        batch = server.batches[match.group(1)]
+                        if batch["status"] not in ("completed", "failed"):
+                            server._run_batch(batch)
+                    return self._send(200, batch)
+                match = re.fullmatch(r"/files/([\w-]+)/content", path)
+                if match and match.group(1) in server.files:
+                    return self._send(200, server.files[match.group(1)].encode("utf-8"), "application/jsonl")
+                return self._send(404, {"error": {"message": f"Unknown path {path}"}})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible Batch API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = BatchStubServer(args.host, args.port)
+    print(f"Batch stub listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from util.wire_codec import RESUME_SPEC, COMPAT_SPEC, compress, expand, is_lossless, schema_keys
+
+# Benchmark for the compact output schemas.
+# Offline: token counts of sample outputs in the full vs compact wire format and
+# a compress → expand round-trip check.
+# Live (--live resume.txt): runs the resume parser with both prompts, measuring
+# real output tokens and latency, and checks that the expanded compact output
+# has the same schema as the full one.
+#
+# Usage: python util/bench_wire_codec.py [--tokens-per-second 200] [--live resume.txt]
+
+SAMPLE_RESUME = {
+    "fullName": "Jane Doe",
+    "contactEmail": "jane.doe@example.com",
+    "contactPhoneNumber": "+1 555 0100",
+    "linkedInProfileURL": "https://linkedin.com/in/janedoe",
+    "personalWebsitePortfolioURL": "https://janedoe.dev",
+    "location": "Austin, TX",
+    "summaryObjectiveStatement": "Machine learning engineer with 6 years of experience shipping NLP systems.",
+    "higherSecondaryEducation": [
+        {"schoolName": "Westlake High School", "board": "State", "yearOfCompletion": "2012", "percentageGrade": "3.9 GPA"}
+    ],
+    "education": [
+        {"degree": "M.S.", "major": "Computer Science", "university": "UT Austin", "graduationYear": "2018", "percentageGrade": None},
+        {"degree": "B.S.", "major": "Mathematics", "university": "Texas A&M", "graduationYear": "2016", "percentageGrade": None},
+    ],
+    "workExperience": [
+        {"jobTitle": "Senior ML Engineer", "company": "Acme", "duration": "Jan 2021 - Present", "location": "Remote",
+         "responsibilities": ["Built retrieval pipeline serving 2M queries/day", "Led a team of 4 engineers"]},
+        {"jobTitle": "ML Engineer", "company": "Initech", "duration": "Jun 2018 - Dec 2020", "location": "Austin, TX",
+         "responsibilities": ["Trained intent classifiers", "Reduced inference latency by 40%"]},
+    ],
+    "projects": [
+        {"projectName": "Resume Ranker", "description": "Open-source resume ranking tool",
+         "technologiesUsed": ["Python", "PyTorch", "FastAPI"]}
+    ],
+    "skills": ["Python", "PyTorch", "SQL", "AWS", "Docker", "Kubernetes"],
+    "softSkills": ["Leadership", "Communication"],
+    "certifications": ["AWS Certified Machine Learning - Specialty"],
+    "languagesKnown": ["English", "Spanish"],
+    "awardsHonors": ["Hackathon winner 2019"],
+    "hobbiesInterests": ["Cycling"],
+    "extracurricularActivities": [
+        {"activityName": "PyData Austin", "description": "Meetup organizer", "achievements": None, "duration": "2019 - 2022"}
+    ],
+}
+
+SAMPLE_COMPAT = {
+    "compatibilityScore": 82,
+    "executiveSummary": "Strong ML background closely matching the role. Recommend interview.",
+    "analysis": {
+        "strengths": ["6 years of applied ML", "Production NLP experience"],
+        "weaknesses": ["No Spark experience"],
+        "skillAnalysis": {"matchedSkills": ["Python", "PyTorch", "AWS"], "missingSkills": ["Spark"],
+                          "skillGapsRationale": "Spark is learnable given the distributed systems background."},
+        "experienceFit": {"seniorityFit": "Appropriate", "domainRelevance": "High",
+                          "yearsOfExperience": "6 years (meets 5+ year requirement)"},
+        "cultureAndGrowth": {"culturalFit": "Community involvement suggests collaboration.",
+                             "growthPotential": "Led a team; certification shows continuous learning."},
+    },
+    "logisticalCheck": {"locationCompatibility": "Match", "workArrangement": "Remote",
+                        "certificationsAlignment": "N/A", "languageFit": "English"},
+    "potentialRedFlags": [],
+}
+
+
+def count_tokens(text, model="gpt-4"):
+    try:
+        import tiktoken
+        enc = tiktoken.encoding_for_model(model)
+        return len(enc.encode(text))
+    except Exception:
+        return max(1, len(text) // 4)
+
+
+def offline_report(tokens_per_second):
+    print(f"{'Schema':<16}{'Full(pretty)':>14}{'Full(min)':>11}{'Compact':>9}{'Saved':>8}{'Est. ms saved':>15}{'Lossless':>10}")
+    for name, sample, spec in [("resume_parser", SAMPLE_RESUME, RESUME_SPEC), ("compatibility", SAMPLE_COMPAT, COMPAT_SPEC)]:
+        pretty = count_tokens(json.dumps(sample, indent=2, ensure_ascii=False))
+        minified = count_tokens(json.dumps(sample, separators=(",", ":"), ensure_ascii=False))
+        compact = count_tokens(json.dumps(compress(sample, spec), separators=(",", ":"), ensure_ascii=False))
+        saved = 1 - compact / pretty
+        ms_saved = (pretty - compact) / tokens_per_second * 1000
+        print(f"{name:<16}{pretty:>14}{minified:>11}{compact:>9}{saved:>8.0%}{ms_saved:>15.0f}{str(is_lossless(sample, spec)):>10}")
+
+
+def _extract(content):
+    match = re.search(r'\{[\s\S]*\}', content)
+    return json.loads(match.group(0)) if match else None
+
+
+def live_report(resume_path):
+    from dotenv import load_dotenv
+    from langchain_openai import ChatOpenAI
+    load_dotenv()
+    llm = ChatOpenAI(
+        model="llama-3.1-8b-instant",
+        base_url="https://api.groq.com/openai/v1",
+        openai_api_key=os.getenv("GROQ_API_KEY"),
+        temperature=0.0
+    )
+    with open(resume_path, encoding="utf-8") as f:
+        resume_text = f.read()
+    outputs = {}
+    for mode, prompt_path in [("full", "prompts/resume_parser_prompt.txt"),
+                              ("compact", "prompts/resume_parser_prompt_compact.txt")]:
+        with open(prompt_path, encoding="utf-8") as f:
+            prompt = f.read().replace("{{resume_text}}", resume_text)
+        start = time.perf_counter()
+        content = llm.invoke(prompt).content
+        elapsed = time.perf_counter() - start
+        outputs[mode] = _extract(content)
+        print(f"{mode:<8} output tokens {count_tokens(content):>6}   latency {elapsed:>6.2f}s")
+    if outputs["full"] is None or outputs["compact"] is None:
+        print("❌ One of the responses contained no JSON object.")
+        return
+    full = expand(outputs["full"], RESUME_SPEC)
+    compact = expand(outputs["compact"], RESUME_SPEC)
+    same_schema = schema_keys(full) == schema_keys(compact)
+    print(f"Expanded compact output has the full schema: {same_schema}")
+    if not same_schema:
+        print(f"  only in full:    {sorted(schema_keys(full) - schema_keys(compact))}")
+        print(f"  only in compact: {sorted(schema_keys(compact) - schema_keys(full))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compact vs full output schemas")
+    parser.add_argument("--tokens-per-second", type=float, default=200,
+                        help="Decode speed used to estimate latency savings (default: 200)")
+    parser.add_argument("--live", metavar="RESUME_TXT", help="Also run the resume parser live on this file")
+    args = parser.parse_args()
+    offline_report(args.tokens_per_second)
+    if args.live:
+        live_report(args.live)
+
+
+if __name__ == "__main__":
+    main()
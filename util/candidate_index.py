@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import zlib
+import logging
+import numpy as np
+
+# Hashed TF-IDF index over parsed resumes, used for cross-job reverse search.
+# Term frequencies are stored in a dense NumPy matrix (one row per candidate)
+# and IDF weights are applied at query time, so adds/deletes never require a
+# rebuild of the existing rows. A fingerprint of the source file (eTag) is kept
+# per candidate so a sync can tell when a parsed resume was overwritten.
+
+N_FEATURES = 4096
+INDEX_PATH = os.getenv("CANDIDATE_INDEX_PATH", "candidate_index.npz")
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+# Fields of the parsed resume / job requirements schemas that carry signal
+RESUME_FIELDS = [
+    "summaryObjectiveStatement", "skills", "softSkills", "certifications",
+    "workExperience", "projects", "education",
+]
+JOB_FIELDS = [
+    "Job Title", "The Role of the Job", "Responsibilities required for the job",
+    "Skills required for the job", "Soft Skills required for the job",
+    "Experience required for the job", "Education qualification needed for the job",
+    "Industry", "Seniority Level",
+]
+
+
+def _load_json(data):
+    if isinstance(data, dict):
+        return data
+    try:
+        parsed = json.loads(data)
+        return parsed if isinstance(parsed, dict) else {}
+    except Exception:
+        return {}
+
+
+def _flatten(value):
+    """Yield every string found in a nested JSON value."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _flatten(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from _flatten(v)
+
+
+def document_text(data, fields):
+    """Concatenate the text of the selected top-level fields of a JSON document."""
+    doc = _load_json(data)
+    return " ".join(s for f in fields for s in _flatten(doc.get(f)))
+
+
+def tokenize(text):
+    tokens = [t.rstrip(".") for t in _TOKEN_RE.findall(text.lower())]
+    tokens = [t for t in tokens if t]
+    # Bigrams keep multi-word skills ("machine learning") distinguishable
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def hash_vector(text, n_features=N_FEATURES):
+    """Sublinear term-frequency vector of `text` in the hashed feature space."""
+    vec = np.zeros(n_features, dtype=np.float32)
+    tokens = tokenize(text)
+    if not tokens:
+        return vec
+    idx = np.fromiter((zlib.crc32(t.encode("utf-8")) % n_features for t in tokens),
+                      dtype=np.int64, count=len(tokens))
+    np.add.at(vec, idx, 1.0)
+    nz = vec > 0
+    vec[nz] = 1.0 + np.log(vec[nz])
+    return vec
+
+
+class CandidateIndex:
+    """
+    In-memory candidate index with incremental add/remove and top-K cosine
+    search against a job requirements JSON.
+    """
+
+    def __init__(self, n_features=N_FEATURES):
+        self.n_features = n_features
+        self.keys = []
+        self._positions = {}
+        self._rows = np.zeros((0, n_features), dtype=np.float32)
+        self.df = np.zeros(n_features, dtype=np.float32)
+        self.fingerprints = {}
+        self._norm_cache = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    @property
+    def matrix(self):
+        return self._rows[:len(self.keys)]
+
+    def fingerprint(self, key):
+        return self.fingerprints.get(key)
+
+    def add(self, key, parsed_resume, fingerprint=None):
+        """Add (or replace) a candidate from its parsed_resume JSON."""
+        vec = hash_vector(document_text(parsed_resume, RESUME_FIELDS), self.n_features)
+        if key in self._positions:
+            self.remove(key)
+        size = len(self.keys)
+        if size == self._rows.shape[0]:
+            grown = np.zeros((max(64, size * 2), self.n_features), dtype=np.float32)
+            grown[:size] = self._rows[:size]
+            self._rows = grown
+        self._rows[size] = vec
+        self.df += vec > 0
+        self._norm_cache = None
+        self._positions[key] = size
+        self.keys.append(key)
+        self.fingerprints[key] = fingerprint
+
+    def remove(self, key):
+        """Remove a candidate; the last row is swapped into its slot."""
+        pos = self._positions.pop(key, None)
+        if pos is None:
+            return False
+        self.fingerprints.pop(key, None)
+        self.df -= self._rows[pos] > 0
+        last = len(self.keys) - 1
+        if pos != last:
+            self._rows[pos] = self._rows[last]
+            self.keys[pos] = self.keys[last]
+            self._positions[self.keys[pos]] = pos
+        self._rows[last] = 0
+        self.keys.pop()
+        self._norm_cache = None
+        return True
+
+    def query(self, job_requirements, top_k=10):
+        """Return [(key, score)] of the top_k candidates for a job_requirements JSON."""
+        n = len(self.keys)
+        if n == 0:
+            return []
+        idf = np.log((1.0 + n) / (1.0 + self.df)) + 1.0
+        q = hash_vector(document_text(job_requirements, JOB_FIELDS), self.n_features) * idf
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return []
+        docs = self.matrix
+        if self._norm_cache is None:
+            # IDF-weighted row norms only change when the index changes
+            self._norm_cache = np.maximum(np.sqrt((docs * docs) @ (idf * idf)), 1e-9)
+        scores = (docs @ (q * idf)) / (self._norm_cache * q_norm)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[i], float(scores[i])) for i in top]
+
+    def save(self, path=INDEX_PATH):
+        np.savez_compressed(path, rows=self.matrix, df=self.df,
+                            keys=np.array(json.dumps(self.keys)),
+                            fingerprints=np.array(json.dumps(self.fingerprints)))
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """Load an index from disk, or return an empty one if it does not exist."""
+        if not os.path.exists(path):
+            return cls()
+        try:
+            data = np.load(path)
+            index = cls(n_features=data["rows"].shape[1])
+            index._rows = data["rows"].astype(np.float32)
+            index.df = data["df"].astype(np.float32)
+            index.keys = json.loads(str(data["keys"]))
+            index._positions = {k: i for i, k in enumerate(index.keys)}
+            # Indexes saved before fingerprints existed have none, so their files are re-read once
+            if "fingerprints" in data.files:
+                index.fingerprints = json.loads(str(data["fingerprints"]))
+            index._norm_cache = None
+            return index
+        except Exception as e:
+            logging.error(f"Failed to load candidate index '{path}': {e}")
+            return cls()
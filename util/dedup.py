@@ -0,0 +1,138 @@
+import re
+import zlib
+import hashlib
+import numpy as np
+
+# Near-duplicate resume detection over the extracted .txt files.
+# Exact copies are caught by a hash of the normalized text; lightly edited copies
+# by MinHash signatures over word shingles, bucketed with LSH banding and
+# confirmed by the estimated Jaccard similarity. Detection is incremental, so
+# resumes can be checked one at a time as they are downloaded.
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+THRESHOLD = 0.8
+# Multiply-shift hash family: h(x) = (a*x + b) >> 32 with wrapping uint64 arithmetic
+_rng = np.random.default_rng(1729)
+_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_EMPTY = np.uint64(2 ** 32)
+_WORD_RE = re.compile(r"[a-z0-9@.+#]+")
+_WORD_HASHES = {}
+_WORD_CACHE_LIMIT = 500_000
+
+
+def _word_hash(word):
+    h = _WORD_HASHES.get(word)
+    if h is None:
+        if len(_WORD_HASHES) >= _WORD_CACHE_LIMIT:
+            _WORD_HASHES.clear()
+        h = _WORD_HASHES[word] = zlib.crc32(word.encode("utf-8"))
+    return h
+
+
+def normalize(text):
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def exact_hash(text):
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text, size=SHINGLE_SIZE, normalized=False):
+    """Unique hashed word shingles of a text, as a uint64 array."""
+    words = (text if normalized else normalize(text)).split()
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter(map(_word_hash, words), dtype=np.uint64, count=len(words))
+    if len(words) < size:
+        combined = word_hashes[:1].copy()
+        for h in word_hashes[1:]:
+            combined = combined * np.uint64(1000003) + h
+    else:
+        # Rolling combination of `size` consecutive word hashes (wraps mod 2^64)
+        n = len(words) - size + 1
+        combined = word_hashes[:n].copy()
+        for offset in range(1, size):
+            combined = combined * np.uint64(1000003) + word_hashes[offset:offset + n]
+    return np.unique(combined & np.uint64(0xFFFFFFFF))
+
+
+def minhash(text, normalized=False):
+    """MinHash signature (NUM_PERM values) of a text's shingle set."""
+    x = shingles(text, normalized=normalized)
+    if x.size == 0:
+        return np.full(NUM_PERM, _EMPTY, dtype=np.uint64)
+    return ((x[:, None] * _A + _B) >> _SHIFT).min(axis=0)
+
+
+class DuplicateDetector:
+    """
+    Incremental exact + near-duplicate detector. `add` returns the key of the
+    earlier resume a new one duplicates (the group representative), or None if
+    the resume is new and becomes a representative itself.
+    """
+
+    def __init__(self, threshold=THRESHOLD, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self._exact = {}
+        self._signatures = {}
+        self._buckets = {}
+        self.duplicate_of = {}
+        self.similarity = {}
+
+    def add(self, key, text):
+        normalized = normalize(text)
+        if not normalized:
+            # Empty text (usually a failed PDF extraction) says nothing about identity: never group it
+            return None
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            rep = self._exact[digest]
+            self.duplicate_of[key] = rep
+            self.similarity[key] = 1.0
+            return rep
+        if normalized.count(" ") + 1 < SHINGLE_SIZE:
+            # Shorter than one shingle: the whole text is a single shingle, so MinHash could
+            # only ever confirm an exact copy. Compare by exact hash and keep it out of the LSH buckets
+            self._exact[digest] = key
+            return None
+        signature = minhash(normalized, normalized=True)
+        band_keys = [(b, signature[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+        candidates = {rep for band_key in band_keys for rep in self._buckets.get(band_key, ())}
+        best, best_sim = None, 0.0
+        for rep in candidates:
+            sim = float(np.mean(self._signatures[rep] == signature))
+            if sim > best_sim:
+                best, best_sim = rep, sim
+        if best is not None and best_sim >= self.threshold:
+            self.duplicate_of[key] = best
+            self.similarity[key] = best_sim
+            return best
+        # New representative
+        self._exact[digest] = key
+        self._signatures[key] = signature
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(key)
+        return None
+
+    def groups(self):
+        """{representative: [duplicate keys]} for every group with at least one duplicate."""
+        grouped = {}
+        for key, rep in self.duplicate_of.items():
+            grouped.setdefault(rep, []).append(key)
+        return grouped
+
+
+def find_duplicates(texts, threshold=THRESHOLD):
+    """
+    Group {key: text} into near-duplicate groups.
+    Returns (representatives, duplicate_of) where representatives keeps input order.
+    """
+    detector = DuplicateDetector(threshold)
+    representatives = [key for key, text in texts.items() if detector.add(key, text) is None]
+    return representatives, detector.duplicate_of
@@ -0,0 +1,183 @@
+import os
+import math
+
+# Dry-run planning: token, cost and wall-clock estimates without calling the LLM.
+# Input tokens come from rendered prompts. Outputs that later stages consume
+# (job requirements, parsed resume, compatibility result) do not exist yet, so
+# they are predicted from each stage's input size with historical output/input
+# token ratios read from the results warehouse (util/warehouse.py), falling back
+# to the defaults below. Durations use historical per-call latencies, the
+# planned concurrency and optional per-model rate limits (LLM_RPM, LLM_TPM).
+# Parser-side optimisations follow the run's options: resume tokens are counted
+# after the hybrid pre-parse, and with packing the parser calls are planned per
+# pack (util/packing.plan_packs) with the packed template paid once per pack.
+# Options that shrink LLM outputs or the JSON passed between stages (compact
+# output keys, field projection) need real outputs to measure, so the plan
+# lists them as not modelled instead of guessing.
+
+STAGE_ORDER = ["job_description_agent", "resume_parser_agent", "compatibility_analyzer_agent", "audit_agent"]
+# Used until the warehouse has history for a stage
+STAGE_DEFAULTS = {
+    "job_description_agent": {"output_ratio": 0.5, "seconds": 2.0},
+    "resume_parser_agent": {"output_ratio": 0.6, "seconds": 3.0},
+    "compatibility_analyzer_agent": {"output_ratio": 0.35, "seconds": 4.0},
+    "audit_agent": {"output_ratio": 0.25, "seconds": 5.0},
+}
+WAREHOUSE_STAGES = {
+    "resume_parser_agent": "parser",
+    "compatibility_analyzer_agent": "compat",
+    "audit_agent": "audit",
+}
+
+
+def load_history(warehouse_root=None):
+    """
+    {agent: {"output_ratio", "seconds", "samples"}} from past runs in the warehouse;
+    stages without history (or a missing warehouse/duckdb) get no entry.
+    """
+    history = {}
+    try:
+        from util.warehouse import connect, WAREHOUSE_PATH
+        root = warehouse_root or WAREHOUSE_PATH
+        if not os.path.isdir(root):
+            return history
+        con = connect(root)
+        for agent, stage in WAREHOUSE_STAGES.items():
+            calls, tokens_in, tokens_out, seconds = con.execute(
+                f"SELECT count(*), sum({stage}_input_tokens), sum({stage}_output_tokens), "
+                f"avg({stage}_seconds) FILTER (WHERE {stage}_seconds > 0) "
+                f"FROM results WHERE {stage}_input_tokens > 0").fetchone()
+            if calls and tokens_in:
+                history[agent] = {"output_ratio": tokens_out / tokens_in, "seconds": seconds, "samples": calls}
+    except Exception:
+        pass
+    return history
+
+
+class StagePlan:
+    def __init__(self, agent, model, pricing, output_ratio, seconds, source):
+        self.agent = agent
+        self.model = model
+        self.pricing = pricing
+        self.output_ratio = output_ratio
+        self.seconds = seconds
+        self.source = source
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, input_tokens, output_tokens=None):
+        """Record one planned call; returns its predicted output tokens (unless given)."""
+        if output_tokens is None:
+            output_tokens = int(round(input_tokens * self.output_ratio))
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return output_tokens
+
+    @property
+    def cost(self):
+        return (self.input_tokens * self.pricing["input"] + self.output_tokens * self.pricing["output"]) / 1000
+
+
+def make_stages(models, pricing, history=None):
+    """StagePlan per agent, with historical ratios/latencies where available."""
+    history = history or {}
+    stages = {}
+    for agent in STAGE_ORDER:
+        past = history.get(agent) or {}
+        defaults = STAGE_DEFAULTS[agent]
+        stages[agent] = StagePlan(
+            agent, models[agent], pricing[agent],
+            output_ratio=past.get("output_ratio") or defaults["output_ratio"],
+            seconds=past.get("seconds") or defaults["seconds"],
+            source=f"history ({past['samples']} calls)" if past else "default",
+        )
+    return stages
+
+
+def _plan_parser(stage, resume_tokens, template, pack):
+    """Predicted parser output tokens per resume, one call per resume or per pack."""
+    if pack is None:
+        return [stage.add(template + tokens) for tokens in resume_tokens]
+    from util.packing import plan_packs
+    packed_template, max_tokens, max_items = pack
+    parsed_out = [0] * len(resume_tokens)
+    for keys in plan_packs(dict(enumerate(resume_tokens)), max_tokens, max_items):
+        if len(keys) == 1:
+            parsed_out[keys[0]] = stage.add(template + resume_tokens[keys[0]])
+            continue
+        # Packing saves instructions, not output: each entry is as long as its resume parsed alone
+        for k in keys:
+            parsed_out[k] = int(round((template + resume_tokens[k]) * stage.output_ratio))
+        stage.add(packed_template + sum(resume_tokens[k] for k in keys), sum(parsed_out[k] for k in keys))
+    return parsed_out
+
+
+def plan_job(stages, jd_prompt_tokens, resume_tokens, templates, pack=None):
+    """
+    Add one job to the plan. resume_tokens: token counts of the resume texts as
+    the parser sees them (duplicates removed, pre-parsed if enabled); templates:
+    prompt tokens of each agent with empty inputs; pack: (packed template tokens,
+    max tokens, max resumes) per packed parser call, or None without packing.
+    """
+    jd_out = stages["job_description_agent"].add(jd_prompt_tokens)
+    parsed = _plan_parser(stages["resume_parser_agent"], resume_tokens, templates["resume_parser_agent"], pack)
+    for parsed_out in parsed:
+        compat_out = stages["compatibility_analyzer_agent"].add(
+            templates["compatibility_analyzer_agent"] + jd_out + parsed_out)
+        stages["audit_agent"].add(templates["audit_agent"] + jd_out + parsed_out + compat_out)
+
+
+def estimate_seconds(stages, concurrency=1, rpm=None, tpm=None):
+    """
+    Wall-clock estimate: LLM time spread over `concurrency` calls in flight, but
+    never faster than the per-model request/token rate limits allow.
+    """
+    latency_bound = sum(s.calls * s.seconds for s in stages.values()) / max(1, concurrency)
+    rate_bound = 0.0
+    per_model = {}
+    for s in stages.values():
+        m = per_model.setdefault(s.model, {"calls": 0, "tokens": 0})
+        m["calls"] += s.calls
+        m["tokens"] += s.input_tokens + s.output_tokens
+    for m in per_model.values():
+        if rpm:
+            rate_bound = max(rate_bound, m["calls"] / rpm * 60)
+        if tpm:
+            rate_bound = max(rate_bound, m["tokens"] / tpm * 60)
+    return max(latency_bound, rate_bound)
+
+
+def format_duration(seconds):
+    seconds = int(math.ceil(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def format_plan(stages, jobs, resumes, duplicates, concurrency, rpm=None, tpm=None, optimisations=None,
+                not_modelled=None):
+    lines = ["==================== DRY-RUN PLAN ====================",
+             f"{jobs} job(s), {resumes} resume(s) ({duplicates} duplicate(s) reuse another result)",
+             f"Optimisations modelled: {', '.join(optimisations) if optimisations else 'none'}"]
+    if not_modelled:
+        lines.append(f"Not modelled (estimates are high for these): {', '.join(not_modelled)}")
+    lines.append(f"{'Stage':<30}{'Model':<26}{'Calls':>7}{'Input':>12}{'Output*':>12}{'Cost($)':>10}{'s/call':>8}  Basis")
+    for s in stages.values():
+        lines.append(f"{s.agent:<30}{s.model:<26}{s.calls:>7}{s.input_tokens:>12}{s.output_tokens:>12}"
+                     f"{s.cost:>10.4f}{s.seconds:>8.1f}  {s.source}")
+    total_cost = sum(s.cost for s in stages.values())
+    lines.append("-" * 107)
+    lines.append(f"{'TOTAL':<56}{sum(s.calls for s in stages.values()):>7}"
+                 f"{sum(s.input_tokens for s in stages.values()):>12}"
+                 f"{sum(s.output_tokens for s in stages.values()):>12}{total_cost:>10.4f}")
+    lines.append("* output tokens (and the later-stage inputs built from them) are predicted")
+    limits = ", ".join(x for x in [f"{rpm:g} req/min" if rpm else "", f"{tpm:g} tokens/min" if tpm else ""] if x)
+    limits = f" (rate limits: {limits})" if limits else ""
+    lines.append(f"Estimated wall-clock{limits}:")
+    lines.append(f"  {'sequential (default mode):':<36}{format_duration(estimate_seconds(stages, 1, rpm, tpm))}")
+    if concurrency > 1:
+        label = f"{concurrency} in flight (--workers {concurrency}):"
+        lines.append(f"  {label:<36}{format_duration(estimate_seconds(stages, concurrency, rpm, tpm))}")
+    return "\n".join(lines)
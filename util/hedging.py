@@ -0,0 +1,211 @@
+import re
+import json
+import time
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Hedged LLM requests.
+# Latencies are tracked per (model, stage) in a rolling window. Once a call has
+# been outstanding longer than the rolling p95 for its key, a duplicate request
+# is issued; the first response containing a valid JSON object wins and the
+# other one is cancelled (streamed responses stop at the next chunk; a blocking
+# call cannot be interrupted: it is dropped if it has not started yet, otherwise
+# it runs to completion and its result is discarded). Whatever the losing call
+# produced is reported through `on_extra` so the caller can bill its tokens.
+# Hedges are capped at `budget` of all calls so a slow provider is not hit with
+# twice the traffic. Each in-flight call can hold two pool threads, so the pool
+# is sized from the caller's concurrency (configure()), and latency samples
+# start when a call actually begins, not when it is queued.
+
+WINDOW = 200
+MIN_SAMPLES = 20
+_JSON_RE = re.compile(r'\{[\s\S]*\}')
+
+
+def is_valid_json(content):
+    match = _JSON_RE.search(content or "")
+    if not match:
+        return False
+    try:
+        json.loads(match.group(0))
+        return True
+    except Exception:
+        return False
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    def __init__(self, budget=0.05, quantile=0.95, window=WINDOW, min_samples=MIN_SAMPLES, concurrency=4):
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.pool = None
+        self.configure(concurrency)
+        self.calls = 0
+        self.hedges = 0
+        self.stats = defaultdict(lambda: {"calls": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0,
+                                          "saved": 0.0, "saved_known": 0})
+
+    def configure(self, concurrency):
+        """Size the pool for `concurrency` calls in flight at once (a primary and a hedge each)."""
+        old, self.pool = self.pool, ThreadPoolExecutor(max_workers=2 * max(1, concurrency),
+                                                       thread_name_prefix="hedge")
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def _record_latency(self, key, seconds):
+        with self.lock:
+            self.latencies[key].append(seconds)
+
+    def threshold(self, key):
+        """Rolling p95 latency for a key, or None until enough samples were seen."""
+        with self.lock:
+            samples = list(self.latencies[key])
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, self.quantile)
+
+    def tail_mean(self, key):
+        """Mean latency of the samples at or above the p95: the expected cost of an unhedged slow call."""
+        threshold = self.threshold(key)
+        with self.lock:
+            tail = [x for x in self.latencies[key] if threshold is not None and x >= threshold]
+        return sum(tail) / len(tail) if tail else None
+
+    def _start(self, key, fn, cancellable, primary=True):
+        cancel = threading.Event()
+        started = time.perf_counter()
+
+        def run():
+            # Timed from here, not from submission, so time queued for a pool thread is not a latency sample
+            run_started = time.perf_counter()
+            result = fn(cancel)
+            # A cancelled hedge says nothing about latency; a cancelled primary is kept as a
+            # censored sample (its true latency is at least this long) so the tail stays visible
+            if primary or not (cancellable and cancel.is_set()):
+                self._record_latency(key, time.perf_counter() - run_started)
+            return result
+
+        future = self.pool.submit(run)
+        return future, cancel, started
+
+    def call(self, key, fn, validate=is_valid_json, cancellable=False, on_extra=None):
+        """
+        Run fn(cancel_event) -> response text, hedging it if it outlives the p95 for `key`.
+        With cancellable=True fn stops early once cancel_event is set (streaming);
+        otherwise the losing call runs to completion in the background.
+        on_extra(content) is called with the response of every call that was
+        issued but not returned (possibly later, from a pool thread).
+        """
+        with self.lock:
+            self.calls += 1
+            self.stats[key]["calls"] += 1
+        delay = self.threshold(key)
+        if delay is None:
+            # Warm-up: plain call, only collecting latency samples
+            start = time.perf_counter()
+            result = fn(threading.Event())
+            self._record_latency(key, time.perf_counter() - start)
+            return result
+
+        primary, primary_cancel, primary_start = self._start(key, fn, cancellable)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        with self.lock:
+            allowed = self.hedges < self.budget * self.calls
+            if allowed:
+                self.hedges += 1
+                self.stats[key]["hedges"] += 1
+            else:
+                self.stats[key]["over_budget"] += 1
+        if not allowed:
+            return primary.result()
+
+        hedge, hedge_cancel, _ = self._start(key, fn, cancellable, primary=False)
+        contenders = {primary: primary_cancel, hedge: hedge_cancel}
+        pending = set(contenders)
+        fallback = first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    content = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if validate(content):
+                    for other in pending:
+                        contenders[other].set()
+                        other.cancel()
+                    if future is hedge:
+                        self._hedge_won(key, primary, primary_start, time.perf_counter(), cancellable)
+                    self._bill_losers(contenders, future, on_extra)
+                    return content
+                fallback = (future, content) if fallback is None else fallback
+        if fallback is not None:
+            self._bill_losers(contenders, fallback[0], on_extra)
+            return fallback[1]
+        raise first_error
+
+    @staticmethod
+    def _bill_losers(contenders, winner, on_extra):
+        """Report every other contender's response to on_extra once it has one; cancelled or failed calls are skipped."""
+        if on_extra is None:
+            return
+
+        def report(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            on_extra(future.result())
+
+        for future in contenders:
+            if future is not winner:
+                future.add_done_callback(report)
+
+    def _hedge_won(self, key, primary, primary_start, won_at, cancellable):
+        with self.lock:
+            self.stats[key]["hedge_wins"] += 1
+        if cancellable:
+            # The primary was cut off: estimate its latency by the mean of the slow tail
+            # (a lower bound, since cut-off primaries enter the tail with their censored duration)
+            expected = self.tail_mean(key)
+            if expected is not None:
+                with self.lock:
+                    self.stats[key]["saved"] += max(0.0, expected - (won_at - primary_start))
+                    self.stats[key]["saved_known"] += 1
+            return
+
+        # The abandoned primary still completes; its latency tells exactly how much the hedge saved
+        def on_primary_done(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            saved = (time.perf_counter() - primary_start) - (won_at - primary_start)
+            with self.lock:
+                self.stats[key]["saved"] += max(0.0, saved)
+                self.stats[key]["saved_known"] += 1
+
+        primary.add_done_callback(on_primary_done)
+
+    def summary(self, cancellable=False):
+        lines = ["==================== HEDGING SUMMARY ====================",
+                 f"Budget {self.budget:.0%} of calls; {self.hedges} hedge(s) over {self.calls} call(s)"
+                 + ("; saved time of cut-off streams is a lower-bound estimate" if cancellable else ""),
+                 f"{'Model / stage':<52}{'Calls':>7}{'p95(s)':>8}{'Hedges':>8}{'Rate':>7}{'Wins':>6}{'Avg saved(s)':>14}"]
+        for key, s in self.stats.items():
+            p95 = self.threshold(key)
+            rate = s["hedges"] / s["calls"] if s["calls"] else 0.0
+            saved = f"{s['saved'] / s['saved_known']:.2f}" if s["saved_known"] else "-"
+            name = " / ".join(key)
+            lines.append(f"{name:<52}{s['calls']:>7}{(f'{p95:.2f}' if p95 else '-'):>8}{s['hedges']:>8}"
+                         f"{rate:>7.1%}{s['hedge_wins']:>6}{saved:>14}")
+            if s["over_budget"]:
+                lines.append(f"  {s['over_budget']} slow call(s) not hedged (budget exhausted)")
+        return "\n".join(lines)
@@ -0,0 +1,71 @@
+import io
+import csv
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Resumes × job descriptions scoring.
+# Each JD is extracted once and each resume parsed once; a compatibility call is
+# scheduled for a (resume, JD) pair as soon as both of its inputs are ready, so
+# parsing and scoring overlap on one shared thread pool.
+
+
+def score_matrix(jd_texts, resume_texts, extract_fn, parse_fn, compat_fn, max_workers=4):
+    """
+    jd_texts / resume_texts: {name: text}.
+    extract_fn(text) -> job_requirements, parse_fn(text) -> parsed_resume,
+    compat_fn(job_requirements, parsed_resume) -> score.
+    Returns (job_requirements_by_jd, parsed_by_resume, scores) where scores is
+    {(resume_name, jd_name): score}; failed cells are None.
+    """
+    job_requirements, parsed_resumes, scores = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        stage_one = {}
+        for name, text in jd_texts.items():
+            stage_one[pool.submit(extract_fn, text)] = ("jd", name)
+        for name, text in resume_texts.items():
+            stage_one[pool.submit(parse_fn, text)] = ("resume", name)
+
+        pairs = {}
+
+        def schedule(resume_name, jd_name):
+            future = pool.submit(compat_fn, job_requirements[jd_name], parsed_resumes[resume_name])
+            pairs[future] = (resume_name, jd_name)
+
+        for future in as_completed(stage_one):
+            kind, name = stage_one[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"[Matrix] {'JD extraction' if kind == 'jd' else 'Resume parsing'} failed for {name}: {e}")
+                continue
+            if kind == "jd":
+                job_requirements[name] = result
+                for resume_name in parsed_resumes:
+                    schedule(resume_name, name)
+            else:
+                parsed_resumes[name] = result
+                for jd_name in job_requirements:
+                    schedule(name, jd_name)
+
+        for future in as_completed(pairs):
+            resume_name, jd_name = pairs[future]
+            try:
+                scores[(resume_name, jd_name)] = future.result()
+            except Exception as e:
+                logging.error(f"[Matrix] Compatibility failed for {resume_name} × {jd_name}: {e}")
+                scores[(resume_name, jd_name)] = None
+    for resume_name in resume_texts:
+        for jd_name in jd_texts:
+            scores.setdefault((resume_name, jd_name), None)
+    return job_requirements, parsed_resumes, scores
+
+
+def matrix_csv(scores, resume_names, jd_names):
+    """Candidate × role score table as CSV text."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["resume"] + list(jd_names))
+    for resume_name in resume_names:
+        row = [scores.get((resume_name, jd_name)) for jd_name in jd_names]
+        writer.writerow([resume_name] + ["" if v is None else v for v in row])
+    return buf.getvalue()
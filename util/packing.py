@@ -0,0 +1,120 @@
+import re
+import json
+import threading
+
+# Multi-resume packing for the resume parser.
+# Short resumes are grouped (first-fit decreasing on estimated tokens) into one
+# request under a token limit, so the ~1K-token instruction block is paid once
+# per pack instead of once per resume. The packed prompt asks for
+# {"resumes": [{"resumeId": ..., <parsed_resume fields>}, ...]}; split_packed()
+# maps the entries back to their resumes and rejects entries that are missing,
+# duplicated, truncated or do not match their resume's text. Rejected resumes
+# are left unparsed so the normal per-resume parser handles them.
+
+DEFAULT_MAX_TOKENS = 3000   # resume tokens per packed request
+DEFAULT_MAX_ITEMS = 6       # resumes per packed request
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+
+def plan_packs(sizes, max_tokens=DEFAULT_MAX_TOKENS, max_items=DEFAULT_MAX_ITEMS):
+    """
+    Group {key: tokens} into packs of at most max_items keys whose tokens sum to at
+    most max_tokens. Resumes larger than max_tokens get a pack of their own.
+    Returns [[key, ...], ...].
+    """
+    packs = []
+    for key in sorted(sizes, key=lambda k: sizes[k], reverse=True):
+        for pack in packs:
+            if len(pack["keys"]) < max_items and pack["tokens"] + sizes[key] <= max_tokens:
+                pack["keys"].append(key)
+                pack["tokens"] += sizes[key]
+                break
+        else:
+            packs.append({"keys": [key], "tokens": sizes[key]})
+    return [pack["keys"] for pack in packs]
+
+
+def render_packed(template, texts):
+    """Packed prompt for [(resume_id, text)]."""
+    blocks = [f"### RESUME {resume_id}\n{text.strip()}\n### END {resume_id}" for resume_id, text in texts]
+    return template.replace("{{resumes}}", "\n\n".join(blocks))
+
+
+def _entries(content):
+    """Complete objects of the "resumes" array; a truncated response still yields its finished entries."""
+    match = re.search(r'"resumes"\s*:\s*\[', content or "")
+    if not match:
+        return []
+    decoder = json.JSONDecoder()
+    entries, pos = [], match.end()
+    while True:
+        while pos < len(content) and content[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(content) or content[pos] != "{":
+            return entries
+        try:
+            entry, pos = decoder.raw_decode(content, pos)
+        except ValueError:
+            return entries
+        entries.append(entry)
+
+
+def _aligned(parsed, text):
+    """Cheap check that a parsed entry describes this resume and not a neighbour in the pack."""
+    lowered = text.lower()
+    email = parsed.get("contactEmail")
+    if email and email.lower() not in lowered and _EMAIL_RE.search(text):
+        return False
+    name = (parsed.get("fullName") or "").split()
+    if name and name[0].lower() not in lowered:
+        return False
+    return True
+
+
+def split_packed(content, texts):
+    """
+    ({resume_id: parsed_dict}, [rejected resume_ids]) for a packed response to
+    [(resume_id, text)]. Entries are matched by resumeId, never by position.
+    """
+    expected = dict(texts)
+    found, seen_twice = {}, set()
+    for entry in _entries(content):
+        if not isinstance(entry, dict):
+            continue
+        resume_id = str(entry.pop("resumeId", ""))
+        if resume_id not in expected:
+            continue
+        if resume_id in found:
+            seen_twice.add(resume_id)
+        found[resume_id] = entry
+    parsed, rejected = {}, []
+    for resume_id, text in texts:
+        entry = found.get(resume_id)
+        if entry is None or resume_id in seen_twice or not _aligned(entry, text):
+            rejected.append(resume_id)
+        else:
+            parsed[resume_id] = entry
+    return parsed, rejected
+
+
+class PackStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.packs = 0
+        self.packed = 0
+        self.rejected = 0
+
+    def record(self, resumes, rejected):
+        with self.lock:
+            self.packs += 1
+            self.packed += resumes
+            self.rejected += rejected
+
+    def summary(self):
+        accepted = self.packed - self.rejected
+        lines = ["==================== PACKING SUMMARY ====================",
+                 f"{self.packed} resume(s) sent in {self.packs} packed call(s); "
+                 f"{accepted} parsed from packs, {self.rejected} retried individually",
+                 f"Parser calls: {self.packs + self.rejected} instead of {self.packed}"]
+        return "\n".join(lines)
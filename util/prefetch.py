@@ -0,0 +1,72 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded producer/consumer prefetching for storage downloads.
+# While the caller works on item i, items i+1..i+depth are already being
+# fetched on background threads, so storage latency overlaps with LLM calls.
+# At most `depth` fetched-but-unconsumed results are held in memory.
+
+
+_DONE = object()
+
+
+class PrefetchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fetched = 0
+        self.failed = 0
+        self.wait_seconds = 0.0   # time the consumer actually blocked on storage
+        self.fetch_seconds = 0.0  # total storage time spent on background threads
+
+    def summary(self):
+        hidden = max(0.0, self.fetch_seconds - self.wait_seconds)
+        return (f"[Prefetch] {self.fetched} fetched, {self.failed} failed; storage time "
+                f"{self.fetch_seconds:.1f}s, on critical path {self.wait_seconds:.1f}s "
+                f"({hidden:.1f}s overlapped)")
+
+
+def prefetch(items, fetch_fn, depth=4, stats=None):
+    """
+    Yield (item, result, error) for every item, in input order.
+    fetch_fn(item) runs on up to `depth` worker threads ahead of the consumer;
+    an exception (or a None result) is reported per item instead of aborting.
+    """
+    stats = stats if stats is not None else PrefetchStats()
+    items = iter(items)
+
+    def timed_fetch(item):
+        start = time.perf_counter()
+        try:
+            result = fetch_fn(item)
+        finally:
+            with stats.lock:
+                stats.fetch_seconds += time.perf_counter() - start
+        if result is None:
+            raise LookupError(f"No data returned for {item}")
+        return result
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max(1, depth)) as pool:
+        for item in items:
+            pending.append((item, pool.submit(timed_fetch, item)))
+            if len(pending) >= depth:
+                break
+        while pending:
+            item, future = pending.popleft()
+            start = time.perf_counter()
+            try:
+                result, error = future.result(), None
+                stats.fetched += 1
+            except Exception as e:
+                result, error = None, e
+                stats.failed += 1
+                logging.error(f"[Prefetch] Failed to fetch {item}: {e}")
+            stats.wait_seconds += time.perf_counter() - start
+            # Refill before handing the item over so the next fetch overlaps with the caller's work
+            next_item = next(items, _DONE)
+            if next_item is not _DONE:
+                pending.append((next_item, pool.submit(timed_fetch, next_item)))
+            yield item, result, error
@@ -0,0 +1,209 @@
+import re
+import threading
+
+# Rule-based pre-parser for resume text.
+# Contact fields are pure pattern matches, so they are extracted here with
+# compiled regexes instead of being regenerated by the LLM, and the matched
+# tokens are removed from the header/contact lines the LLM sees. The remaining
+# text is split into sections at recognised headings and re-emitted with
+# canonical "## NAME" markers; sections no parsed_resume field uses
+# (declarations, references) are dropped. merge_contacts() writes the exact rule values back into the
+# parser's JSON output.
+
+CONTACT_FIELDS = ["contactEmail", "contactPhoneNumber", "linkedInProfileURL", "personalWebsitePortfolioURL"]
+
+# Canonical section -> headings as they appear in resumes (compared lowercased, punctuation stripped)
+SECTION_HEADINGS = {
+    "SUMMARY": ["summary", "professional summary", "profile", "profile summary", "career objective",
+                "objective", "about me", "career summary", "professional profile"],
+    "EXPERIENCE": ["experience", "work experience", "professional experience", "employment history",
+                   "employment", "work history", "internships", "internship", "internship experience",
+                   "relevant experience", "career history"],
+    "EDUCATION": ["education", "academic background", "academic qualifications", "educational qualifications",
+                  "educational qualification", "academics", "qualifications", "education details"],
+    "SKILLS": ["skills", "technical skills", "key skills", "core competencies", "skill set", "skills summary",
+               "technical proficiency", "soft skills", "tools and technologies", "technologies"],
+    "PROJECTS": ["projects", "academic projects", "personal projects", "key projects", "project experience",
+                 "project details"],
+    "CERTIFICATIONS": ["certifications", "certificates", "certification", "courses", "licenses and certifications",
+                       "trainings", "training and certifications"],
+    "AWARDS": ["awards", "achievements", "honors", "honours", "awards and achievements", "accomplishments"],
+    "LANGUAGES": ["languages", "languages known", "language proficiency"],
+    "ACTIVITIES": ["extracurricular activities", "extra curricular activities", "activities",
+                   "volunteering", "volunteer experience", "positions of responsibility", "leadership"],
+    "INTERESTS": ["hobbies", "interests", "hobbies and interests"],
+    "CONTACT": ["contact", "contact details", "contact information", "personal details", "personal information"],
+    "DECLARATION": ["declaration"],
+    "REFERENCES": ["references", "referees"],
+}
+# Sections that no parsed_resume field is extracted from
+DROPPED_SECTIONS = {"DECLARATION", "REFERENCES"}
+_HEADING_LOOKUP = {alias: name for name, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+_EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_LINKEDIN_RE = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/(?:in|pub)/[A-Za-z0-9_%.-]+/?", re.I)
+_URL_RE = re.compile(
+    r"(?:https?://|www\.)[^\s,;|()<>]+"
+    r"|(?:github\.com|gitlab\.com|behance\.net|dribbble\.com|kaggle\.com|medium\.com)/[^\s,;|()<>]+"
+    r"|\b[a-z0-9-]+\.(?:dev|io|me|site|github\.io|netlify\.app|vercel\.app)\b(?:/[^\s,;|()<>]*)?", re.I)
+_PHONE_RE = re.compile(r"(?<![\w.])\+?\(?\d[\d\s().-]{6,18}\d(?![\w.])")
+_YEAR_RANGE_RE = re.compile(r"^(?:19|20)\d{2}\s*[-–]\s*(?:19|20)\d{2}$")
+_SEPARATORS_RE = re.compile(r"(?:\s*[|•·]\s*){2,}")
+_HEADING_CLEAN_RE = re.compile(r"[^a-z& ]+")
+_WORD_RE = re.compile(r"[A-Za-z]+")
+_MINOR_WORDS = {"and", "of", "the", "in", "for"}
+_LEFTOVER_RE = re.compile(r"^[\s|•·,;:/\-–—]*(?:(?:e-?mail|phone|mobile|mob|tel|contact|linkedin|github|"
+                          r"website|portfolio)\s*(?:no\.?)?[\s|•·,;:/\-–—]*)*$", re.I)
+
+
+def _looks_like_heading(line):
+    """Headings are set apart by case or a colon: "SKILLS", "Technical Skills", "skills:"."""
+    if line.endswith(":"):
+        return True
+    words = _WORD_RE.findall(line)
+    return bool(words) and (line.upper() == line
+                            or all(w[0].isupper() for w in words if w.lower() not in _MINOR_WORDS))
+
+
+def _heading(line):
+    """Canonical section name if the line is a section heading, else None."""
+    stripped = line.strip().strip(":").strip()
+    if not stripped or len(stripped) > 40 or not _looks_like_heading(line.strip()):
+        return None
+    key = " ".join(_HEADING_CLEAN_RE.sub(" ", stripped.lower().replace("&", " and ")).split())
+    return _HEADING_LOOKUP.get(key)
+
+
+def _find_phone(text):
+    for match in _PHONE_RE.finditer(text):
+        candidate = match.group(0).strip()
+        digits = re.sub(r"\D", "", candidate)
+        if 10 <= len(digits) <= 13 and not _YEAR_RANGE_RE.match(candidate):
+            return candidate
+    return None
+
+
+def _find_website(text, email):
+    email_domain = email.split("@", 1)[1].lower() if email else None
+    for match in _URL_RE.finditer(text):
+        url = match.group(0).rstrip(".")
+        if "linkedin.com" in url.lower() or (email_domain and url.lower().endswith(email_domain)):
+            continue
+        return url
+    return None
+
+
+def extract_contacts(text, header=None):
+    """
+    {contactEmail, contactPhoneNumber, linkedInProfileURL, personalWebsitePortfolioURL}
+    as written in the resume, or None. The header/contact part is searched first;
+    phone and website are only taken from it so project links and date ranges
+    are not picked up.
+    """
+    header = text if header is None else header
+    email = _EMAIL_RE.search(header) or _EMAIL_RE.search(text)
+    email = email.group(0) if email else None
+    linkedin = _LINKEDIN_RE.search(header) or _LINKEDIN_RE.search(text)
+    return {
+        "contactEmail": email,
+        "contactPhoneNumber": _find_phone(header),
+        "linkedInProfileURL": linkedin.group(0).rstrip("/") if linkedin else None,
+        "personalWebsitePortfolioURL": _find_website(header, email),
+    }
+
+
+def split_sections(text):
+    """
+    (header, [(section, text)]) split at recognised headings; the header is
+    everything before the first one. A heading that says more than its canonical
+    name ("Leadership" -> ACTIVITIES) stays as the section's first line, so a
+    content line mistaken for a heading is never lost.
+    """
+    header, sections = [], []
+    current = None
+    for line in text.splitlines():
+        name = _heading(line)
+        if name:
+            label = line.strip().strip(":").strip()
+            current = [name, [] if label.lower() == name.lower() else [label]]
+            sections.append(current)
+        elif current is None:
+            header.append(line)
+        else:
+            current[1].append(line)
+    return "\n".join(header).strip(), [(name, "\n".join(lines).strip()) for name, lines in sections]
+
+
+def _strip_contacts(text, contacts):
+    for value in contacts.values():
+        if value:
+            text = text.replace(value, "")
+    lines = [_SEPARATORS_RE.sub(" | ", line).strip(" |•·,;") for line in text.splitlines()]
+    return "\n".join(line for line in lines if line.strip() and not _LEFTOVER_RE.match(line))
+
+
+def preparse(text):
+    """
+    {"contacts": {...}, "text": reduced text for the LLM, "sections": [names]}.
+    Without any recognised heading the text is only stripped of contact tokens.
+    """
+    header, sections = split_sections(text or "")
+    contact_text = "\n".join([header] + [body for name, body in sections if name == "CONTACT"])
+    contacts = extract_contacts(text or "", contact_text)
+    parts = [_strip_contacts(header, contacts)] if header else []
+    for name, body in sections:
+        if name in DROPPED_SECTIONS:
+            continue
+        if name == "CONTACT":
+            body = _strip_contacts(body, contacts)
+        if body:
+            parts.append(f"## {name}\n{body}")
+    return {"contacts": contacts, "text": "\n\n".join(p for p in parts if p),
+            "sections": [name for name, _ in sections]}
+
+
+def merge_contacts(parsed, contacts):
+    """Write rule-extracted contact fields into a parsed_resume dict, right after fullName."""
+    merged = {}
+    for key, value in parsed.items():
+        if key in CONTACT_FIELDS:
+            continue
+        merged[key] = value
+        if key == "fullName":
+            merged.update({f: contacts.get(f) or parsed.get(f) for f in CONTACT_FIELDS})
+    if "contactEmail" not in merged:
+        merged = {**{f: contacts.get(f) or parsed.get(f) for f in CONTACT_FIELDS}, **merged}
+    return merged
+
+
+class PreparseStats:
+    """Resume tokens before/after pre-parsing and how many contact fields the rules filled."""
+
+    def __init__(self, count_fn):
+        self.count_fn = count_fn
+        self.lock = threading.Lock()
+        self.resumes = 0
+        self.raw_tokens = 0
+        self.reduced_tokens = 0
+        self.fields = {f: 0 for f in CONTACT_FIELDS}
+        self.with_sections = 0
+
+    def record(self, raw_text, result):
+        raw, reduced = self.count_fn(raw_text), self.count_fn(result["text"])
+        with self.lock:
+            self.resumes += 1
+            self.raw_tokens += raw
+            self.reduced_tokens += reduced
+            self.with_sections += bool(result["sections"])
+            for f in CONTACT_FIELDS:
+                self.fields[f] += result["contacts"].get(f) is not None
+
+    def summary(self):
+        saved = self.raw_tokens - self.reduced_tokens
+        rate = saved / self.raw_tokens if self.raw_tokens else 0.0
+        lines = ["==================== PRE-PARSE SUMMARY ====================",
+                 f"{self.resumes} resume(s), {self.with_sections} with recognised sections; "
+                 f"resume tokens {self.raw_tokens} -> {self.reduced_tokens} ({rate:.1%} saved)",
+                 "Contact fields extracted by rules: "
+                 + ", ".join(f"{f} {n}/{self.resumes}" for f, n in self.fields.items())]
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+import os
+import json
+import logging
+import threading
+from functools import lru_cache
+from collections import defaultdict
+
+# Field projections for prompt inputs.
+# Each agent only receives the job/resume/compat fields its analysis framework
+# actually uses (no benefits, contact details, hobbies, school grades, ...).
+# Field paths are dotted; a path through a list applies to every element, e.g.
+# "education.degree" keeps only the degree of each education entry. A value of
+# None for an input passes it through unchanged.
+#
+# Override or extend the defaults with a JSON file of the same shape pointed to
+# by PROJECTIONS_PATH (per agent, per input).
+
+_JD_FIELDS = [
+    "Job Title",
+    "The Role of the Job",
+    "Responsibilities required for the job",
+    "Skills required for the job",
+    "Soft Skills required for the job",
+    "Experience required for the job",
+    "Education qualification needed for the job",
+    "Compulsory necessities required for the job",
+    "Cultural fit necessary",
+    "Location",
+    "Employment Type",
+    "Remote / Onsite / Hybrid",
+    "Industry",
+    "Seniority Level",
+    "Visa or Work Permit Requirements",
+]
+
+_RESUME_FIELDS = [
+    "location",
+    "summaryObjectiveStatement",
+    "education.degree",
+    "education.major",
+    "education.university",
+    "education.graduationYear",
+    "workExperience",
+    "projects",
+    "skills",
+    "softSkills",
+    "certifications",
+    "languagesKnown",
+    "awardsHonors",
+    "extracurricularActivities.activityName",
+    "extracurricularActivities.achievements",
+]
+
+DEFAULT_PROJECTIONS = {
+    "compatibility_analyzer_agent": {
+        "job_requirements": _JD_FIELDS,
+        "parsed_resume": _RESUME_FIELDS,
+    },
+    "audit_agent": {
+        # The audit checks the compat claims against the same evidence the compat agent saw
+        "job_requirements": _JD_FIELDS,
+        "parsed_resume": _RESUME_FIELDS,
+        "compatibility_score": None,
+    },
+}
+
+
+def load_projections(path=None):
+    """Default projections, overridden per agent/input by the JSON file at `path` (or PROJECTIONS_PATH)."""
+    projections = {agent: dict(inputs) for agent, inputs in DEFAULT_PROJECTIONS.items()}
+    path = path or os.getenv("PROJECTIONS_PATH")
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for agent, inputs in json.load(f).items():
+                    projections.setdefault(agent, {}).update(inputs)
+        except Exception as e:
+            logging.error(f"[Projection] Failed to load projections '{path}': {e}")
+    return projections
+
+
+def _field_tree(fields):
+    """["a.b", "a.c", "d"] -> {"a": {"b": {}, "c": {}}, "d": {}}; an empty dict keeps the whole value."""
+    tree = {}
+    for field in fields:
+        node = tree
+        parts = field.split(".")
+        for i, part in enumerate(parts):
+            if part in node and not node[part]:
+                break  # a shorter path already keeps the whole value
+            if i == len(parts) - 1:
+                node[part] = {}
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _apply(data, tree):
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [_apply(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {key: _apply(data[key], sub) for key, sub in tree.items() if key in data}
+
+
+def project(data, fields):
+    """Keep only `fields` (dotted paths) of a parsed JSON object; fields=None keeps everything."""
+    if fields is None:
+        return data
+    return _apply(data, _field_tree(fields))
+
+
+def project_json(text, fields):
+    """Project a JSON string and re-serialize it minified; non-JSON text is returned unchanged."""
+    if fields is None:
+        return text
+    try:
+        data = json.loads(text)
+    except Exception:
+        return text
+    return json.dumps(project(data, fields), ensure_ascii=False, separators=(",", ":"))
+
+
+class Projector:
+    """
+    Applies the configured projections and records the input-token reduction
+    per stage. Job-requirement projections are cached by text, so each job
+    description is projected (and counted) once no matter how many resumes use it.
+    """
+
+    def __init__(self, projections=None, count_fn=None):
+        self.projections = projections if projections is not None else load_projections()
+        self.count_fn = count_fn or (lambda text: max(1, len(text) // 4))
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"calls": 0, "full": 0, "projected": 0})
+        self._cached = lru_cache(maxsize=64)(self._project_counted)
+
+    def _project_counted(self, agent, key, text):
+        projected = project_json(text, self.projections.get(agent, {}).get(key))
+        return projected, self.count_fn(text), self.count_fn(projected)
+
+    def inputs(self, agent, values, cached=("job_requirements",)):
+        """Project {input_key: json_text} for an agent; returns the projected dict."""
+        result = {}
+        full_tokens = projected_tokens = 0
+        for key, text in values.items():
+            if key in cached:
+                projected, full, proj = self._cached(agent, key, text)
+            else:
+                projected, full, proj = self._project_counted(agent, key, text)
+            result[key] = projected
+            full_tokens += full
+            projected_tokens += proj
+        with self.lock:
+            s = self.stats[agent]
+            s["calls"] += 1
+            s["full"] += full_tokens
+            s["projected"] += projected_tokens
+        return result
+
+    def summary(self):
+        lines = ["==================== PROJECTION SUMMARY ====================",
+                 f"{'Agent':<30}{'Calls':>7}{'Full in':>10}{'Projected':>11}{'Saved':>8}"]
+        for agent, s in self.stats.items():
+            saved = 1 - s["projected"] / s["full"] if s["full"] else 0.0
+            lines.append(f"{agent:<30}{s['calls']:>7}{s['full']:>10}{s['projected']:>11}{saved:>8.0%}")
+        return "\n".join(lines)
@@ -0,0 +1,318 @@
+import re
+import json
+import threading
+from datetime import date
+from functools import lru_cache
+import numpy as np
+
+# Deterministic compatibility facts computed from the job_requirements and
+# parsed_resume JSON objects. These replace the mechanical parts of the
+# compatibility prompt (skill overlap, years of experience, location/work
+# arrangement) so the LLM only produces the judgment fields.
+
+_MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+_DATE_RE = re.compile(r"(?:([a-z]{3})[a-z]*\.?\s+)?((?:19|20)\d{2})|(present|current|now|till date|to date)")
+_YEARS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(\+)?\s*(?:-|–|to)?\s*(\d+(?:\.\d+)?)?\s*\+?\s*(?:years?|yrs?)")
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(years?|yrs?|months?|mos?)")
+# Phrasing around a skill in JD/resume lists: "strong experience with X", "X skills"
+_SKILL_PREFIX_RE = re.compile(
+    r"^(?:(?:strong|solid|good|excellent|basic|working|hands on|proven|deep|advanced|practical)\s+)*"
+    r"(?:(?:experience|knowledge|understanding|proficiency|familiarity|expertise|skills?)\s+(?:with|of|in|using)\s+"
+    r"|ability to\s+)?")
+_SKILL_SUFFIX_RE = re.compile(r"\s+(?:experience|skills?|knowledge)$")
+
+
+def _load_json(data):
+    if isinstance(data, dict):
+        return data
+    try:
+        parsed = json.loads(data)
+        return parsed if isinstance(parsed, dict) else {}
+    except Exception:
+        return {}
+
+
+def normalize_skill(skill):
+    skill = re.sub(r"[\s_/-]+", " ", str(skill).lower()).strip(" .,;:()")
+    return skill
+
+
+def _singular(word):
+    if len(word) <= 3 or not word.isalpha() or word.endswith(("ss", "us", "sis")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    return word[:-1] if word.endswith("s") else word
+
+
+def canonical_skill(skill):
+    """
+    Key both sides of a skill match are compared on: normalized, without the
+    surrounding phrasing ("experience with ...", "... skills") and with simple
+    plurals singularized, so "Experience with REST APIs" and "rest api" agree.
+    """
+    key = normalize_skill(skill)
+    stripped = _SKILL_SUFFIX_RE.sub("", _SKILL_PREFIX_RE.sub("", key))
+    return " ".join(_singular(w) for w in (stripped or key).split())
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [v for v in value if v]
+    return [s.strip() for s in re.split(r"[,;\n]", str(value)) if s.strip()]
+
+
+def required_years(text):
+    """(min_years, max_years) parsed from an experience requirement like '3-5 years' or '5+ years'."""
+    if not text:
+        return None, None
+    match = _YEARS_RE.search(str(text).lower())
+    if not match:
+        return None, None
+    low = float(match.group(1))
+    if match.group(3):
+        return low, float(match.group(3))
+    return low, None
+
+
+def _month_index(month_name, year, is_end):
+    month = _MONTHS.get((month_name or "")[:3], 12 if is_end else 1)
+    return int(year) * 12 + month - 1
+
+
+def _interval(duration, today):
+    """(start, end) month indices for a workExperience duration string, or None."""
+    text = str(duration or "").lower()
+    points = []
+    for month_name, year, present in _DATE_RE.findall(text)[:2]:
+        if present:
+            points.append(today.year * 12 + today.month - 1)
+        else:
+            points.append(_month_index(month_name, year, is_end=bool(points)))
+    if len(points) == 2:
+        start, end = points
+    elif len(points) == 1 and not any(p for _, _, p in _DATE_RE.findall(text)):
+        # A lone year ("2021") is counted as that calendar year
+        month_name = _DATE_RE.findall(text)[0][0]
+        start = points[0]
+        end = start if month_name else start + 11
+    else:
+        return None
+    return (start, end) if end >= start else None
+
+
+def candidate_years(work_experience, today=None):
+    """Total years of experience, merging overlapping roles so concurrent jobs are not double-counted."""
+    today = today or date.today()
+    intervals = []
+    explicit_months = 0.0
+    for job in work_experience or []:
+        if not isinstance(job, dict):
+            continue
+        interval = _interval(job.get("duration"), today)
+        if interval:
+            intervals.append(interval)
+            continue
+        match = _DURATION_RE.search(str(job.get("duration") or "").lower())
+        if match:
+            value = float(match.group(1))
+            explicit_months += value * 12 if match.group(2).startswith("y") else value
+    months = 0
+    last_end = None
+    for start, end in sorted(intervals):
+        if last_end is not None and start <= last_end:
+            if end > last_end:
+                months += end - last_end
+                last_end = end
+            continue
+        months += end - start + 1
+        last_end = end
+    total = (months + explicit_months) / 12.0
+    return round(total, 1) if (intervals or explicit_months) else None
+
+
+@lru_cache(maxsize=32)
+def prepare_job_facts(job_requirements):
+    """Normalize the job-side inputs once per job (cached by the job_requirements JSON string)."""
+    jd = _load_json(job_requirements)
+    hard = _as_list(jd.get("Skills required for the job"))
+    soft = _as_list(jd.get("Soft Skills required for the job"))
+    skills, seen = [], set()
+    for skill in hard + soft:
+        key = canonical_skill(skill)
+        if key and key not in seen:
+            seen.add(key)
+            skills.append((key, skill))
+    min_years, max_years = required_years(jd.get("Experience required for the job"))
+    return {
+        "skills": tuple(skills),
+        "experience_text": jd.get("Experience required for the job"),
+        "min_years": min_years,
+        "max_years": max_years,
+        "location": jd.get("Location"),
+        "work_arrangement": jd.get("Remote / Onsite / Hybrid"),
+    }
+
+
+def _resume_skill_terms(resume):
+    terms = _as_list(resume.get("skills")) + _as_list(resume.get("softSkills")) + _as_list(resume.get("certifications"))
+    for project in resume.get("projects") or []:
+        if isinstance(project, dict):
+            terms += _as_list(project.get("technologiesUsed"))
+    return {canonical_skill(t) for t in terms} - {""}
+
+
+def _skill_matrix(job_skills, resumes):
+    """
+    Boolean (resumes × job skills) match matrix. A term matches a skill when the
+    skill occurs in the term ("python" in "python 3") or the term is a phrase
+    covering at least half of the skill ("rest api" in "rest api design"). Each
+    distinct resume term is matched against each job skill once (one regex pass
+    per skill over all terms, plus a lookup of the skill's word n-grams), and
+    the resulting (terms × skills) hits are spread to resumes with a single
+    (resumes × terms) @ (terms × skills) product.
+    """
+    if not job_skills or not resumes:
+        return np.zeros((len(resumes), len(job_skills)), dtype=bool)
+    term_sets = [_resume_skill_terms(resume) for resume in resumes]
+    vocab = sorted(set().union(*term_sets))
+    if not vocab:
+        return np.zeros((len(resumes), len(job_skills)), dtype=bool)
+    index = {term: i for i, term in enumerate(vocab)}
+    rows = np.repeat(np.arange(len(resumes)), [len(terms) for terms in term_sets])
+    cols = np.fromiter((index[t] for terms in term_sets for t in terms), dtype=np.int64, count=len(rows))
+    incidence = np.zeros((len(resumes), len(vocab)), dtype=np.float32)
+    incidence[rows, cols] = 1.0
+
+    # Terms are joined by newlines, which no skill can match across
+    blob = "\n".join(vocab)
+    starts = np.cumsum([0] + [len(t) + 1 for t in vocab[:-1]])
+    hits = np.zeros((len(vocab), len(job_skills)), dtype=np.float32)
+    for s, (key, _) in enumerate(job_skills):
+        pattern = re.compile(rf"(?<![a-z0-9+#]){re.escape(key)}(?![a-z0-9+#])")
+        positions = np.fromiter((m.start() for m in pattern.finditer(blob)), dtype=np.int64)
+        if positions.size:
+            hits[np.searchsorted(starts, positions, side="right") - 1, s] = 1.0
+        # Reverse direction: resume terms that are a large enough phrase of the skill
+        words = key.split()
+        for n in range((len(words) + 1) // 2, len(words)):
+            for i in range(len(words) - n + 1):
+                t = index.get(" ".join(words[i:i + n]))
+                if t is not None:
+                    hits[t, s] = 1.0
+    return (incidence @ hits) > 0
+
+
+def _years_statement(years, job):
+    if years is None:
+        return None
+    low, high = job["min_years"], job["max_years"]
+    if low is None:
+        return f"{years:g} years"
+    requirement = f"{low:g}-{high:g}" if high is not None else f"{low:g}+"
+    if years < low:
+        verdict = "below"
+    elif high is not None and years > high:
+        verdict = "exceeds"
+    else:
+        verdict = "meets"
+    return f"{years:g} years ({verdict} {requirement} year requirement)"
+
+
+def _location_statement(candidate_location, job):
+    job_location = job["location"]
+    arrangement = str(job["work_arrangement"] or "")
+    if not job_location:
+        return None
+    if not candidate_location:
+        return f"Candidate location not stated; job location is {job_location}"
+    if "remote" in arrangement.lower():
+        return f"Remote role; candidate located in {candidate_location}"
+    job_terms = {t for t in re.split(r"[\s,/]+", job_location.lower()) if len(t) > 2}
+    cand_terms = {t for t in re.split(r"[\s,/]+", candidate_location.lower()) if len(t) > 2}
+    if job_terms & cand_terms:
+        return f"Match: candidate in {candidate_location}, job in {job_location}"
+    return f"Mismatch: candidate in {candidate_location}, job in {job_location}"
+
+
+def compute_facts_batch(job_requirements, parsed_resumes, today=None):
+    """
+    Compute the deterministic facts for every parsed resume of a job in one pass.
+    Returns a list of fact dicts aligned with `parsed_resumes`.
+    """
+    job = prepare_job_facts(job_requirements if isinstance(job_requirements, str) else json.dumps(job_requirements))
+    resumes = [_load_json(r) for r in parsed_resumes]
+    job_skills = job["skills"]
+    matrix = _skill_matrix(job_skills, resumes)
+    if job_skills:
+        percentages = np.round(matrix.mean(axis=1) * 100, 1)
+    else:
+        percentages = np.full(len(resumes), np.nan)
+    names = np.array([name for _, name in job_skills], dtype=object)
+    facts = []
+    for r, resume in enumerate(resumes):
+        years = candidate_years(resume.get("workExperience"), today)
+        facts.append({
+            "skillMatchPercentage": None if np.isnan(percentages[r]) else float(percentages[r]),
+            "matchedSkills": names[matrix[r]].tolist() if job_skills else [],
+            "missingSkills": names[~matrix[r]].tolist() if job_skills else [],
+            "candidateYearsOfExperience": years,
+            "yearsOfExperience": _years_statement(years, job),
+            "locationCompatibility": _location_statement(resume.get("location"), job),
+            "workArrangement": job["work_arrangement"],
+        })
+    return facts
+
+
+def compute_facts(job_requirements, parsed_resume, today=None):
+    return compute_facts_batch(job_requirements, [parsed_resume], today)[0]
+
+
+class FactsCache:
+    """
+    Facts per (job_requirements, parsed_resume) for pipelines where resumes are
+    parsed one by one (matrix mode). Resumes are registered as they are parsed; the
+    first lookup for a job computes the facts of every registered resume not yet
+    computed for that job in one compute_facts_batch pass.
+    """
+
+    def __init__(self, today=None):
+        self.today = today
+        self.lock = threading.Lock()
+        self.resumes = []
+        self.facts = {}
+        self.done = {}
+
+    def add(self, parsed_resume):
+        with self.lock:
+            self.resumes.append(parsed_resume)
+
+    def get(self, job_requirements, parsed_resume):
+        with self.lock:
+            key = (job_requirements, parsed_resume)
+            if key not in self.facts:
+                done = self.done.setdefault(job_requirements, 0)
+                batch = self.resumes[done:]
+                if parsed_resume not in batch:
+                    batch = batch + [parsed_resume]
+                for resume, facts in zip(batch, compute_facts_batch(job_requirements, batch, self.today)):
+                    self.facts[(job_requirements, resume)] = facts
+                self.done[job_requirements] = len(self.resumes)
+            return self.facts[key]
+
+
+def merge_facts(compatibility_result, facts):
+    """Write the precomputed facts into their places in the full compatibility schema."""
+    result = _load_json(compatibility_result)
+    analysis = result.setdefault("analysis", {})
+    skill_analysis = analysis.setdefault("skillAnalysis", {})
+    skill_analysis["matchedSkills"] = facts.get("matchedSkills", [])
+    skill_analysis["missingSkills"] = facts.get("missingSkills", [])
+    analysis.setdefault("experienceFit", {})["yearsOfExperience"] = facts.get("yearsOfExperience")
+    logistics = result.setdefault("logisticalCheck", {})
+    logistics["locationCompatibility"] = facts.get("locationCompatibility")
+    logistics["workArrangement"] = facts.get("workArrangement")
+    return result
@@ -0,0 +1,269 @@
+import time
+import json
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Resident scoring service.
+# The process keeps the compiled graph, LLM/storage clients and prompt/job caches
+# warm between requests. Submissions (a whole job folder or a single resume) are
+# accepted immediately and scored in the background; every resume of every
+# submission runs on one shared pool, so `max_concurrency` bounds the total
+# number of resumes in flight across all clients. Submissions beyond
+# `max_pending` queued resumes are rejected with 429 instead of piling up.
+# Finished submissions are kept for `retention` seconds and at most
+# `max_finished` of them are kept (oldest evicted first); unfinished ones are never evicted.
+#
+# Endpoints:
+#   POST /jobs                    {"job_folder": ..., "resumes": [optional subset], "refresh": false}
+#   POST /resumes                 {"job_folder": ..., "resume_path": ...} or {..., "resume_text": ...}
+#   GET  /submissions             all submissions (without results)
+#   GET  /submissions/{id}        status and results so far
+#   GET  /submissions/{id}/stream results as NDJSON lines while they complete
+#   GET  /health                  uptime, in-flight and queued counts
+
+
+class Submission:
+    def __init__(self, kind, job_folder, target):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.job_folder = job_folder
+        self.target = target
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error = None
+        self.total = None
+        self.results = []
+        self.failures = []
+        self.created = time.time()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def add_result(self, result):
+        with self.lock:
+            self.results.append(result)
+
+    def add_failure(self, resume_path, error):
+        with self.lock:
+            self.failures.append({"resume_path": resume_path, "error": str(error)})
+
+    def is_finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self, include_results=True):
+        with self.lock:
+            data = {
+                "id": self.id,
+                "kind": self.kind,
+                "job_folder": self.job_folder,
+                "target": self.target,
+                "status": self.status,
+                "error": self.error,
+                "total": self.total,
+                "completed": len(self.results),
+                "failed": len(self.failures),
+                "created": self.created,
+                "finished": self.finished,
+            }
+            if include_results:
+                data["results"] = list(self.results)
+                data["failures"] = list(self.failures)
+        return data
+
+
+class ScoringService:
+    """
+    prepare_job(job_folder, refresh) -> (job_context, [resume_paths])
+    score_resume(job_context, resume_path, resume_text) -> JSON-serializable result
+    """
+
+    def __init__(self, prepare_job, score_resume, max_concurrency=4, max_pending=1000,
+                 max_finished=500, retention=3600):
+        self.prepare_job = prepare_job
+        self.score_resume = score_resume
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.retention = retention
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="score")
+        self.submissions = {}
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.in_flight = 0
+        self.started = time.time()
+
+    # --- Scheduling ---
+    def _reserve(self, n):
+        with self.lock:
+            if self.pending + n > self.max_pending:
+                return False
+            self.pending += n
+            return True
+
+    def _run_resume(self, submission, job_context, resume_path, resume_text, remaining):
+        with self.lock:
+            self.pending -= 1
+            self.in_flight += 1
+        try:
+            result = self.score_resume(job_context, resume_path, resume_text)
+            submission.add_result(result)
+        except Exception as e:
+            logging.error(f"[Service] {submission.id}: scoring {resume_path} failed: {e}")
+            submission.add_failure(resume_path, e)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._finish(submission)
+
+    def _finish(self, submission, error=None):
+        submission.status = "failed" if error is not None else "done"
+        submission.error = str(error) if error is not None else None
+        submission.finished = time.time()
+        self._evict()
+
+    def _evict(self):
+        """Drop finished submissions older than `retention`, then the oldest beyond `max_finished`."""
+        now = time.time()
+        with self.lock:
+            finished = sorted((s for s in self.submissions.values() if s.finished is not None),
+                              key=lambda s: s.finished)
+            expired = [s for s in finished if now - s.finished > self.retention]
+            kept = finished[len(expired):]
+            expired += kept[:max(0, len(kept) - self.max_finished)]
+            for s in expired:
+                del self.submissions[s.id]
+
+    def _start(self, submission, resume_paths=None, resume_text=None, refresh=False):
+        """Prepare the job (cached per folder) on a coordinator thread and fan resumes out to the pool."""
+        def coordinate():
+            try:
+                job_context, job_resumes = self.prepare_job(submission.job_folder, refresh)
+                paths = resume_paths if resume_paths is not None else job_resumes
+            except (Exception, SystemExit) as e:
+                logging.error(f"[Service] {submission.id}: preparing {submission.job_folder} failed: {e}")
+                self._finish(submission, e)
+                return
+            if not paths:
+                submission.total = 0
+                self._finish(submission)
+                return
+            if not self._reserve(len(paths)):
+                self._finish(submission, f"Too many queued resumes (limit {self.max_pending})")
+                return
+            submission.total = len(paths)
+            submission.status = "running"
+            remaining = [len(paths)]
+            for path in paths:
+                self.pool.submit(self._run_resume, submission, job_context, path, resume_text, remaining)
+
+        threading.Thread(target=coordinate, name=f"submit-{submission.id}", daemon=True).start()
+
+    def submit_job(self, job_folder, resume_paths=None, refresh=False):
+        submission = Submission("job", job_folder, resume_paths)
+        with self.lock:
+            self.submissions[submission.id] = submission
+        self._start(submission, resume_paths=resume_paths, refresh=refresh)
+        return submission
+
+    def submit_resume(self, job_folder, resume_path=None, resume_text=None):
+        submission = Submission("resume", job_folder, resume_path or "<inline>")
+        with self.lock:
+            self.submissions[submission.id] = submission
+        self._start(submission, resume_paths=[resume_path or "<inline>"], resume_text=resume_text)
+        return submission
+
+    def health(self):
+        with self.lock:
+            return {
+                "uptime": round(time.time() - self.started, 1),
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "queued": self.pending,
+                "submissions": len(self.submissions),
+            }
+
+    # --- HTTP ---
+    def app(self):
+        async def submit_job(request):
+            body = await _json_body(request)
+            if not body.get("job_folder"):
+                return JSONResponse({"error": "job_folder is required"}, status_code=400)
+            if self.pending >= self.max_pending:
+                return JSONResponse({"error": "Service is at capacity, retry later"}, status_code=429)
+            submission = self.submit_job(body["job_folder"], body.get("resumes"), bool(body.get("refresh")))
+            return JSONResponse({"id": submission.id, "status": submission.status}, status_code=202)
+
+        async def submit_resume(request):
+            body = await _json_body(request)
+            if not body.get("job_folder") or not (body.get("resume_path") or body.get("resume_text")):
+                return JSONResponse({"error": "job_folder and resume_path or resume_text are required"},
+                                    status_code=400)
+            if self.pending >= self.max_pending:
+                return JSONResponse({"error": "Service is at capacity, retry later"}, status_code=429)
+            submission = self.submit_resume(body["job_folder"], body.get("resume_path"), body.get("resume_text"))
+            return JSONResponse({"id": submission.id, "status": submission.status}, status_code=202)
+
+        async def list_submissions(request):
+            with self.lock:
+                submissions = list(self.submissions.values())
+            return JSONResponse([s.to_dict(include_results=False) for s in submissions])
+
+        async def get_submission(request):
+            submission = self.submissions.get(request.path_params["id"])
+            if submission is None:
+                return JSONResponse({"error": "Unknown submission"}, status_code=404)
+            return JSONResponse(submission.to_dict())
+
+        async def stream_submission(request):
+            submission = self.submissions.get(request.path_params["id"])
+            if submission is None:
+                return JSONResponse({"error": "Unknown submission"}, status_code=404)
+
+            async def lines():
+                sent_results = sent_failures = 0
+                while True:
+                    finished = submission.is_finished()
+                    with submission.lock:
+                        results = submission.results[sent_results:]
+                        failures = submission.failures[sent_failures:]
+                    for result in results:
+                        yield json.dumps({"type": "result", "result": result}, ensure_ascii=False) + "\n"
+                    for failure in failures:
+                        yield json.dumps({"type": "failure", **failure}, ensure_ascii=False) + "\n"
+                    sent_results += len(results)
+                    sent_failures += len(failures)
+                    if finished:
+                        summary = submission.to_dict(include_results=False)
+                        yield json.dumps({"type": "done", **summary}, ensure_ascii=False) + "\n"
+                        return
+                    await asyncio.sleep(0.1)
+
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        async def health(request):
+            return JSONResponse(self.health())
+
+        return Starlette(routes=[
+            Route("/jobs", submit_job, methods=["POST"]),
+            Route("/resumes", submit_resume, methods=["POST"]),
+            Route("/submissions", list_submissions),
+            Route("/submissions/{id}", get_submission),
+            Route("/submissions/{id}/stream", stream_submission),
+            Route("/health", health),
+        ])
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+        return body if isinstance(body, dict) else {}
+    except Exception:
+        return {}
@@ -0,0 +1,141 @@
+import json
+import heapq
+import logging
+from datetime import datetime
+from util.candidate_index import tokenize
+
+# Top-K shortlist with approximate early termination.
+# Resumes are scored in descending order of a cheap lexical prior; once the
+# shortlist is full, scoring stops as soon as the estimated score bound of the
+# next candidate cannot beat the weakest shortlisted score. The bound is learned
+# from the score/prior ratios seen so far, so it is a heuristic, not a proof: a
+# pruned candidate could still have made the top-K. Pruned and failed
+# candidates are counted separately in the stats.
+
+
+def lexical_prior(jd_text, resume_text):
+    """Fraction of the job description's vocabulary that also appears in the resume (0–1)."""
+    jd_terms = set(tokenize(jd_text or ""))
+    if not jd_terms:
+        return 0.0
+    resume_terms = set(tokenize(resume_text or ""))
+    return len(jd_terms & resume_terms) / len(jd_terms)
+
+
+class Shortlist:
+    """Live top-K min-heap of (score, key) with a minimum admission score."""
+
+    def __init__(self, k, min_score=0):
+        self.k = k
+        self.min_score = min_score
+        self._heap = []
+        self._seq = 0
+
+    def is_full(self):
+        return len(self._heap) >= self.k
+
+    def threshold(self):
+        """Score a new candidate must beat to enter the shortlist."""
+        if not self.is_full():
+            return self.min_score
+        return max(self.min_score, self._heap[0][0])
+
+    def offer(self, key, score, payload=None):
+        """Try to admit a scored candidate; returns True if it entered the shortlist."""
+        if score is None or score < self.min_score:
+            return False
+        self._seq += 1
+        entry = (score, -self._seq, key, payload)
+        if not self.is_full():
+            heapq.heappush(self._heap, entry)
+            return True
+        if score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def ranked(self):
+        """Shortlisted entries as [(key, score, payload)], best first."""
+        return [(key, score, payload) for score, _, key, payload in sorted(self._heap, reverse=True)]
+
+
+class ScoreBound:
+    """
+    Estimated (not guaranteed) upper bound on the LLM score of an unscored
+    candidate, learned from the score/prior ratios observed so far. `slack`
+    widens the estimate to absorb noise in the prior.
+    """
+
+    def __init__(self, max_score=100, slack=1.1, warmup=5):
+        self.max_score = max_score
+        self.slack = slack
+        self.warmup = warmup
+        self.max_ratio = 0.0
+        self.observed = 0
+
+    def observe(self, prior, score):
+        if score is None:
+            return
+        self.observed += 1
+        self.max_ratio = max(self.max_ratio, score / max(prior, 1e-3))
+
+    def upper_bound(self, prior):
+        if self.observed < self.warmup:
+            return self.max_score
+        return min(self.max_score, prior * self.max_ratio * self.slack)
+
+
+def run_shortlist(candidates, score_fn, k=10, min_score=0, warmup=None):
+    """
+    Score candidates best-prior-first until the estimated bound says the top-K
+    will not change (approximate: see ScoreBound).
+
+    candidates: list of (key, prior) tuples.
+    score_fn: callable(key) -> (score, payload); score may be None on failure.
+    Returns (shortlist, stats) with stats {"candidates", "scored", "failed", "pruned"}.
+    """
+    ordered = sorted(candidates, key=lambda c: c[1], reverse=True)
+    shortlist = Shortlist(k, min_score)
+    bound = ScoreBound(warmup=max(k, 5) if warmup is None else warmup)
+    scored = failed = pruned = 0
+    for position, (key, prior) in enumerate(ordered):
+        if shortlist.is_full() and bound.upper_bound(prior) <= shortlist.threshold():
+            pruned = len(ordered) - position
+            logging.info(f"[Shortlist] Early stop: estimated bound {bound.upper_bound(prior):.1f} "
+                         f"<= threshold {shortlist.threshold():.1f} at candidate {position + 1}/{len(ordered)}, "
+                         f"{pruned} pruned")
+            break
+        try:
+            score, payload = score_fn(key)
+        except Exception as e:
+            logging.error(f"[Shortlist] Scoring failed for {key}: {e}")
+            failed += 1
+            continue
+        scored += 1
+        bound.observe(prior, score)
+        shortlist.offer(key, score, payload)
+    stats = {"candidates": len(ordered), "scored": scored, "failed": failed, "pruned": pruned}
+    return shortlist, stats
+
+
+def leaderboard_json(job_folder, shortlist, stats, priors=None):
+    """Serialize a ranked shortlist into the leaderboard file format."""
+    priors = priors or {}
+    entries = []
+    for rank, (key, score, payload) in enumerate(shortlist.ranked(), 1):
+        entry = {
+            "rank": rank,
+            "resume": key,
+            "compatibilityScore": score,
+            "prior": round(priors.get(key, 0.0), 4),
+        }
+        entry.update(payload or {})
+        entries.append(entry)
+    return json.dumps({
+        "job": job_folder,
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "k": shortlist.k,
+        "minScore": shortlist.min_score,
+        "stats": stats,
+        "leaderboard": entries,
+    }, indent=2, ensure_ascii=False)
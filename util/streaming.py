@@ -0,0 +1,123 @@
+import time
+import threading
+from collections import defaultdict
+
+# Streaming LLM invocation with incremental JSON scanning.
+# Chunks from `llm.stream()` are fed to a scanner that tracks brace depth
+# outside of string literals; as soon as the top-level JSON object closes the
+# stream is abandoned, so trailing commentary is never generated or paid for.
+
+
+class JSONObjectScanner:
+    """Incrementally finds the end of the first top-level JSON object in a text stream."""
+
+    def __init__(self):
+        self.buffer = []
+        self.length = 0
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.end = None  # absolute offset just past the closing brace
+
+    def feed(self, chunk):
+        """Consume a chunk; returns True once the top-level object is complete."""
+        if self.end is not None:
+            return True
+        for i, ch in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.started:
+                self.in_string = True
+            elif ch == "{":
+                self.started = True
+                self.depth += 1
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.length + i + 1
+                    break
+        self.buffer.append(chunk)
+        self.length += len(chunk)
+        return self.end is not None
+
+    def text(self):
+        """Everything received so far, cut just after the closing brace if seen."""
+        full = "".join(self.buffer)
+        return full if self.end is None else full[:self.end]
+
+    def discarded(self):
+        """Characters received after the closing brace (in the final chunk)."""
+        return 0 if self.end is None else self.length - self.end
+
+
+class StreamStats:
+    """Per-agent streaming statistics: time to first token, time to JSON close, early stops."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: {"calls": 0, "ttft": 0.0, "json_close": 0.0,
+                                          "early_stops": 0, "discarded_chars": 0})
+
+    def record(self, agent, ttft, json_close, early_stop, discarded_chars):
+        with self.lock:
+            s = self.stats[agent]
+            s["calls"] += 1
+            s["ttft"] += ttft or 0.0
+            s["json_close"] += json_close
+            s["early_stops"] += int(early_stop)
+            s["discarded_chars"] += discarded_chars
+
+    def summary(self):
+        # Discarded text was received but cut off after the JSON closed; tokens estimated at ~4 chars each
+        lines = ["==================== STREAMING SUMMARY ====================",
+                 f"{'Agent':<30}{'Calls':>7}{'Avg TTFT(s)':>13}{'Avg close(s)':>14}{'Early stops':>13}"
+                 f"{'Discarded':>11}{'~Tokens':>9}"]
+        for agent, s in self.stats.items():
+            calls = max(1, s["calls"])
+            lines.append(f"{agent:<30}{s['calls']:>7}{s['ttft'] / calls:>13.2f}"
+                         f"{s['json_close'] / calls:>14.2f}{s['early_stops']:>13}"
+                         f"{s['discarded_chars']:>11}{s['discarded_chars'] // 4:>9}")
+        early = sum(s["early_stops"] for s in self.stats.values())
+        discarded = sum(s["discarded_chars"] for s in self.stats.values())
+        lines.append(f"Early stops cut {discarded} trailing char(s) (~{discarded // 4} tokens) in {early} call(s)")
+        return "\n".join(lines)
+
+
+def stream_json(llm, prompt, agent=None, stats=None, cancel=None):
+    """
+    Stream a completion and stop as soon as the top-level JSON object closes.
+    Returns the content up to (and including) the closing brace, or the whole
+    response if no complete object was produced. Setting the optional `cancel`
+    event abandons the stream at the next chunk.
+    """
+    scanner = JSONObjectScanner()
+    start = time.perf_counter()
+    ttft = None
+    early_stop = False
+    stream = llm.stream(prompt)
+    try:
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                break
+            content = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if not content:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            if scanner.feed(content):
+                early_stop = True
+                break
+    finally:
+        # Closing the generator closes the HTTP stream, cancelling the rest of the generation
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    if stats is not None and not (cancel is not None and cancel.is_set()):
+        stats.record(agent or "llm", ttft, time.perf_counter() - start, early_stop, scanner.discarded())
+    return scanner.text()
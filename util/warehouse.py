@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import uuid
+import argparse
+from datetime import datetime, timezone
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columnar results warehouse.
+# Every scoring run appends one typed row per resume to a local Parquet dataset,
+# hive-partitioned by job and run date:
+#     <WAREHOUSE_PATH>/job_folder=<job>/run_date=<YYYY-MM-DD>/<run_id>.parquet
+# DuckDB reads the whole dataset for reporting (canned queries below, or raw SQL
+# against the `results` view), so questions about past runs never touch the LLM.
+#
+# Usage: python util/warehouse.py {summary,decisions,missing-skills,matched-skills,top,costs,stages,sql,compact} ...
+
+WAREHOUSE_PATH = os.getenv("WAREHOUSE_PATH", "results_warehouse")
+STAGES = {
+    "parser": "resume_parser_agent",
+    "compat": "compatibility_analyzer_agent",
+    "audit": "audit_agent",
+}
+# Same thresholds as the audit validator in util/audit.py
+ACCEPT_SCORE = 80
+REVIEW_SCORE = 60
+
+SCHEMA = pa.schema(
+    [
+        ("run_id", pa.string()),
+        ("run_ts", pa.timestamp("s", tz="UTC")),
+        ("mode", pa.string()),
+        ("resume_path", pa.string()),
+        ("candidate_name", pa.string()),
+        ("compatibility_score", pa.float64()),
+        ("final_decision", pa.string()),
+        ("audit_status", pa.string()),
+        ("matched_skills", pa.list_(pa.string())),
+        ("missing_skills", pa.list_(pa.string())),
+        ("duplicate_of", pa.string()),
+        ("input_tokens", pa.int64()),
+        ("output_tokens", pa.int64()),
+        ("cost", pa.float64()),
+        ("latency_seconds", pa.float64()),
+    ]
+    + [(f"{stage}_{field}", pa.int64() if field != "seconds" else pa.float64())
+       for stage in STAGES for field in ("input_tokens", "output_tokens", "seconds")]
+)
+
+
+def _load(text):
+    try:
+        data = json.loads(text) if isinstance(text, str) else text
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def final_decision(score, audit):
+    """ACCEPT/REVIEW/REJECT: the audit's own decision if it gives one, else by score; a failed audit caps at REVIEW."""
+    decision = audit.get("finalDecision")
+    if decision in ("ACCEPT", "REVIEW", "REJECT"):
+        return decision
+    if score is None:
+        return None
+    decision = "ACCEPT" if score >= ACCEPT_SCORE else "REVIEW" if score >= REVIEW_SCORE else "REJECT"
+    if decision == "ACCEPT" and str(audit.get("auditStatus", "")).lower() == "fail":
+        decision = "REVIEW"
+    return decision
+
+
+def _stage_cost(pricing, agent, input_tokens, output_tokens):
+    # Per-agent pricing ({agent: {"input", "output"}}) or one flat price for every agent, per 1K tokens
+    price = pricing.get(agent, pricing)
+    return (input_tokens / 1000) * price["input"] + (output_tokens / 1000) * price["output"]
+
+
+def result_row(run_id, run_ts, mode, resume_path, final_state, pricing):
+    """One warehouse row from a final graph state; each stage is priced at its own agent's rate."""
+    compat = _load(final_state.get("compatibility_score"))
+    audit = _load(final_state.get("audit_result"))
+    parsed = _load(final_state.get("parsed_resume"))
+    skills = (compat.get("analysis") or {}).get("skillAnalysis") or {}
+    try:
+        score = float(compat["compatibilityScore"]) if compat.get("compatibilityScore") is not None else None
+    except (TypeError, ValueError):
+        score = None
+    row = {
+        "run_id": run_id,
+        "run_ts": run_ts,
+        "mode": mode,
+        "resume_path": resume_path,
+        "candidate_name": parsed.get("fullName"),
+        "compatibility_score": score,
+        "final_decision": final_decision(score, audit),
+        "audit_status": audit.get("auditStatus"),
+        "matched_skills": [str(s) for s in skills.get("matchedSkills") or []],
+        "missing_skills": [str(s) for s in skills.get("missingSkills") or []],
+        "duplicate_of": final_state.get("duplicate_of"),
+    }
+    # Duplicates reuse another resume's result, so they cost nothing themselves
+    metrics = {} if final_state.get("duplicate_of") else (final_state.get("stage_metrics") or {})
+    total_in = total_out = 0
+    total_seconds = cost = 0.0
+    for stage, agent in STAGES.items():
+        m = metrics.get(agent) or {}
+        row[f"{stage}_input_tokens"] = int(m.get("input", 0))
+        row[f"{stage}_output_tokens"] = int(m.get("output", 0))
+        row[f"{stage}_seconds"] = float(m.get("seconds", 0.0))
+        total_in += row[f"{stage}_input_tokens"]
+        total_out += row[f"{stage}_output_tokens"]
+        total_seconds += row[f"{stage}_seconds"]
+        cost += _stage_cost(pricing, agent, row[f"{stage}_input_tokens"], row[f"{stage}_output_tokens"])
+    row["input_tokens"] = total_in
+    row["output_tokens"] = total_out
+    row["latency_seconds"] = total_seconds
+    row["cost"] = cost
+    return row
+
+
+def _partition_value(value):
+    return str(value).replace("/", "_").replace("=", "_")
+
+
+def append_results(job_folder, results, pricing, mode="default", root=None):
+    """
+    Append one row per (resume_path, final_state) in `results` for a job.
+    Returns the path of the Parquet file written, or None if there was nothing to write.
+    """
+    if not results:
+        return None
+    root = root or WAREHOUSE_PATH
+    run_id = uuid.uuid4().hex[:12]
+    run_ts = datetime.now(timezone.utc).replace(microsecond=0)
+    rows = [result_row(run_id, run_ts, mode, path, state, pricing) for path, state in results]
+    directory = os.path.join(root, f"job_folder={_partition_value(job_folder)}",
+                             f"run_date={run_ts.date().isoformat()}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{run_id}.parquet")
+    pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMA), path, compression="zstd")
+    return path
+
+
+def compact(root=None):
+    """
+    Merge the per-run files of every job/date partition into one file; DuckDB
+    scans far fewer files afterwards. Returns (partitions compacted, files removed).
+    """
+    root = root or WAREHOUSE_PATH
+    partitions = files_removed = 0
+    for directory, _, names in os.walk(root):
+        files = sorted(os.path.join(directory, n) for n in names if n.endswith(".parquet"))
+        if len(files) < 2:
+            continue
+        table = pa.concat_tables([pq.read_table(f, schema=SCHEMA) for f in files])
+        merged = os.path.join(directory, f"compacted-{uuid.uuid4().hex[:12]}.parquet")
+        pq.write_table(table, merged + ".tmp", compression="zstd")
+        os.replace(merged + ".tmp", merged)
+        for f in files:
+            os.remove(f)
+        partitions += 1
+        files_removed += len(files)
+    return partitions, files_removed
+
+
+def connect(root=None):
+    """DuckDB connection with a `results` view over the whole dataset (partition columns included)."""
+    root = root or WAREHOUSE_PATH
+    con = duckdb.connect()
+    pattern = os.path.join(root, "**", "*.parquet")
+    con.execute(f"CREATE VIEW results AS SELECT * FROM read_parquet('{pattern}', "
+                f"hive_partitioning = true, union_by_name = true)")
+    return con
+
+
+def _filters(args):
+    clauses, params = [], []
+    if getattr(args, "job", None):
+        clauses.append("job_folder = ?")
+        params.append(args.job)
+    if getattr(args, "since", None):
+        clauses.append("run_date >= CAST(? AS DATE)")
+        params.append(args.since)
+    if getattr(args, "until", None):
+        clauses.append("run_date <= CAST(? AS DATE)")
+        params.append(args.until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _and(where, clause):
+    return f"{where} AND {clause}" if where else f" WHERE {clause}"
+
+
+# Canned queries: name -> function(args, where) returning SQL
+QUERIES = {
+    "summary": lambda args, where: f"""
+        SELECT job_folder, count(*) AS resumes, round(avg(compatibility_score), 1) AS avg_score,
+               count(*) FILTER (WHERE final_decision = 'ACCEPT') AS accept,
+               count(*) FILTER (WHERE final_decision = 'REVIEW') AS review,
+               count(*) FILTER (WHERE final_decision = 'REJECT') AS reject,
+               max(run_date) AS last_run
+        FROM results{where} GROUP BY job_folder ORDER BY resumes DESC""",
+    "decisions": lambda args, where: f"""
+        SELECT final_decision, count(*) AS resumes, count(DISTINCT job_folder) AS jobs
+        FROM results{where} GROUP BY final_decision ORDER BY resumes DESC""",
+    "missing-skills": lambda args, where: f"""
+        SELECT lower(skill) AS skill, count(*) AS resumes, count(DISTINCT job_folder) AS jobs
+        FROM (SELECT job_folder, unnest(missing_skills) AS skill FROM results{where})
+        GROUP BY 1 ORDER BY resumes DESC LIMIT {int(args.limit)}""",
+    "matched-skills": lambda args, where: f"""
+        SELECT lower(skill) AS skill, count(*) AS resumes, count(DISTINCT job_folder) AS jobs
+        FROM (SELECT job_folder, unnest(matched_skills) AS skill FROM results{where})
+        GROUP BY 1 ORDER BY resumes DESC LIMIT {int(args.limit)}""",
+    "top": lambda args, where: f"""
+        SELECT job_folder, resume_path, candidate_name, compatibility_score, final_decision, run_date
+        FROM results{_and(where, 'compatibility_score IS NOT NULL')}
+        QUALIFY row_number() OVER (PARTITION BY job_folder, resume_path ORDER BY run_ts DESC) = 1
+        ORDER BY compatibility_score DESC LIMIT {int(args.limit)}""",
+    "costs": lambda args, where: f"""
+        SELECT job_folder, count(*) AS resumes, sum(input_tokens) AS input_tokens,
+               sum(output_tokens) AS output_tokens, round(sum(cost), 4) AS cost,
+               round(avg(latency_seconds), 2) AS avg_latency_s
+        FROM results{where} GROUP BY job_folder ORDER BY cost DESC""",
+    "stages": lambda args, where: " UNION ALL ".join(
+        f"""SELECT '{agent}' AS stage, count(*) AS calls,
+               round(avg({stage}_input_tokens), 1) AS avg_input_tokens,
+               round(avg({stage}_output_tokens), 1) AS avg_output_tokens,
+               round(avg({stage}_seconds), 2) AS avg_seconds
+            FROM results{_and(where, f'{stage}_input_tokens > 0')}"""
+        for stage, agent in STAGES.items()),
+}
+
+
+def run_query(con, sql, params=()):
+    """Execute a query; returns (column names, rows)."""
+    params = list(params)
+    if params:
+        # Queries that union one SELECT per stage repeat the filter clause
+        params = params * (sql.count("?") // len(params))
+    cursor = con.execute(sql, params)
+    return [d[0] for d in cursor.description], cursor.fetchall()
+
+
+def format_table(columns, rows):
+    cells = [[("" if v is None else str(v)) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths)),
+             "  ".join("-" * w for w in widths)]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in cells]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the scoring results warehouse")
+    parser.add_argument("query", choices=sorted(QUERIES) + ["sql", "compact"])
+    parser.add_argument("sql", nargs="?", help="SQL against the `results` view (for the sql command)")
+    parser.add_argument("--job", help="Only this job folder")
+    parser.add_argument("--since", help="Only runs on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="Only runs on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=20, help="Rows for top/skill queries (default: 20)")
+    parser.add_argument("--path", default=WAREHOUSE_PATH, help=f"Warehouse root (default: {WAREHOUSE_PATH})")
+    args = parser.parse_args()
+    if not os.path.isdir(args.path):
+        print(f"❌ No warehouse at {args.path}; run the pipeline first.")
+        sys.exit(1)
+    if args.query == "compact":
+        partitions, removed = compact(args.path)
+        print(f"✅ Compacted {partitions} partition(s), merged {removed} file(s)")
+        return
+    con = connect(args.path)
+    if args.query == "sql":
+        if not args.sql:
+            parser.error("the sql command needs a query")
+        sql, params = args.sql, []
+    else:
+        where, params = _filters(args)
+        sql = QUERIES[args.query](args, where)
+    columns, rows = run_query(con, sql, params)
+    print(format_table(columns, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import logging
+import tempfile
+
+# Watch mode: incrementally score newly uploaded resumes.
+# Each poll lists every job's resumes folder (one storage call per job) and diffs
+# the listing against a stored cursor of file fingerprints (eTag, or size+mtime
+# for local files). Only new or changed PDFs are ingested and scored, and the
+# cursor is persisted after every resume, so a cycle can be interrupted and
+# rerun at any point without rescoring anything. Extracted job requirements are
+# cached in the same state file per job, keyed by the job description's
+# fingerprint, so they are only recomputed when the JD itself changes.
+#
+# Layout (Supabase bucket or local directory):
+#     <job_folder>/<job description>.pdf
+#     <job_folder>/resumes/<resume>.pdf
+
+STATE_PATH = os.getenv("WATCH_STATE_PATH", "watch_state.json")
+MAX_ATTEMPTS = int(os.getenv("WATCH_MAX_ATTEMPTS", "3"))
+
+
+class WatchState:
+    """Cursor file: per source and job, the fingerprint and outcome of every resume seen."""
+
+    def __init__(self, path=None):
+        self.path = path or STATE_PATH
+        self.data = {"sources": {}}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def source(self, source_id):
+        return self.data["sources"].setdefault(source_id, {"jobs": {}})
+
+    def job(self, source_id, job_folder):
+        return self.source(source_id)["jobs"].setdefault(job_folder, {"files": {}, "jd": None})
+
+    def save(self):
+        # Atomic replace: a crash never leaves a half-written cursor behind
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".watch_state.")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+
+class LocalSource:
+    """Job folders in a local directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.id = f"local:{os.path.abspath(root)}"
+
+    def list_jobs(self):
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def _pdfs(self, folder):
+        entries = {}
+        if not os.path.isdir(folder):
+            return entries
+        with os.scandir(folder) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                    stat = entry.stat()
+                    entries[entry.name] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        return entries
+
+    def list_resumes(self, job_folder):
+        return self._pdfs(os.path.join(self.root, job_folder, "resumes"))
+
+    def job_description(self, job_folder):
+        pdfs = self._pdfs(os.path.join(self.root, job_folder))
+        if not pdfs:
+            return None
+        name = sorted(pdfs)[0]
+        return name, pdfs[name]
+
+    def read_text(self, job_folder, name, resume=True):
+        from util.parsing import parse_pdf
+        folder = os.path.join(self.root, job_folder, "resumes" if resume else "")
+        return parse_pdf(os.path.join(folder, name))
+
+    def resume_key(self, job_folder, name):
+        return os.path.join(self.root, job_folder, "resumes", name)
+
+    def store_results(self):
+        return False
+
+
+class SupabaseSource:
+    """Job folders in the job-documents bucket; extracted texts are uploaded next to them as usual."""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+        self.id = f"supabase:{bucket}"
+
+    def _list(self, folder):
+        return self.client.storage.from_(self.bucket).list(folder)
+
+    @staticmethod
+    def _fingerprint(item):
+        metadata = item.get("metadata") or {}
+        return metadata.get("eTag") or f"{metadata.get('size')}:{item.get('updated_at')}"
+
+    def list_jobs(self):
+        return [item["name"] for item in self._list("") if not item["name"].endswith(".pdf")]
+
+    def list_resumes(self, job_folder):
+        try:
+            items = self._list(f"{job_folder}/resumes")
+        except Exception:
+            return {}
+        return {item["name"]: self._fingerprint(item) for item in items if item["name"].endswith(".pdf")}
+
+    def job_description(self, job_folder):
+        pdfs = [item for item in self._list(job_folder) if item["name"].endswith(".pdf")]
+        if not pdfs:
+            return None
+        item = sorted(pdfs, key=lambda i: i["name"])[0]
+        return item["name"], self._fingerprint(item)
+
+    def read_text(self, job_folder, name, resume=True):
+        """Download and parse the PDF, and upload its .txt where process_and_upload would put it."""
+        from util.parsing import download_file, parse_pdf
+        src_path = f"{job_folder}/resumes/{name}" if resume else f"{job_folder}/{name}"
+        txt_path = self.resume_key(job_folder, name) if resume else f"{job_folder}/{os.path.splitext(name)[0]}.txt"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            local_pdf = os.path.join(tmpdir, name)
+            download_file(self.bucket, src_path, local_pdf)
+            text = parse_pdf(local_pdf)
+        if text:
+            from util.supabase_utils import upload_text_to_supabase
+            try:
+                upload_text_to_supabase(self.bucket, txt_path, text)
+            except Exception as e:
+                logging.error(f"[Watch] Failed to upload {txt_path}: {e}")
+        return text
+
+    def resume_key(self, job_folder, name):
+        return f"{job_folder}/parsed/{os.path.splitext(name)[0]}.txt"
+
+    def store_results(self):
+        return True
+
+
+def poll_once(source, state, extract_fn, score_fn, backfill=False, max_attempts=None, on_job_done=None):
+    """
+    One idempotent poll cycle over every job of a source.
+    extract_fn(job_folder, jd_text) -> job_requirements
+    score_fn(job_folder, jd_text, job_requirements, resume_key, resume_text, store) -> final_state
+    On the first cycle for a source, the resumes already in its jobs are recorded
+    as a baseline (not scored) unless backfill=True. Jobs created after that are
+    new work and all of their resumes are scored. Returns the number of resumes scored.
+    """
+    max_attempts = max_attempts or MAX_ATTEMPTS
+    scored_total = 0
+    source_state = state.source(source.id)
+    # State files written before the flag existed already hold the baselined jobs
+    initialised = source_state.get("initialised", bool(source_state["jobs"]))
+    for job_folder in source.list_jobs():
+        job = state.job(source.id, job_folder)
+        listing = source.list_resumes(job_folder)
+        if not initialised and not backfill:
+            for name, fingerprint in listing.items():
+                job["files"][name] = {"fingerprint": fingerprint, "status": "baseline"}
+            job["jd"] = {"fingerprint": None, "job_requirements": None}
+            state.save()
+            if listing:
+                print(f"[Watch] {job_folder}: {len(listing)} existing resume(s) recorded as baseline")
+            continue
+
+        new = [name for name, fingerprint in sorted(listing.items())
+               if (job["files"].get(name) or {}).get("fingerprint") != fingerprint
+               or (job["files"][name]["status"] == "failed" and job["files"][name]["attempts"] < max_attempts)]
+        if not new:
+            continue
+
+        # Job requirements: cached per JD fingerprint
+        jd = source.job_description(job_folder)
+        if jd is None:
+            logging.error(f"[Watch] {job_folder}: no job description PDF, skipping {len(new)} resume(s)")
+            continue
+        jd_name, jd_fingerprint = jd
+        cached = job.get("jd") or {}
+        if cached.get("fingerprint") != jd_fingerprint or not cached.get("job_requirements"):
+            jd_text = source.read_text(job_folder, jd_name, resume=False)
+            if not jd_text:
+                logging.error(f"[Watch] {job_folder}: could not extract {jd_name}")
+                continue
+            job["jd"] = {"fingerprint": jd_fingerprint, "text": jd_text,
+                         "job_requirements": extract_fn(job_folder, jd_text)}
+            state.save()
+        jd_text, job_requirements = job["jd"]["text"], job["jd"]["job_requirements"]
+
+        scored = []
+        for name in new:
+            fingerprint = listing[name]
+            previous = job["files"].get(name) or {}
+            attempts = previous.get("attempts", 0) if previous.get("fingerprint") == fingerprint else 0
+            key = source.resume_key(job_folder, name)
+            try:
+                text = source.read_text(job_folder, name)
+                if not text:
+                    raise ValueError("no text extracted")
+                final_state = score_fn(job_folder, jd_text, job_requirements, key, text, source.store_results())
+                job["files"][name] = {"fingerprint": fingerprint, "status": "scored",
+                                      "scored_at": time.time(), "attempts": attempts + 1}
+                scored.append((key, final_state))
+            except Exception as e:
+                logging.error(f"[Watch] {job_folder}/{name}: {e}")
+                job["files"][name] = {"fingerprint": fingerprint, "status": "failed",
+                                      "attempts": attempts + 1, "error": str(e)[:500]}
+            # Persist after every resume so an interrupted cycle never redoes finished work
+            state.save()
+        scored_total += len(scored)
+        if on_job_done and scored:
+            on_job_done(job_folder, scored)
+    if not initialised:
+        source_state["initialised"] = True
+        state.save()
+    return scored_total
+
+
+def watch(source, state, extract_fn, score_fn, interval=60, backfill=False, once=False, on_job_done=None):
+    """Poll forever (or once); errors in a cycle are logged and retried on the next one."""
+    print(f"👀 Watching {source.id} every {interval}s (state: {state.path})")
+    while True:
+        start = time.perf_counter()
+        try:
+            scored = poll_once(source, state, extract_fn, score_fn, backfill=backfill, on_job_done=on_job_done)
+            if scored:
+                print(f"[Watch] Scored {scored} new resume(s) in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            logging.error(f"[Watch] Poll cycle failed: {e}")
+        if once:
+            return
+        time.sleep(max(0.0, interval - (time.perf_counter() - start)))
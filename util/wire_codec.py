@@ -0,0 +1,157 @@
+import json
+
+# Compact wire schemas for agent outputs.
+# In compact mode the prompts ask the model for short keys; the codec expands
+# the response back to the exact full schema (filling absent fields with null
+# or []) before it enters ResumeState, so downstream code never sees short keys.
+#
+# Spec values: "k"             scalar field
+#              ["k"]           list of scalars
+#              ("k", {...})    nested object
+#              [("k", {...})]  list of nested objects
+
+RESUME_SPEC = {
+    "fullName": "fn",
+    "contactEmail": "em",
+    "contactPhoneNumber": "ph",
+    "linkedInProfileURL": "li",
+    "personalWebsitePortfolioURL": "web",
+    "location": "loc",
+    "summaryObjectiveStatement": "sum",
+    "higherSecondaryEducation": [("hs", {
+        "schoolName": "sc", "board": "bd", "yearOfCompletion": "yr", "percentageGrade": "gr",
+    })],
+    "education": [("ed", {
+        "degree": "dg", "major": "mj", "university": "un", "graduationYear": "yr", "percentageGrade": "gr",
+    })],
+    "workExperience": [("wx", {
+        "jobTitle": "t", "company": "co", "duration": "du", "location": "loc", "responsibilities": ["rs"],
+    })],
+    "projects": [("pr", {
+        "projectName": "n", "description": "d", "technologiesUsed": ["tu"],
+    })],
+    "skills": ["sk"],
+    "softSkills": ["ss"],
+    "certifications": ["ce"],
+    "languagesKnown": ["la"],
+    "awardsHonors": ["aw"],
+    "hobbiesInterests": ["hb"],
+    "extracurricularActivities": [("ex", {
+        "activityName": "n", "description": "d", "achievements": "ac", "duration": "du",
+    })],
+}
+
+COMPAT_SPEC = {
+    "compatibilityScore": "cs",
+    "executiveSummary": "es",
+    "analysis": ("an", {
+        "strengths": ["st"],
+        "weaknesses": ["wk"],
+        "skillAnalysis": ("sa", {
+            "matchedSkills": ["ms"], "missingSkills": ["mi"], "skillGapsRationale": "gr",
+        }),
+        "experienceFit": ("ef", {
+            "seniorityFit": "sf", "domainRelevance": "dr", "yearsOfExperience": "ye",
+        }),
+        "cultureAndGrowth": ("cg", {
+            "culturalFit": "cf", "growthPotential": "gp",
+        }),
+    }),
+    "logisticalCheck": ("lc", {
+        "locationCompatibility": "lo", "workArrangement": "wa", "certificationsAlignment": "ca", "languageFit": "lf",
+    }),
+    "potentialRedFlags": ["rf"],
+}
+
+SPECS = {
+    "resume_parser_agent": RESUME_SPEC,
+    "compatibility_analyzer_agent": COMPAT_SPEC,
+}
+
+
+def _describe(value):
+    """(short_key, is_list, sub_spec) for a spec entry."""
+    is_list = isinstance(value, list)
+    inner = value[0] if is_list else value
+    if isinstance(inner, tuple):
+        return inner[0], is_list, inner[1]
+    return inner, is_list, None
+
+
+def _expand_value(value, is_list, sub):
+    if is_list:
+        if value is None:
+            return []
+        items = value if isinstance(value, list) else [value]
+        return [expand(v, sub) if sub and isinstance(v, dict) else v for v in items]
+    if sub is not None:
+        return expand(value if isinstance(value, dict) else {}, sub)
+    return value
+
+
+def expand(data, spec):
+    """Expand a compact object to the full schema; unknown keys are kept unchanged."""
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    known = set()
+    for full_key, entry in spec.items():
+        short, is_list, sub = _describe(entry)
+        known.add(short)
+        # Accept the full key too, in case the model ignored the compact instruction
+        if short in data:
+            value = data[short]
+        else:
+            value = data.get(full_key)
+            known.add(full_key)
+        result[full_key] = _expand_value(value, is_list, sub)
+    for key, value in data.items():
+        if key not in known:
+            result[key] = value
+    return result
+
+
+def compress(data, spec):
+    """Inverse of expand: map a full-schema object to short keys."""
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for key, value in data.items():
+        if key not in spec:
+            result[key] = value
+            continue
+        short, is_list, sub = _describe(spec[key])
+        if sub is not None and is_list and isinstance(value, list):
+            value = [compress(v, sub) for v in value]
+        elif sub is not None and isinstance(value, dict):
+            value = compress(value, sub)
+        result[short] = value
+    return result
+
+
+def schema_keys(data, prefix=""):
+    """Set of dotted key paths in a JSON object (list elements share the path)."""
+    keys = set()
+    if isinstance(data, dict):
+        for key, value in data.items():
+            path = f"{prefix}.{key}" if prefix else key
+            keys.add(path)
+            keys |= schema_keys(value, path)
+    elif isinstance(data, list):
+        for item in data:
+            keys |= schema_keys(item, prefix + "[]")
+    return keys
+
+
+def is_lossless(full, spec):
+    """True if a full-schema object survives compress → expand unchanged."""
+    return expand(compress(full, spec), spec) == expand(full, spec)
+
+
+def expand_json(text, agent):
+    """Expand a compact JSON string for an agent; non-JSON text is returned as-is."""
+    try:
+        data = json.loads(text)
+    except Exception:
+        return text
+    return json.dumps(expand(data, SPECS[agent]), ensure_ascii=False)
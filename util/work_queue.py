@@ -0,0 +1,372 @@
+import os
+import time
+import json
+import socket
+import sqlite3
+import logging
+
+# SQLite-backed work queue for parallel scoring on one host or many.
+# The coordinator enqueues one task per (job, resume); workers lease tasks, run
+# the resume graph and ack the result. The database uses WAL mode, whose locking
+# only works between processes of one host, so the file itself must never be on
+# a network share (NFS/SMB). Workers on other machines go through the queue
+# server instead (serve_queue, `main.py --serve-queue`): a small HTTP lease/ack
+# API in front of the file. Setting WORK_QUEUE_URL makes open_queue() return a
+# RemoteWorkQueue with the same methods as WorkQueue (optionally authenticated
+# with a shared WORK_QUEUE_TOKEN). A lease that is not acked before it expires
+# (crashed or stuck worker) makes the task available again. Failed tasks are retried up to
+# `max_attempts` times and then moved to the dead-letter state.
+#
+# Task states: pending -> leased -> done
+#                           \-> pending (retry) / dead (attempts exhausted)
+
+QUEUE_PATH = os.getenv("WORK_QUEUE_PATH", "work_queue.db")
+LEASE_SECONDS = int(os.getenv("WORK_QUEUE_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+QUEUE_URL = os.getenv("WORK_QUEUE_URL")
+QUEUE_TOKEN = os.getenv("WORK_QUEUE_TOKEN")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_folder TEXT PRIMARY KEY,
+    job_description TEXT NOT NULL,
+    job_requirements TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_folder TEXT NOT NULL REFERENCES jobs(job_folder),
+    resume_path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (job_folder, resume_path)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until);
+"""
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None):
+        self.path = path or QUEUE_PATH
+        self.lease_seconds = lease_seconds or LEASE_SECONDS
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        # A queue server may call it from its event-loop thread; one thread uses it at a time
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _write(self, sql, params=()):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute(sql, params)
+            self.conn.execute("COMMIT")
+            return cursor
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # --- Coordinator ---
+    def add_job(self, job_folder, job_description, job_requirements):
+        self._write("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)",
+                    (job_folder, job_description, job_requirements, time.time()))
+
+    def get_job(self, job_folder):
+        return self.conn.execute("SELECT * FROM jobs WHERE job_folder = ?", (job_folder,)).fetchone()
+
+    def job_version(self, job_folder):
+        """Timestamp of the job's last add_job; changes when it is re-registered with a new JD."""
+        row = self.conn.execute("SELECT created_at FROM jobs WHERE job_folder = ?", (job_folder,)).fetchone()
+        return row["created_at"] if row else None
+
+    def enqueue(self, job_folder, resume_paths):
+        """Add one task per resume; resumes already queued for the job are skipped. Returns the number added."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            added = 0
+            for path in resume_paths:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO tasks (job_folder, resume_path, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?)", (job_folder, path, now, now))
+                added += cursor.rowcount
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    # --- Worker ---
+    def lease(self, worker):
+        """
+        Atomically claim the oldest available task: pending, or leased with an
+        expired lease. Returns the task row or None if nothing is available.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = self.conn.execute(
+                    "SELECT * FROM tasks WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+                if row["status"] != "leased" or row["attempts"] < self.max_attempts:
+                    break
+                # The last allowed attempt timed out: dead-letter it instead of leasing again
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'dead', worker = NULL, lease_until = NULL, "
+                    "error = ?, updated_at = ? WHERE id = ?",
+                    (f"lease expired (worker {row['worker']})", now, row["id"]))
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row["id"]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return self.conn.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone()
+
+    def ack(self, task_id, worker, result):
+        """Mark a leased task done. Returns False if the lease was lost to another worker."""
+        cursor = self._write(
+            "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND worker = ?",
+            (result, time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error):
+        """Release a failed task for retry, or dead-letter it once its attempts are used up."""
+        cursor = self._write(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END, "
+            "error = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND status = 'leased' AND worker = ?",
+            (self.max_attempts, str(error)[:2000], time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    # --- Status ---
+    def counts(self, job_folder=None):
+        sql = "SELECT job_folder, status, COUNT(*) AS n FROM tasks"
+        params = ()
+        if job_folder:
+            sql += " WHERE job_folder = ?"
+            params = (job_folder,)
+        counts = {}
+        for row in self.conn.execute(sql + " GROUP BY job_folder, status", params):
+            counts.setdefault(row["job_folder"], {})[row["status"]] = row["n"]
+        return counts
+
+    def active_leases(self):
+        return self.conn.execute(
+            "SELECT id, job_folder, resume_path, worker, lease_until, attempts FROM tasks "
+            "WHERE status = 'leased' ORDER BY lease_until").fetchall()
+
+    def dead_letters(self, job_folder=None):
+        sql = "SELECT id, job_folder, resume_path, attempts, error FROM tasks WHERE status = 'dead'"
+        params = ()
+        if job_folder:
+            sql += " AND job_folder = ?"
+            params = (job_folder,)
+        return self.conn.execute(sql + " ORDER BY id", params).fetchall()
+
+    def requeue_dead(self, job_folder=None):
+        """Give dead-lettered tasks a fresh set of attempts. Returns the number requeued."""
+        sql = "UPDATE tasks SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'dead'"
+        params = (time.time(),)
+        if job_folder:
+            sql += " AND job_folder = ?"
+            params += (job_folder,)
+        return self._write(sql, params).rowcount
+
+    def results(self, job_folder):
+        return self.conn.execute(
+            "SELECT resume_path, result FROM tasks WHERE job_folder = ? AND status = 'done' ORDER BY id",
+            (job_folder,)).fetchall()
+
+    def status_report(self, job_folder=None):
+        lines = ["==================== WORK QUEUE STATUS ===================="]
+        counts = self.counts(job_folder)
+        if not counts:
+            lines.append("Queue is empty.")
+        lines.append(f"{'Job':<30}{'Pending':>9}{'Leased':>8}{'Done':>7}{'Dead':>7}")
+        for job, c in sorted(counts.items()):
+            lines.append(f"{job:<30}{c.get('pending', 0):>9}{c.get('leased', 0):>8}"
+                         f"{c.get('done', 0):>7}{c.get('dead', 0):>7}")
+        now = time.time()
+        for row in self.active_leases():
+            if job_folder and row["job_folder"] != job_folder:
+                continue
+            state = "expired" if row["lease_until"] < now else f"{row['lease_until'] - now:.0f}s left"
+            lines.append(f"  leased  #{row['id']} {row['resume_path']} by {row['worker']} "
+                         f"(attempt {row['attempts']}, {state})")
+        for row in self.dead_letters(job_folder):
+            lines.append(f"  dead    #{row['id']} {row['resume_path']} after {row['attempts']} attempts: {row['error']}")
+        return "\n".join(lines)
+
+
+class RemoteWorkQueue:
+    """WorkQueue client for a queue server (serve_queue); rows come back as dicts."""
+
+    def __init__(self, url=None, token=None, client=None, timeout=30):
+        import httpx
+        self.path = url or QUEUE_URL
+        token = token or QUEUE_TOKEN
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.client = client or httpx.Client(base_url=self.path, timeout=timeout)
+        self.client.headers.update(headers)
+
+    def _call(self, method, **params):
+        response = self.client.post(f"/{method}", json=params)
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def close(self):
+        self.client.close()
+
+    def add_job(self, job_folder, job_description, job_requirements):
+        self._call("add_job", job_folder=job_folder, job_description=job_description,
+                   job_requirements=job_requirements)
+
+    def get_job(self, job_folder):
+        return self._call("get_job", job_folder=job_folder)
+
+    def job_version(self, job_folder):
+        return self._call("job_version", job_folder=job_folder)
+
+    def enqueue(self, job_folder, resume_paths):
+        return self._call("enqueue", job_folder=job_folder, resume_paths=list(resume_paths))
+
+    def lease(self, worker):
+        return self._call("lease", worker=worker)
+
+    def ack(self, task_id, worker, result):
+        return self._call("ack", task_id=task_id, worker=worker, result=result)
+
+    def fail(self, task_id, worker, error):
+        return self._call("fail", task_id=task_id, worker=worker, error=str(error))
+
+    def counts(self, job_folder=None):
+        return self._call("counts", job_folder=job_folder)
+
+    def active_leases(self):
+        return self._call("active_leases")
+
+    def dead_letters(self, job_folder=None):
+        return self._call("dead_letters", job_folder=job_folder)
+
+    def requeue_dead(self, job_folder=None):
+        return self._call("requeue_dead", job_folder=job_folder)
+
+    def results(self, job_folder):
+        return self._call("results", job_folder=job_folder)
+
+    def status_report(self, job_folder=None):
+        return self._call("status_report", job_folder=job_folder)
+
+
+# Methods a queue server exposes, one POST /<method> endpoint each
+REMOTE_METHODS = ["add_job", "get_job", "job_version", "enqueue", "lease", "ack", "fail", "counts",
+                  "active_leases", "dead_letters", "requeue_dead", "results", "status_report"]
+
+
+def _plain(value):
+    if isinstance(value, sqlite3.Row):
+        return dict(value)
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def queue_app(queue, token=None):
+    """
+    Starlette app serving `queue` over HTTP. Every call runs on the event loop
+    thread, so the SQLite connection is only used from one thread and calls are serialized.
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+    token = token or QUEUE_TOKEN
+
+    def endpoint(method):
+        async def handle(request):
+            if token and request.headers.get("authorization") != f"Bearer {token}":
+                return JSONResponse({"error": "Unauthorized"}, status_code=401)
+            try:
+                params = await request.json()
+            except Exception:
+                params = {}
+            try:
+                result = getattr(queue, method)(**(params if isinstance(params, dict) else {}))
+            except TypeError as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+            return JSONResponse({"result": _plain(result)})
+        return handle
+
+    return Starlette(routes=[Route(f"/{method}", endpoint(method), methods=["POST"]) for method in REMOTE_METHODS])
+
+
+def serve_queue(host="0.0.0.0", port=8100, path=None):
+    """Serve the SQLite queue file at `path` to workers on other hosts."""
+    import uvicorn
+    queue = WorkQueue(path)
+    print(f"📬 Work queue {queue.path} served on http://{host}:{port}"
+          + (" (token required)" if QUEUE_TOKEN else ""))
+    try:
+        uvicorn.run(queue_app(queue), host=host, port=port, log_level="warning")
+    finally:
+        queue.close()
+
+
+def open_queue():
+    """RemoteWorkQueue when WORK_QUEUE_URL is set, else the local SQLite file."""
+    return RemoteWorkQueue() if QUEUE_URL else WorkQueue()
+
+
+def run_worker(queue, process_fn, worker=None, follow=False, poll_interval=5.0, max_tasks=None):
+    """
+    Lease and process tasks until the queue is drained (or forever with follow=True).
+    process_fn(job_row, task_row) returns a JSON-serializable result; exceptions
+    are recorded against the task and it is retried or dead-lettered.
+    Returns (done, failed).
+    """
+    worker = worker or worker_id()
+    done = failed = 0
+    jobs = {}
+    while max_tasks is None or done + failed < max_tasks:
+        task = queue.lease(worker)
+        if task is None:
+            if not follow:
+                break
+            time.sleep(poll_interval)
+            continue
+        try:
+            # Cached per job version, so a job re-registered with a new JD is not scored against the old one
+            key = (task["job_folder"], queue.job_version(task["job_folder"]))
+            if key not in jobs:
+                jobs[key] = queue.get_job(task["job_folder"])
+            result = process_fn(jobs[key], task)
+            if queue.ack(task["id"], worker, json.dumps(result, ensure_ascii=False)):
+                done += 1
+            else:
+                logging.error(f"[WorkQueue] Lease on task #{task['id']} expired before ack; result discarded")
+        except Exception as e:
+            logging.error(f"[WorkQueue] Task #{task['id']} ({task['resume_path']}) failed: {e}")
+            queue.fail(task["id"], worker, e)
+            failed += 1
+    return done, failed